@@ -0,0 +1,183 @@
+import gzip
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, Sequence
+from .logs import LOG_DIRECTORY, rotated_logs
+from .profiling import PHASES
+try:
+    import orjson
+    _loads: Callable[[bytes], Any] = orjson.loads
+except ImportError:
+    _loads = json.loads
+EVENTS_FILE = LOG_DIRECTORY / "automation_events.jsonl"
+CHUNK_BYTES = 4 << 20
+PHASE_COLUMNS = ("text_encode", "model_load", "embeds", "sampler", "decode", "combine", "other")
+COLUMNS = ("preset", "model", "status", "queue_wait", "elapsed", "it_per_sec") + PHASE_COLUMNS
+TERMINAL_EVENTS = {
+    "execution_complete": "completed",
+    "execution_error": "error",
+    "execution_interrupted": "interrupted",
+    "execution_timeout": "timeout",
+    "execution_lost": "lost",
+}
+TRACKED_EVENTS = {"queued", "execution_start", "node_executing", "node_progress", *TERMINAL_EVENTS}
+PERCENTILES = (50, 90, 99)
+def _moment(value: str) -> float:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+def _percentile(values: Sequence[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+def _open(path: Path) -> IO[bytes]:
+    return gzip.open(path, "rb") if path.suffix == ".gz" else path.open("rb", buffering=CHUNK_BYTES)
+def event_files(path: Path = EVENTS_FILE) -> list[Path]:
+    return [*rotated_logs(path), *([path] if path.exists() else [])]
+def stream_events(paths: Iterable[Path], since: str | None = None) -> Iterator[Dict[str, Any]]:
+    for path in paths:
+        with _open(path) as handle:
+            for raw in handle:
+                if b'"prompt_id"' not in raw:
+                    continue
+                try:
+                    event = _loads(raw)
+                except ValueError:
+                    continue
+                if event.get("event") not in TRACKED_EVENTS:
+                    continue
+                if since and event.get("timestamp", "") < since:
+                    continue
+                yield event
+class JobTable:
+    def __init__(self) -> None:
+        self.columns: Dict[str, list[Any]] = {name: [] for name in COLUMNS}
+        self.open: Dict[str, Dict[str, Any]] = {}
+    def __len__(self) -> int:
+        return len(self.columns["status"])
+    def _close_node(self, state: Dict[str, Any], moment: float) -> None:
+        node = state.get("node")
+        if node is None:
+            return
+        class_type = state["nodes"].get(str(node), "")
+        phase = PHASES.get(class_type, "other")
+        state["phases"][phase] = state["phases"].get(phase, 0.0) + max(moment - state["node_start"], 0.0)
+        state["node"] = None
+    def feed(self, event: Dict[str, Any]) -> None:
+        prompt_id = event.get("prompt_id")
+        kind = event["event"]
+        moment = _moment(event["timestamp"])
+        if kind == "queued":
+            self.open[prompt_id] = {
+                "preset": event.get("preset") or "-",
+                "model": event.get("model_name") or "-",
+                "nodes": event.get("nodes") or {},
+                "queued": moment,
+                "started": None,
+                "node": None,
+                "node_start": moment,
+                "phases": {},
+                "ticks": {},
+            }
+            return
+        state = self.open.get(prompt_id)
+        if state is None:
+            return
+        if kind == "execution_start":
+            state["started"] = state["started"] or moment
+        elif kind == "node_executing":
+            state["started"] = state["started"] or moment
+            self._close_node(state, moment)
+            state["node"] = event.get("node")
+            state["node_start"] = moment
+        elif kind == "node_progress":
+            value = event.get("value")
+            if isinstance(value, (int, float)) and PHASES.get(state["nodes"].get(str(event.get("node")), "")) == "sampler":
+                first, _ = state["ticks"].get(event.get("node"), ((moment, value), None))
+                state["ticks"][event.get("node")] = (first, (moment, value))
+        elif kind in TERMINAL_EVENTS:
+            self._close_node(state, moment)
+            self._append(state, TERMINAL_EVENTS[kind], moment)
+            del self.open[prompt_id]
+    def _append(self, state: Dict[str, Any], status: str, moment: float) -> None:
+        started = state["started"] or moment
+        steps = 0.0
+        seconds = 0.0
+        for (first_at, first_value), (last_at, last_value) in state["ticks"].values():
+            if last_at > first_at:
+                steps += last_value - first_value
+                seconds += last_at - first_at
+        row = {
+            "preset": state["preset"],
+            "model": state["model"],
+            "status": status,
+            "queue_wait": max(started - state["queued"], 0.0),
+            "elapsed": max(moment - started, 0.0),
+            "it_per_sec": steps / seconds if seconds else None,
+        }
+        row.update((phase, state["phases"].get(phase, 0.0)) for phase in PHASE_COLUMNS)
+        for name in COLUMNS:
+            self.columns[name].append(row[name])
+    def groups(self, keys: Sequence[str]) -> Dict[tuple[str, ...], list[int]]:
+        result: Dict[tuple[str, ...], list[int]] = {}
+        for idx, group in enumerate(zip(*(self.columns[key] for key in keys))):
+            result.setdefault(group, []).append(idx)
+        return result
+    def values(self, column: str, rows: Sequence[int]) -> list[float]:
+        data = self.columns[column]
+        return [data[idx] for idx in rows if data[idx] is not None]
+def load_table(paths: Iterable[Path] | None = None, since: str | None = None) -> JobTable:
+    table = JobTable()
+    for event in stream_events(event_files() if paths is None else paths, since):
+        table.feed(event)
+    return table
+def _spread(values: Sequence[float]) -> str:
+    return "/".join(f"{_percentile(values, q):.1f}" for q in PERCENTILES)
+def report(table: JobTable, keys: Sequence[str] = ("preset", "model")) -> list[str]:
+    if not len(table):
+        return ["No executions in the event log."]
+    lines = [f"{len(table)} execution(s); percentiles p{'/p'.join(map(str, PERCENTILES))} in seconds"]
+    for group, rows in sorted(table.groups(keys).items()):
+        statuses: Dict[str, int] = {}
+        for idx in rows:
+            statuses[table.columns["status"][idx]] = statuses.get(table.columns["status"][idx], 0) + 1
+        rates = table.values("it_per_sec", rows)
+        lines.append(f"{' | '.join(group)}: {len(rows)} run(s) ({', '.join(f'{k} {v}' for k, v in sorted(statuses.items()))})")
+        lines.append(f"  queue wait {_spread(table.values('queue_wait', rows))}")
+        lines.append(f"  run time   {_spread(table.values('elapsed', rows))}")
+        if rates:
+            lines.append(f"  sampler it/s {_spread(rates)}")
+        for phase in PHASE_COLUMNS:
+            values = table.values(phase, rows)
+            if any(values):
+                lines.append(f"  {phase:<11} {_spread(values)}")
+    totals = {phase: sum(table.values(phase, range(len(table)))) for phase in PHASE_COLUMNS}
+    spent = sum(totals.values())
+    if spent:
+        lines.append("GPU time by phase:")
+        for phase, seconds in sorted(totals.items(), key=lambda item: -item[1]):
+            if seconds:
+                lines.append(f"  {phase:<11} {seconds / 3600:.2f} h ({seconds / spent:.0%})")
+    return lines
+def handle_cli(args: Sequence[str]) -> None:
+    since = None
+    keys: tuple[str, ...] = ("preset", "model")
+    paths: list[Path] = []
+    idx = 0
+    while idx < len(args):
+        token = args[idx]
+        if token == "--since" and idx + 1 < len(args):
+            since = args[idx + 1]
+            idx += 2
+            continue
+        if token == "--by" and idx + 1 < len(args):
+            keys = tuple(key for key in args[idx + 1].split(",") if key in ("preset", "model", "status"))
+            idx += 2
+            continue
+        paths.append(Path(token))
+        idx += 1
+    for line in report(load_table(paths or None, since), keys or ("preset", "model")):
+        print(line)
@@ -0,0 +1,39 @@
+import subprocess
+import sys
+from typing import Sequence
+from .workflows import load_benchmarks
+BENCHMARK_CONFIG = load_benchmarks()
+IMPORT_BUDGET_MS = float(BENCHMARK_CONFIG.get("import_budget_ms", 250))
+IMPORT_RUNS = int(BENCHMARK_CONFIG.get("import_runs", 5))
+IMPORT_TARGETS = tuple(BENCHMARK_CONFIG.get("import_targets", ("automation.cli", "automation.core", "automation.server")))
+HEAVY_MODULES = tuple(BENCHMARK_CONFIG.get("heavy_modules", ("torch", "mlflow", "huggingface_hub", "comfy_script")))
+PROBE = (
+    "import sys, time\n"
+    "start = time.perf_counter()\n"
+    "import {module}\n"
+    "print((time.perf_counter() - start) * 1000, *(name for name in {heavy!r} if name in sys.modules))\n"
+)
+def measure_import(module: str, runs: int = IMPORT_RUNS) -> tuple[float, list[str]]:
+    best = float("inf")
+    heavy: list[str] = []
+    code = PROBE.format(module=module, heavy=HEAVY_MODULES)
+    for _ in range(max(1, runs)):
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        fields = result.stdout.split()
+        best = min(best, float(fields[0]))
+        heavy = fields[1:]
+    return best, heavy
+def run_import_benchmark(args: Sequence[str]) -> int:
+    targets = list(args) or list(IMPORT_TARGETS)
+    failed = False
+    for module in targets:
+        elapsed, heavy = measure_import(module)
+        status = "ok"
+        if elapsed > IMPORT_BUDGET_MS:
+            status = "over budget"
+            failed = True
+        if heavy:
+            status = f"imports {', '.join(heavy)}"
+            failed = True
+        print(f"{module}: {elapsed:.1f}ms (budget {IMPORT_BUDGET_MS:.0f}ms) {status}")
+    return 1 if failed else 0
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Sequence
+from .workflows import load_cache
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+ENTRY_NAME = "entry.json"
+ENABLED: bool
+CACHE_DIR: Path
+MAX_BYTES: int
+MAX_AGE_SECONDS: float
+TEXT_EMBEDS_ENABLED: bool
+TEXT_EMBED_INDEX: Path
+TEXT_ENCODER_NODES = ("WanVideoTextEncodeCached", "WanVideoTextEncode")
+TEXT_EMBED_FIELDS = ("model_name", "precision", "quantization", "positive_prompt", "negative_prompt")
+def workflow_key(workflow: Dict[str, Any]) -> str:
+    canonical = json.dumps(workflow, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+def text_encoder_node(workflow: Dict[str, Any]) -> str | None:
+    for key, node in workflow.items():
+        if node.get("class_type") in TEXT_ENCODER_NODES:
+            return key
+    return None
+def text_embed_key(workflow: Dict[str, Any]) -> str:
+    node = text_encoder_node(workflow)
+    if node is None:
+        return ""
+    inputs = workflow[node].get("inputs", {})
+    return workflow_key({field: inputs.get(field) for field in TEXT_EMBED_FIELDS})
+def _resolve(path: str) -> Path:
+    candidate = Path(path)
+    return candidate if candidate.is_absolute() else PROJECT_ROOT / candidate
+def _place(source: Path, target: Path) -> bool:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if target.exists():
+        target.unlink()
+    try:
+        os.link(source, target)
+    except OSError:
+        return False
+    return True
+class ResultCache:
+    def __init__(self, root: Path | None = None, max_bytes: int | None = None, max_age: float | None = None) -> None:
+        self.root = CACHE_DIR if root is None else root
+        self.max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+        self.max_age = MAX_AGE_SECONDS if max_age is None else max_age
+    def has(self, key: str) -> bool:
+        return (self.root / key / ENTRY_NAME).exists()
+    def lookup(self, key: str) -> Dict[str, Any] | None:
+        directory = self.root / key
+        entry_path = directory / ENTRY_NAME
+        if not entry_path.exists():
+            return None
+        entry = json.loads(entry_path.read_text(encoding="utf-8"))
+        for original, cached in entry["files"].items():
+            target = _resolve(original)
+            if target.exists():
+                continue
+            source = directory / cached if cached else None
+            if source is None or not source.exists():
+                self.remove(key)
+                return None
+            if not _place(source, target):
+                shutil.copy2(source, target)
+        os.utime(entry_path)
+        return entry
+    def store(self, key: str, history: Dict[str, Any], paths: Sequence[str]) -> None:
+        directory = self.root / key
+        files: Dict[str, str | None] = {}
+        for idx, original in enumerate(paths):
+            source = _resolve(original)
+            if not source.exists():
+                continue
+            name = f"{idx}_{source.name}"
+            files[original] = name if _place(source, directory / name) else None
+        if not files:
+            return
+        entry = {"key": key, "created": time.time(), "history": history, "files": files}
+        temp = directory / (ENTRY_NAME + ".tmp")
+        temp.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+        temp.replace(directory / ENTRY_NAME)
+        self.evict()
+    def remove(self, key: str) -> None:
+        shutil.rmtree(self.root / key, ignore_errors=True)
+    def evict(self) -> list[str]:
+        if not self.root.exists():
+            return []
+        now = time.time()
+        entries: list[tuple[float, int, str]] = []
+        removed: list[str] = []
+        for directory in self.root.iterdir():
+            entry_path = directory / ENTRY_NAME
+            if not entry_path.exists():
+                continue
+            used = entry_path.stat().st_mtime
+            if self.max_age > 0 and now - used > self.max_age:
+                self.remove(directory.name)
+                removed.append(directory.name)
+                continue
+            size = sum(path.stat().st_size for path in directory.iterdir() if path.is_file())
+            entries.append((used, size, directory.name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if self.max_bytes <= 0 or total <= self.max_bytes:
+                break
+            self.remove(key)
+            removed.append(key)
+            total -= size
+        return removed
+class TextEmbedIndex:
+    def __init__(self, path: Path | None = None, max_age: float | None = None) -> None:
+        self.path = TEXT_EMBED_INDEX if path is None else path
+        self.max_age = MAX_AGE_SECONDS if max_age is None else max_age
+        self.entries: Dict[str, Dict[str, float]] = {}
+        self.stamp: tuple[int, int] | None = None
+        self._lock = threading.Lock()
+    def _load(self) -> Dict[str, Dict[str, float]]:
+        try:
+            stat = self.path.stat()
+        except OSError:
+            self.entries, self.stamp = {}, None
+            return self.entries
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp != self.stamp:
+            try:
+                self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self.entries = {}
+            self.stamp = stamp
+        return self.entries
+    def servers(self, key: str) -> list[str]:
+        with self._lock:
+            seen = dict(self._load().get(key, {}))
+        return sorted(seen, key=seen.__getitem__, reverse=True)
+    def record(self, key: str, server: str) -> bool:
+        now = time.time()
+        with self._lock:
+            entries = self._load()
+            known = server in entries.get(key, {})
+            entries.setdefault(key, {})[server] = now
+            if self.max_age > 0:
+                for stale in [name for name, seen in entries.items() if now - max(seen.values()) > self.max_age]:
+                    del entries[stale]
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            temp.write_text(json.dumps(entries), encoding="utf-8")
+            temp.replace(self.path)
+            stat = self.path.stat()
+            self.stamp = (stat.st_mtime_ns, stat.st_size)
+        return known
+RESULT_CACHE: ResultCache
+TEXT_EMBEDS: TextEmbedIndex
+def refresh_settings() -> None:
+    global ENABLED, CACHE_DIR, MAX_BYTES, MAX_AGE_SECONDS, TEXT_EMBEDS_ENABLED, TEXT_EMBED_INDEX, RESULT_CACHE, TEXT_EMBEDS
+    config = load_cache()
+    ENABLED = bool(config.get("enabled", True))
+    CACHE_DIR = PROJECT_ROOT / config.get("directory", "ComfyUI/logs/result_cache")
+    MAX_BYTES = int(float(config.get("max_gb", 50)) * (1 << 30))
+    MAX_AGE_SECONDS = float(config.get("max_age_days", 30)) * 86400
+    TEXT_EMBEDS_ENABLED = bool(config.get("text_embeds", True))
+    TEXT_EMBED_INDEX = CACHE_DIR / "text_embeds.json"
+    RESULT_CACHE = ResultCache()
+    TEXT_EMBEDS = TextEmbedIndex()
+refresh_settings()
@@ -1,68 +1,53 @@
 import asyncio
-import subprocess
 import sys
-from automation import COMFY_ROOT
-from automation.logs import append_named_log
-from automation.core import (
-    batch_generate,
-    generate_templates,
-    generate_video,
-    pending_scheduled_jobs,
-    run_scheduled_jobs,
-)
-from automation.models import sync_wan_assets
-from automation.script import generate_basic_render
-from automation.tracking import handle_cli as tracking_handle_cli
-from automation.workflows import WAN_TEMPLATES, load_prompts, load_prompt_defaults
-PROMPT_MAP = load_prompts()
-PROMPT_DEFAULTS = load_prompt_defaults()
+from automation.workflows import load_prompts, load_prompt_defaults, load_templates
+COMMANDS = {
+    "start-server",
+    "automate",
+    "render",
+    "download-models",
+    "templates",
+    "scheduled",
+    "scheduler",
+    "experiments",
+    "analyze",
+    "bench-import",
+}
 def main() -> None:
     argv = sys.argv[1:]
-    if argv and argv[0] in {"start-server", "automate", "render", "download-models", "templates", "scheduled", "experiments"}:
+    if argv and argv[0] in COMMANDS:
         command = argv[0]
         args = argv[1:]
     else:
         command = "automate"
         args = argv
     if command == "start-server":
-        process = subprocess.Popen(
-            [
-                "uv",
-                "run",
-                "python",
-                str(COMFY_ROOT / "main.py"),
-                "--listen",
-                "127.0.0.1",
-                "--port",
-                "8188",
-            ],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            encoding="utf-8",
-        )
-        stream = process.stdout
-        if stream is not None:
-            for raw in stream:
-                line = raw.rstrip("\n")
-                payload = {
-                    "mode": "start-server",
-                    "preset": "standard",
-                    "prompt_digest": "",
-                    "output_nodes": [],
-                    "message": line,
-                }
-                append_named_log("start-server.jsonl", payload)
-                print(line)
-        code = process.wait()
-        sys.exit(code)
+        from automation.server import start_servers
+        instances = None
+        if "--instances" in args:
+            instances = int(args[args.index("--instances") + 1])
+        start_servers(instances)
+        return
     if command == "automate":
+        from automation.core import batch_generate, generate_video
+        prompt_map = load_prompts()
+        templates = load_templates()
         preset = None
         if "--preset" in args:
             preset_idx = args.index("--preset")
             preset = args[preset_idx + 1]
             args = args[:preset_idx] + args[preset_idx + 2:]
         kwargs = {"preset": preset} if preset else {}
+        depth = None
+        if "--depth" in args:
+            depth_idx = args.index("--depth")
+            depth = int(args[depth_idx + 1])
+            args = args[:depth_idx] + args[depth_idx + 2:]
+        for flag in ("--priority", "--deadline", "--vram-profile"):
+            if flag in args:
+                flag_idx = args.index(flag)
+                kwargs[flag[2:].replace("-", "_")] = args[flag_idx + 1]
+                args = args[:flag_idx] + args[flag_idx + 2:]
         schedule_override = None
         stripped_args = []
         for token in args:
@@ -72,6 +57,13 @@ def main() -> None:
             if token == "--no-schedule":
                 schedule_override = False
                 continue
+            if token == "--no-cache":
+                kwargs["use_cache"] = False
+                continue
+            if token == "--enqueue":
+                schedule_override = True
+                kwargs["enqueue"] = True
+                continue
             stripped_args.append(token)
         args = stripped_args
         if schedule_override is not None:
@@ -80,47 +72,35 @@ def main() -> None:
             prompt_keys = args[0].split("||")
             tail = list(args[1:])
         else:
-            prompt_keys = [PROMPT_DEFAULTS["automate"]]
+            prompt_keys = [load_prompt_defaults()["automate"]]
             tail = []
         prompts = []
         for key in prompt_keys:
-            if key in PROMPT_MAP:
-                prompts.append(PROMPT_MAP[key])
+            if key in prompt_map:
+                prompts.append(prompt_map[key])
                 continue
-            if key in WAN_TEMPLATES:
+            if key in templates:
                 prompts.append("")
                 if not tail:
                     tail = [key]
                 continue
-            prompts.append(PROMPT_MAP[key])
+            prompts.append(prompt_map[key])
         mode = tail[0] if tail else "wan"
         if len(prompts) > 1:
-            asyncio.run(batch_generate(prompts, mode, **kwargs))
+            asyncio.run(batch_generate(prompts, mode, depth, **kwargs))
             return
         asyncio.run(generate_video(prompts[0], mode, **kwargs))
         return
     if command == "scheduled":
-        if args and args[0] == "--run-now":
-            tail = args[1:]
-            preset_filter = None
-            idx = 0
-            while idx < len(tail):
-                token = tail[idx]
-                if token == "--preset" and idx + 1 < len(tail):
-                    preset_filter = tail[idx + 1]
-                    idx += 2
-                    continue
-                idx += 1
-            entries = pending_scheduled_jobs()
-            if preset_filter:
-                entries = [entry for entry in entries if entry.get("preset") == preset_filter]
-            if entries:
-                asyncio.run(run_scheduled_jobs(entries))
-            else:
-                print("No pending scheduled jobs.")
+        from automation.jobs import compact_schedule_log, pending_jobs
+        if args and args[0] == "--compact":
+            kept = compact_schedule_log()
+            print(f"Compacted schedule log to {kept} entries.")
             return
+        run_now = bool(args) and args[0] == "--run-now"
+        tail = list(args[1:] if run_now else args)
         preset_filter = None
-        tail = list(args)
+        refit = False
         idx = 0
         while idx < len(tail):
             token = tail[idx]
@@ -128,37 +108,81 @@ def main() -> None:
                 preset_filter = tail[idx + 1]
                 idx += 2
                 continue
+            if token == "--refit":
+                refit = True
             idx += 1
-        entries = pending_scheduled_jobs()
-        if preset_filter:
-            entries = [entry for entry in entries if entry.get("preset") == preset_filter]
+        entries = pending_jobs(preset_filter)
         if not entries:
             print("No pending scheduled jobs.")
             return
-        for entry in entries:
+        if run_now:
+            from automation.core import run_scheduled_jobs
+            asyncio.run(run_scheduled_jobs(entries))
+            return
+        from automation.estimator import load_model
+        from automation.scheduler import forecast
+        for entry, estimate, finish in forecast(entries, load_model(refit, cached_only=True)):
             window = entry.get("window_start_local", "")
             mode = entry.get("mode", "")
             preset = entry.get("preset") or "-"
             digest = entry.get("prompt_digest", "")
             prompt_text = entry.get("prompt", "")
-            print(f"{window} | {mode} | {preset} | {digest} | {prompt_text}")
+            predicted = finish.isoformat(timespec="minutes") if finish else "exceeds window"
+            print(f"{window} | {mode} | {preset} | {digest} | ~{estimate / 60:.1f}m -> {predicted} | {prompt_text}")
+        return
+    if command == "scheduler":
+        from automation.scheduler import run_scheduler
+        depth = None
+        if "--depth" in args:
+            depth = int(args[args.index("--depth") + 1])
+        try:
+            asyncio.run(run_scheduler(depth))
+        except KeyboardInterrupt:
+            pass
         return
     if command == "templates":
-        names = args if args else None
-        asyncio.run(generate_templates(names))
+        from automation.core import generate_templates
+        depth = None
+        use_cache = None
+        names = []
+        idx = 0
+        while idx < len(args):
+            token = args[idx]
+            if token == "--depth" and idx + 1 < len(args):
+                depth = int(args[idx + 1])
+                idx += 2
+                continue
+            if token == "--no-cache":
+                use_cache = False
+                idx += 1
+                continue
+            names.append(token)
+            idx += 1
+        asyncio.run(generate_templates(names or None, depth, use_cache))
         return
     if command == "experiments":
+        from automation.tracking import handle_cli as tracking_handle_cli
         tracking_handle_cli(args)
         return
+    if command == "analyze":
+        from automation.analyze import handle_cli as analyze_handle_cli
+        analyze_handle_cli(args)
+        return
     if command == "download-models":
-        sync_wan_assets()
+        from automation.models import sync_wan_assets
+        presets = [args[idx + 1] for idx, token in enumerate(args[:-1]) if token == "--preset"]
+        sync_wan_assets(presets)
         return
+    if command == "bench-import":
+        from automation.bench import run_import_benchmark
+        sys.exit(run_import_benchmark(args))
+    from automation.script import generate_basic_render
     if args:
         prompt_key = args[0]
         tail = args[1:]
     else:
-        prompt_key = PROMPT_DEFAULTS["script"]
+        prompt_key = load_prompt_defaults()["script"]
         tail = []
-    prompt = PROMPT_MAP[prompt_key]
+    prompt = load_prompts()[prompt_key]
     output = tail[0] if tail else "output.mp4"
     generate_basic_render(prompt, output)
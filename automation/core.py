@@ -1,64 +1,198 @@
 import asyncio
 import hashlib
 import json
-from datetime import datetime, timedelta, timezone, time as dt_time
+import uuid
+from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Sequence
+from string import Formatter
+from typing import Any, AsyncIterator, Dict, Iterable, Sequence
 import httpx
 import websockets
-from zoneinfo import ZoneInfo
 from . import COMFY_ROOT
-from .logs import append_log
+from .cache import (
+    RESULT_CACHE,
+    TEXT_EMBEDS,
+    refresh_settings as refresh_cache_settings,
+    text_embed_key,
+    text_encoder_node,
+    workflow_key,
+)
+from .estimator import refresh_settings as refresh_estimator_settings, workload
+from .jobs import SCHEDULE_LOG_FILE, pending_jobs, refresh_settings as refresh_job_settings
+from .metrics import ENABLED as METRICS_ENABLED, METRICS, refresh_settings as refresh_metrics_settings, serve_metrics
+from .models import refresh_settings as refresh_model_settings, resolve_models
+from .profiling import (
+    ENABLED as PROFILE_ENABLED,
+    VRAM_INTERVAL_SECONDS,
+    JobProfile,
+    refresh_settings as refresh_profile_settings,
+    write_trace,
+)
+from .vram import (
+    BUDGET_GB,
+    RECOVERY_ATTEMPTS,
+    RECOVERY_LADDER,
+    TILE_KEYS,
+    refresh_settings as refresh_vram_settings,
+    VRAMBudgetError,
+    degrade,
+    estimate_vram,
+    preflight,
+    tiling_policy,
+)
+from .logs import PROGRESS_EVERY, PROGRESS_SECONDS, append_log, flush_logs, log_sink, refresh_settings as refresh_log_settings
 from .workflows import (
-    WAN_TEMPLATES,
+    current_config,
     load_defaults,
     load_presets,
     load_prompt_components,
     load_prompt_defaults,
     load_prompts,
-    load_scheduling,
-)
-from .tracking import create_session
-SCHEDULING_CONFIG = load_scheduling()
-WINDOW_CONFIG = SCHEDULING_CONFIG.get("window", {})
-SCHEDULING_ENABLED = bool(SCHEDULING_CONFIG.get("enabled", True))
-LOCAL_ZONE = datetime.now().astimezone().tzinfo or timezone.utc
-TIMEZONE_NAME = SCHEDULING_CONFIG.get("timezone")
-if TIMEZONE_NAME and TIMEZONE_NAME != "local":
-    SCHEDULE_ZONE = ZoneInfo(TIMEZONE_NAME)
-else:
-    SCHEDULE_ZONE = LOCAL_ZONE
-WINDOW_START = dt_time.fromisoformat(
-    WINDOW_CONFIG.get("start_local", SCHEDULING_CONFIG.get("nightly_window_start", "03:00"))
+    load_servers,
+    load_templates,
+    load_vram_profiles,
 )
-WINDOW_END = dt_time.fromisoformat(
-    WINDOW_CONFIG.get("end_local", SCHEDULING_CONFIG.get("nightly_window_end", "05:00"))
+from .tracking import create_session, flush_tracking
+from .window import (
+    _current_time,
+    _current_window_start,
+    _next_window_start,
+    _parse_deadline,
+    _utc_stamp,
+    _within_window,
+    refresh_settings as refresh_window_settings,
 )
-METADATA_PATH = SCHEDULING_CONFIG.get("metadata_log", "ComfyUI/logs/automation_schedule.jsonl")
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 LOG_FILE = COMFY_ROOT / "logs" / "automation_events.jsonl"
-SCHEDULE_LOG_FILE = PROJECT_ROOT / METADATA_PATH
-SPANS_MIDNIGHT = (WINDOW_END.hour * 60 + WINDOW_END.minute) <= (WINDOW_START.hour * 60 + WINDOW_START.minute)
-PROMPTS = load_prompts()
-PROMPT_DEFAULTS = load_prompt_defaults()
-PROMPT_COMPONENTS = load_prompt_components()
-WAN_COMPONENTS = PROMPT_COMPONENTS.get("wan", {})
-WAN_SEGMENTS = tuple(WAN_COMPONENTS.get("segments", ()))
-WAN_DESCRIPTOR_MAP = WAN_COMPONENTS.get("descriptors", {})
-DESCRIPTORS = [
-    ("camera_move", tuple(WAN_DESCRIPTOR_MAP.get("camera_moves", ()))),
-    ("lighting_style", tuple(WAN_DESCRIPTOR_MAP.get("lighting_styles", ()))),
-    ("color_grade", tuple(WAN_DESCRIPTOR_MAP.get("color_grades", ()))),
-    ("lens_profile", tuple(WAN_DESCRIPTOR_MAP.get("lens_profiles", ()))),
-    ("capture_technique", tuple(WAN_DESCRIPTOR_MAP.get("capture_techniques", ()))),
-    ("texture_detail", tuple(WAN_DESCRIPTOR_MAP.get("texture_details", ()))),
-    ("post_treatment", tuple(WAN_DESCRIPTOR_MAP.get("post_treatments", ()))),
-]
-WAN_FALLBACK_KEY = WAN_COMPONENTS.get("fallback_key") or PROMPT_DEFAULTS.get("wan_fallback", "")
-WAN_FILLER_KEY = WAN_COMPONENTS.get("filler_key") or PROMPT_DEFAULTS.get("wan_filler", "")
-WAN_MIN_WORDS = int(WAN_COMPONENTS.get("min_words", 80))
-WAN_MAX_WORDS = int(WAN_COMPONENTS.get("max_words", 120))
-WAIT_INTERVAL = int(SCHEDULING_CONFIG.get("waiting_log_interval_seconds", 0))
+SCHEDULE_SINK = log_sink(SCHEDULE_LOG_FILE, max_delay=0, rotate_bytes=0, rotate_daily=False)
+DESCRIPTOR_KEYS = (
+    ("camera_move", "camera_moves"),
+    ("lighting_style", "lighting_styles"),
+    ("color_grade", "color_grades"),
+    ("lens_profile", "lens_profiles"),
+    ("capture_technique", "capture_techniques"),
+    ("texture_detail", "texture_details"),
+    ("post_treatment", "post_treatments"),
+)
+HTTP_RETRY_STATUSES = {500, 502, 503, 504}
+UNSENT_STATUSES = {503}
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+LOST_AFTER_MISSES = 2
+SETTINGS_DIGEST = ""
+SCHEDULING_ENABLED: bool
+SCHEDULER_DAEMON: bool
+WAIT_INTERVAL: int
+PIPELINE_DEPTH: int
+WS_CONNECT_TIMEOUT_SECONDS: float
+WS_RECONNECT_MIN_SECONDS: float
+WS_RECONNECT_MAX_SECONDS: float
+HTTP_TIMEOUT: httpx.Timeout
+HTTP_LIMITS: httpx.Limits
+HTTP_RETRIES: int
+HTTP_BACKOFF_SECONDS: float
+HEALTH_INTERVAL_SECONDS: float
+FAILOVER_ATTEMPTS: int
+JOB_TIMEOUT_SECONDS: float
+ACQUIRE_TIMEOUT_SECONDS: float
+HISTORY_POLL_MIN_SECONDS: float
+HISTORY_POLL_MAX_SECONDS: float
+CACHE_ENABLED: bool
+TEXT_EMBEDS_ENABLED: bool
+PROMPTS: Dict[str, str]
+ENRICHER: "PromptEnricher"
+SETTINGS_HOOKS = (
+    refresh_vram_settings,
+    refresh_cache_settings,
+    refresh_model_settings,
+    refresh_estimator_settings,
+    refresh_log_settings,
+    refresh_metrics_settings,
+    refresh_profile_settings,
+    refresh_job_settings,
+    refresh_window_settings,
+)
+def _refresh_modules() -> None:
+    global BUDGET_GB, RECOVERY_ATTEMPTS, RECOVERY_LADDER, RESULT_CACHE, TEXT_EMBEDS, METRICS_ENABLED
+    global PROFILE_ENABLED, VRAM_INTERVAL_SECONDS, PROGRESS_EVERY, PROGRESS_SECONDS, SCHEDULE_LOG_FILE, SCHEDULE_SINK
+    for hook in SETTINGS_HOOKS:
+        hook()
+    from .cache import RESULT_CACHE, TEXT_EMBEDS
+    from .jobs import SCHEDULE_LOG_FILE
+    from .logs import PROGRESS_EVERY, PROGRESS_SECONDS
+    from .metrics import ENABLED as METRICS_ENABLED
+    from .profiling import ENABLED as PROFILE_ENABLED, VRAM_INTERVAL_SECONDS
+    from .vram import BUDGET_GB, RECOVERY_ATTEMPTS, RECOVERY_LADDER
+    SCHEDULE_SINK = log_sink(SCHEDULE_LOG_FILE, max_delay=0, rotate_bytes=0, rotate_daily=False)
+def _refresh_prompts() -> None:
+    global PROMPTS, ENRICHER
+    PROMPTS = load_prompts()
+    defaults = load_prompt_defaults()
+    components = load_prompt_components().get("wan", {})
+    descriptors = components.get("descriptors", {})
+    ENRICHER = PromptEnricher(
+        tuple(components.get("segments", ())),
+        [(name, tuple(descriptors.get(key, ()))) for name, key in DESCRIPTOR_KEYS],
+        PROMPTS.get(components.get("fallback_key") or defaults.get("wan_fallback", ""), ""),
+        PROMPTS.get(components.get("filler_key") or defaults.get("wan_filler", ""), ""),
+        int(components.get("min_words", 80)),
+        int(components.get("max_words", 120)),
+    )
+def refresh_settings() -> bool:
+    global SETTINGS_DIGEST, SCHEDULING_ENABLED, SCHEDULER_DAEMON, WAIT_INTERVAL, PIPELINE_DEPTH, WS_CONNECT_TIMEOUT_SECONDS, WS_RECONNECT_MIN_SECONDS
+    global WS_RECONNECT_MAX_SECONDS, HTTP_TIMEOUT, HTTP_LIMITS, HTTP_RETRIES, HTTP_BACKOFF_SECONDS
+    global HEALTH_INTERVAL_SECONDS, FAILOVER_ATTEMPTS, JOB_TIMEOUT_SECONDS, ACQUIRE_TIMEOUT_SECONDS, HISTORY_POLL_MIN_SECONDS
+    global HISTORY_POLL_MAX_SECONDS, CACHE_ENABLED, TEXT_EMBEDS_ENABLED
+    config = current_config()
+    if config.digest == SETTINGS_DIGEST:
+        return False
+    if SETTINGS_DIGEST:
+        _refresh_modules()
+    _refresh_prompts()
+    scheduling = config.section("scheduling")
+    SCHEDULING_ENABLED = bool(scheduling.get("enabled", True))
+    SCHEDULER_DAEMON = bool(scheduling.get("daemon", False))
+    WAIT_INTERVAL = int(scheduling.get("waiting_log_interval_seconds", 0))
+    execution = config.section("execution")
+    http = execution.get("http", {})
+    PIPELINE_DEPTH = int(execution.get("pipeline_depth", 1))
+    WS_CONNECT_TIMEOUT_SECONDS = float(execution.get("websocket_connect_timeout_seconds", 10))
+    WS_RECONNECT_MIN_SECONDS = float(execution.get("websocket_reconnect_min_seconds", 0.5))
+    WS_RECONNECT_MAX_SECONDS = float(execution.get("websocket_reconnect_max_seconds", 30))
+    HTTP_TIMEOUT = httpx.Timeout(
+        float(http.get("timeout_seconds", 30)),
+        connect=float(http.get("connect_timeout_seconds", 5)),
+    )
+    HTTP_LIMITS = httpx.Limits(
+        max_connections=int(http.get("max_connections", 16)),
+        max_keepalive_connections=int(http.get("max_keepalive_connections", 8)),
+        keepalive_expiry=float(http.get("keepalive_expiry_seconds", 30)),
+    )
+    HTTP_RETRIES = int(http.get("retries", 3))
+    HTTP_BACKOFF_SECONDS = float(http.get("backoff_seconds", 0.5))
+    HEALTH_INTERVAL_SECONDS = float(execution.get("health_interval_seconds", 15))
+    FAILOVER_ATTEMPTS = int(execution.get("failover_attempts", 2))
+    JOB_TIMEOUT_SECONDS = float(execution.get("job_timeout_seconds", 0))
+    ACQUIRE_TIMEOUT_SECONDS = float(execution.get("acquire_timeout_seconds", JOB_TIMEOUT_SECONDS))
+    HISTORY_POLL_MIN_SECONDS = float(execution.get("history_poll_min_seconds", 2))
+    HISTORY_POLL_MAX_SECONDS = float(execution.get("history_poll_max_seconds", 30))
+    cache = config.section("cache")
+    CACHE_ENABLED = bool(cache.get("enabled", True))
+    TEXT_EMBEDS_ENABLED = bool(cache.get("text_embeds", True))
+    SETTINGS_DIGEST = config.digest
+    return True
+OOM_MARKERS = ("outofmemoryerror", "out of memory", "allocation on device")
+MISSING_MODEL_MARKERS = ("filenotfounderror", "no such file", "value not in list", "model not found")
+class PromptRejectedError(RuntimeError):
+    def __init__(self, server: str, status: int, body: Any) -> None:
+        super().__init__(f"{server} rejected the prompt with status {status}: {body}")
+        self.server = server
+        self.status = status
+        self.body = body
+def _response_body(resp: httpx.Response) -> Any:
+    try:
+        return resp.json()
+    except ValueError:
+        return resp.text
 def _resolve_quantization(model_name: str) -> str:
     name = Path(model_name).name.lower()
     if name.endswith(".gguf"):
@@ -72,8 +206,13 @@ def _resolve_quantization(model_name: str) -> str:
     return base
 def _prompt_digest(text: str) -> str:
     return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+def _job_id(mode: str, prompt: str, options: Dict[str, Any]) -> str:
+    payload = json.dumps([mode, prompt, options], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
 def _write_log(payload: Dict[str, Any]) -> None:
     append_log(LOG_FILE, payload)
+    if METRICS_ENABLED:
+        METRICS.record(payload)
 def _collect_output_paths(history: Dict[str, Any]) -> list[str]:
     outputs = history.get("outputs", {})
     paths: list[str] = []
@@ -109,75 +248,107 @@ def _collect_output_paths(history: Dict[str, Any]) -> list[str]:
                                 elif resolved_str not in paths:
                                     paths.append(resolved_str)
     return paths
+def _classify_failure(message: str, exception_type: str = "") -> str:
+    text = f"{exception_type} {message}".lower()
+    if any(marker in text for marker in OOM_MARKERS):
+        return "oom"
+    if any(marker in text for marker in MISSING_MODEL_MARKERS):
+        return "missing_model"
+    return "node_error"
+def _error_details(data: Dict[str, Any]) -> Dict[str, Any]:
+    message = data.get("exception_message") or ""
+    exception_type = data.get("exception_type") or ""
+    return {
+        "message": message,
+        "exception_type": exception_type,
+        "node_id": data.get("node_id"),
+        "node_type": data.get("node_type"),
+        "failure": _classify_failure(message, exception_type),
+    }
+def _history_status(entry: Dict[str, Any]) -> tuple[str, Dict[str, Any]]:
+    status = entry.get("status") or {}
+    if status.get("status_str") != "error":
+        return "completed", {}
+    for kind, data in status.get("messages") or []:
+        if kind == "execution_error":
+            return "error", _error_details(data or {})
+        if kind == "execution_interrupted":
+            return "interrupted", {}
+    return "error", {"failure": "node_error"}
 def _descriptor_index(prompt: str) -> int:
-    return sum(ord(ch) for ch in prompt)
-def _pick_descriptor(prompt: str, items: Sequence[str], offset: int) -> str:
-    if not items:
-        return ""
-    idx = _descriptor_index(prompt)
-    return items[(idx + offset) % len(items)]
-def enrich_prompt(base_prompt: str) -> str:
-    fallback = PROMPTS.get(WAN_FALLBACK_KEY, "")
-    text = base_prompt.strip() or fallback
-    descriptor_values: Dict[str, str] = {}
-    for idx, (name, options) in enumerate(DESCRIPTORS):
-        descriptor_values[name] = _pick_descriptor(text, options, idx)
-    segments = [segment.format(prompt=text, **descriptor_values) for segment in WAN_SEGMENTS]
-    if not segments:
-        prompt = text
-    else:
-        prompt = " ".join(segments)
-    filler = PROMPTS.get(WAN_FILLER_KEY, "")
-    words = prompt.split()
-    while len(words) < WAN_MIN_WORDS and filler:
-        prompt = f"{prompt} {filler}"
+    return sum(map(ord, prompt))
+class PromptEnricher:
+    def __init__(
+        self,
+        segments: Sequence[str],
+        descriptors: Sequence[tuple[str, Sequence[str]]],
+        fallback: str = "",
+        filler: str = "",
+        min_words: int = 80,
+        max_words: int = 120,
+    ) -> None:
+        formatter = Formatter()
+        self.formatter = formatter
+        self.segments = [list(formatter.parse(segment)) for segment in segments]
+        self.descriptors = [(name, tuple(options)) for name, options in descriptors]
+        self.fallback = fallback
+        self.filler = filler
+        self.filler_words = filler.split()
+        self.min_words = min_words
+        self.max_words = max_words
+    def _render(self, parts: list[tuple[str, str | None, str | None, str | None]], values: Dict[str, str]) -> str:
+        pieces: list[str] = []
+        for literal, field, spec, conversion in parts:
+            pieces.append(literal)
+            if field is None:
+                continue
+            value = self.formatter.get_field(field, (), values)[0]
+            pieces.append(format(self.formatter.convert_field(value, conversion), spec or ""))
+        return "".join(pieces)
+    def enrich(self, base_prompt: str) -> str:
+        text = base_prompt.strip() or self.fallback
+        if not self.segments:
+            prompt = text
+        else:
+            index = _descriptor_index(text)
+            values = {
+                name: options[(index + offset) % len(options)] if options else ""
+                for offset, (name, options) in enumerate(self.descriptors)
+            }
+            values["prompt"] = text
+            prompt = " ".join(self._render(parts, values) for parts in self.segments)
         words = prompt.split()
-    if len(words) > WAN_MAX_WORDS:
-        prompt = " ".join(words[:WAN_MAX_WORDS])
-    return prompt
-def _utc_stamp(moment: datetime) -> str:
-    return moment.astimezone(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
+        count = len(words)
+        repeats = 0
+        if count < self.min_words and self.filler_words:
+            repeats = -(-(self.min_words - count) // len(self.filler_words))
+            prompt += f" {self.filler}" * repeats
+            count += repeats * len(self.filler_words)
+        if count > self.max_words:
+            prompt = " ".join((words + self.filler_words * repeats)[: self.max_words])
+        return prompt
+    def enrich_many(self, prompts: Iterable[str]) -> list[str]:
+        done: Dict[str, str] = {}
+        results: list[str] = []
+        for prompt in prompts:
+            if prompt not in done:
+                done[prompt] = self.enrich(prompt)
+            results.append(done[prompt])
+        return results
+refresh_settings()
+def enrich_prompt(base_prompt: str) -> str:
+    return ENRICHER.enrich(base_prompt)
+def enrich_many(prompts: Iterable[str]) -> list[str]:
+    return ENRICHER.enrich_many(prompts)
 def _write_schedule_log(payload: Dict[str, Any]) -> None:
-    append_log(SCHEDULE_LOG_FILE, payload)
-def _current_time() -> datetime:
-    if SCHEDULE_ZONE:
-        return datetime.now(SCHEDULE_ZONE)
-    return datetime.now().astimezone()
-def _window_anchor(moment: datetime, anchor: dt_time) -> datetime:
-    return moment.replace(hour=anchor.hour, minute=anchor.minute, second=anchor.second, microsecond=0)
-def _within_window(moment: datetime) -> bool:
-    minutes = moment.hour * 60 + moment.minute
-    start = WINDOW_START.hour * 60 + WINDOW_START.minute
-    end = WINDOW_END.hour * 60 + WINDOW_END.minute
-    if start == end:
-        return True
-    if SPANS_MIDNIGHT:
-        return minutes >= start or minutes < end
-    return start <= minutes < end
-def _current_window_start(moment: datetime) -> datetime:
-    start = _window_anchor(moment, WINDOW_START)
-    if SPANS_MIDNIGHT and moment.hour * 60 + moment.minute < WINDOW_END.hour * 60 + WINDOW_END.minute:
-        start -= timedelta(days=1)
-    if not SPANS_MIDNIGHT and moment < start:
-        start -= timedelta(days=1)
-    return start
-def _next_window_start(moment: datetime) -> datetime:
-    if _within_window(moment):
-        return _current_window_start(moment)
-    start = _window_anchor(moment, WINDOW_START)
-    if SPANS_MIDNIGHT:
-        if moment.hour * 60 + moment.minute < WINDOW_END.hour * 60 + WINDOW_END.minute:
-            return start
-        if start <= moment:
-            return start + timedelta(days=1)
-        return start
-    if moment < start:
-        return start
-    return start + timedelta(days=1)
+    SCHEDULE_SINK.write(payload)
+    if METRICS_ENABLED:
+        METRICS.record(payload)
 async def _align_to_window(
     mode: str,
     preset: str | None,
     digest: str,
+    job_id: str,
     words: int,
     prompt: str,
     schedule_mode: str,
@@ -192,6 +363,7 @@ async def _align_to_window(
                 "mode": mode,
                 "preset": preset,
                 "prompt_digest": digest,
+                "job_id": job_id,
                 "window_start_local": window_start.isoformat(timespec="seconds"),
                 "window_start_utc": _utc_stamp(window_start),
                 "words": words,
@@ -208,6 +380,7 @@ async def _align_to_window(
             "mode": mode,
             "preset": preset,
             "prompt_digest": digest,
+            "job_id": job_id,
             "window_start_local": window_start.isoformat(timespec="seconds"),
             "window_start_utc": _utc_stamp(window_start),
             "words": words,
@@ -229,6 +402,7 @@ async def _align_to_window(
                         "mode": mode,
                         "preset": preset,
                         "prompt_digest": digest,
+                        "job_id": job_id,
                         "window_start_local": window_start.isoformat(timespec="seconds"),
                         "window_start_utc": _utc_stamp(window_start),
                         "words": words,
@@ -247,6 +421,7 @@ async def _align_to_window(
             "mode": mode,
             "preset": preset,
             "prompt_digest": digest,
+            "job_id": job_id,
             "window_start_local": window_start.isoformat(timespec="seconds"),
             "window_start_utc": _utc_stamp(window_start),
             "words": words,
@@ -261,77 +436,454 @@ class ComfyUIClient:
         self.server_url = server_url
         self.http_url = f"http://{server_url}"
         self.ws_url = f"ws://{server_url}/ws"
-        self.client_id = "automation_client"
-    async def queue_prompt(self, workflow: Dict[str, Any]) -> str:
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(
-                f"{self.http_url}/prompt",
-                json={"prompt": workflow, "client_id": self.client_id},
+        self.client_id = f"automation_{uuid.uuid4().hex}"
+        self.queue_remaining: int | None = None
+        self._subscribers: Dict[str, asyncio.Queue[Dict[str, Any]]] = {}
+        self._active_prompt: str | None = None
+        self._listener: asyncio.Task[None] | None = None
+        self._connected: asyncio.Event | None = None
+        self._http: httpx.AsyncClient | None = None
+    async def __aenter__(self) -> "ComfyUIClient":
+        await self.connect()
+        return self
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+    async def connect(self) -> None:
+        if self._connected is None:
+            self._connected = asyncio.Event()
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+        try:
+            await asyncio.wait_for(self._connected.wait(), WS_CONNECT_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            raise ConnectionError(f"websocket {self.ws_url} unavailable") from None
+    async def close(self) -> None:
+        listener = self._listener
+        self._listener = None
+        if listener is not None:
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
+        http = self._http
+        self._http = None
+        if http is not None:
+            await http.aclose()
+    def _session(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(base_url=self.http_url, timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS)
+        return self._http
+    async def _request(self, method: str, path: str, idempotent: bool = True, **kwargs: Any) -> httpx.Response:
+        session = self._session()
+        statuses = HTTP_RETRY_STATUSES if idempotent else UNSENT_STATUSES
+        attempt = 0
+        while True:
+            try:
+                resp = await session.request(method, path, **kwargs)
+                if resp.status_code not in statuses or attempt >= HTTP_RETRIES:
+                    resp.raise_for_status()
+                    return resp
+                reason = f"status {resp.status_code}"
+            except httpx.TransportError as exc:
+                if attempt >= HTTP_RETRIES or not (idempotent or isinstance(exc, UNSENT_ERRORS)):
+                    raise
+                reason = f"{type(exc).__name__}: {exc}"
+            attempt += 1
+            delay = HTTP_BACKOFF_SECONDS * 2 ** (attempt - 1)
+            _write_log(
+                {
+                    "event": "http_retry",
+                    "server": self.server_url,
+                    "method": method,
+                    "path": path,
+                    "attempt": attempt,
+                    "reason": reason,
+                    "delay_seconds": delay,
+                }
             )
-            data = resp.json()
-            return data["prompt_id"]
-    async def wait_for_completion(self, prompt_id: str, context: Dict[str, Any] | None = None) -> None:
+            await asyncio.sleep(delay)
+    def subscribe(self, prompt_id: str) -> asyncio.Queue[Dict[str, Any]]:
+        queue = self._subscribers.get(prompt_id)
+        if queue is None:
+            queue = asyncio.Queue()
+            self._subscribers[prompt_id] = queue
+        return queue
+    def unsubscribe(self, prompt_id: str) -> None:
+        self._subscribers.pop(prompt_id, None)
+        if self._active_prompt == prompt_id:
+            self._active_prompt = None
+    async def _listen(self) -> None:
+        delay = WS_RECONNECT_MIN_SECONDS
+        connected_once = False
+        while True:
+            try:
+                async with websockets.connect(f"{self.ws_url}?clientId={self.client_id}", max_size=None) as ws:
+                    if connected_once:
+                        for queue in self._subscribers.values():
+                            queue.put_nowait({"type": "reconnected", "data": {}})
+                    connected_once = True
+                    delay = WS_RECONNECT_MIN_SECONDS
+                    if self._connected is not None:
+                        self._connected.set()
+                    async for packet in ws:
+                        if isinstance(packet, bytes):
+                            continue
+                        self._dispatch(json.loads(packet))
+            except (OSError, websockets.WebSocketException) as exc:
+                _write_log({"event": "websocket_disconnected", "client_id": self.client_id, "message": str(exc)})
+            if self._connected is not None:
+                self._connected.clear()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, WS_RECONNECT_MAX_SECONDS)
+    def _dispatch(self, msg: Dict[str, Any]) -> None:
+        kind = msg.get("type")
+        data = msg.get("data") or {}
+        if kind == "status":
+            exec_info = (data.get("status") or {}).get("exec_info") or {}
+            remaining = exec_info.get("queue_remaining")
+            if remaining is not None:
+                self.queue_remaining = int(remaining)
+            return
+        prompt_id = data.get("prompt_id")
+        if kind == "execution_start" and prompt_id:
+            self._active_prompt = prompt_id
+        target = prompt_id or self._active_prompt
+        if not target:
+            return
+        queue = self._subscribers.get(target)
+        if queue is not None:
+            queue.put_nowait(msg)
+    async def knows_prompt(self, prompt_id: str) -> bool:
+        state = await self.queue_state()
+        if prompt_id in state["running"] or prompt_id in state["pending"]:
+            return True
+        return await self.peek_history(prompt_id) is not None
+    async def queue_prompt(self, workflow: Dict[str, Any], prompt_id: str | None = None) -> str:
+        prompt_id = prompt_id or uuid.uuid4().hex
+        self.subscribe(prompt_id)
+        body = {"prompt": workflow, "client_id": self.client_id, "prompt_id": prompt_id}
+        attempt = 0
+        try:
+            await self.connect()
+            while True:
+                try:
+                    resp = await self._request("POST", "/prompt", idempotent=False, json=body)
+                    break
+                except httpx.HTTPStatusError as exc:
+                    if exc.response.status_code not in HTTP_RETRY_STATUSES - UNSENT_STATUSES:
+                        raise
+                    reason = f"status {exc.response.status_code}"
+                except UNSENT_ERRORS:
+                    raise
+                except httpx.TransportError as exc:
+                    reason = f"{type(exc).__name__}: {exc}"
+                if await self.knows_prompt(prompt_id):
+                    _write_log({"event": "submit_recovered", "server": self.server_url, "prompt_id": prompt_id, "reason": reason})
+                    return prompt_id
+                if attempt >= HTTP_RETRIES:
+                    raise httpx.TransportError(f"POST /prompt failed: {reason}")
+                attempt += 1
+                _write_log(
+                    {
+                        "event": "http_retry",
+                        "server": self.server_url,
+                        "method": "POST",
+                        "path": "/prompt",
+                        "attempt": attempt,
+                        "reason": reason,
+                        "delay_seconds": HTTP_BACKOFF_SECONDS * 2 ** (attempt - 1),
+                    }
+                )
+                await asyncio.sleep(HTTP_BACKOFF_SECONDS * 2 ** (attempt - 1))
+        except BaseException:
+            self.unsubscribe(prompt_id)
+            raise
+        data = resp.json()
+        assigned = data["prompt_id"]
+        if assigned != prompt_id:
+            self._subscribers[assigned] = self._subscribers.pop(prompt_id)
+        return assigned
+    async def queue_state(self) -> Dict[str, list[str]]:
+        resp = await self._request("GET", "/queue")
+        data = resp.json()
+        return {
+            "running": [str(item[1]) for item in data.get("queue_running", []) if len(item) > 1],
+            "pending": [str(item[1]) for item in data.get("queue_pending", []) if len(item) > 1],
+        }
+    async def interrupt(self, prompt_id: str) -> None:
+        await self._request("POST", "/interrupt", json={"prompt_id": prompt_id})
+    async def cancel(self, prompt_id: str) -> None:
+        await self._request("POST", "/queue", json={"delete": [prompt_id]})
+        if prompt_id in (await self.queue_state())["running"]:
+            await self.interrupt(prompt_id)
+    async def system_stats(self) -> Dict[str, Any]:
+        resp = await self._request("GET", "/system_stats")
+        return resp.json()
+    async def _sample_vram(self, profile: JobProfile) -> None:
+        while True:
+            try:
+                profile.sample(await self.system_stats())
+            except (httpx.HTTPError, ConnectionError, ValueError):
+                pass
+            await asyncio.sleep(VRAM_INTERVAL_SECONDS)
+    async def wait_for_completion(
+        self,
+        prompt_id: str,
+        context: Dict[str, Any] | None = None,
+        timeout: float | None = None,
+        profile: JobProfile | None = None,
+    ) -> Dict[str, Any]:
         base = dict(context or {})
         base["prompt_id"] = prompt_id
+        outcome: Dict[str, Any] = {"status": "completed", "started_at": None}
+        limit = JOB_TIMEOUT_SECONDS if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        deadline: float | None = None
+        poll_interval = HISTORY_POLL_MIN_SECONDS
+        misses = 0
+        progress_marks: Dict[Any, float] = {}
+        sampler: asyncio.Task[None] | None = None
         def write(event: str, details: Dict[str, Any]) -> None:
             payload = dict(base)
             payload.update(details)
             payload["event"] = event
             _write_log(payload)
-        async with websockets.connect(f"{self.ws_url}?clientId={self.client_id}") as ws:
+        def mark_started() -> None:
+            nonlocal deadline, sampler
+            if outcome["started_at"] is None:
+                outcome["started_at"] = datetime.utcnow()
+            if profile is not None and sampler is None:
+                profile.start()
+                sampler = asyncio.create_task(self._sample_vram(profile))
+            if deadline is None and limit > 0:
+                deadline = loop.time() + limit
+        queue = self.subscribe(prompt_id)
+        await self.connect()
+        try:
             while True:
-                packet = await ws.recv()
-                if isinstance(packet, bytes):
+                wait = poll_interval
+                if deadline is not None:
+                    wait = min(wait, max(deadline - loop.time(), 0.0))
+                try:
+                    msg = await asyncio.wait_for(queue.get(), timeout=wait)
+                except asyncio.TimeoutError:
+                    msg = None
+                if msg is None or msg.get("type") == "reconnected":
+                    if deadline is not None and loop.time() >= deadline:
+                        write("execution_timeout", {"timeout_seconds": limit})
+                        print(f"execution timeout after {limit}s")
+                        await self.interrupt(prompt_id)
+                        outcome["status"] = "timeout"
+                        break
+                    entry = await self.peek_history(prompt_id)
+                    if entry is None:
+                        state = await self.queue_state()
+                        if prompt_id in state["running"]:
+                            mark_started()
+                            misses = 0
+                        elif prompt_id in state["pending"]:
+                            misses = 0
+                        else:
+                            entry = await self.peek_history(prompt_id)
+                            misses += entry is None
+                    if entry is not None:
+                        status, details = _history_status(entry)
+                        event = "execution_complete" if status == "completed" else f"execution_{status}"
+                        write(event, {"source": "history", "message": "", **details})
+                        print(f"execution {status} (history)")
+                        outcome["status"] = status
+                        outcome.update(details)
+                        break
+                    if misses >= LOST_AFTER_MISSES:
+                        write("execution_lost", {"misses": misses})
+                        print("execution lost")
+                        outcome["status"] = "lost"
+                        break
+                    poll_interval = HISTORY_POLL_MIN_SECONDS if misses else min(poll_interval * 2, HISTORY_POLL_MAX_SECONDS)
                     continue
-                msg = json.loads(packet)
+                poll_interval = HISTORY_POLL_MIN_SECONDS
                 kind = msg.get("type")
                 data = msg.get("data") or {}
-                data_prompt = data.get("prompt_id")
-                if data_prompt and data_prompt != prompt_id:
-                    continue
                 if kind == "execution_start":
+                    mark_started()
                     write("execution_start", {})
                     print("execution start")
                 elif kind == "execution_cached":
+                    mark_started()
                     nodes = data.get("nodes") or []
                     write("execution_cached", {"nodes": nodes})
+                    outcome["cached_nodes"] = [str(node) for node in nodes]
+                    if profile is not None:
+                        profile.cache(nodes)
                 elif kind == "executing":
                     node = data.get("display_node") or data.get("node")
                     if node is None:
                         write("execution_complete", {})
                         print("execution complete")
                         break
+                    mark_started()
+                    if profile is not None:
+                        profile.enter(node)
                     write("node_executing", {"node": node})
                     print(f"{node} executing")
                 elif kind == "progress":
                     node = data.get("node")
                     value = data.get("value")
                     maximum = data.get("max")
-                    write("node_progress", {"node": node, "value": value, "max": maximum})
+                    if profile is not None:
+                        profile.tick(node, value, maximum)
+                    last = progress_marks.get(node)
+                    if (
+                        last is None
+                        or value == maximum
+                        or (PROGRESS_EVERY > 0 and isinstance(value, int) and value % PROGRESS_EVERY == 0)
+                        or loop.time() - last >= PROGRESS_SECONDS
+                    ):
+                        progress_marks[node] = loop.time()
+                        write("node_progress", {"node": node, "value": value, "max": maximum})
                     if node is not None and value is not None and maximum is not None:
                         print(f"{node} progress {value}/{maximum}")
                 elif kind == "execution_error":
-                    message = data.get("exception_message") or ""
-                    write("execution_error", {"message": message})
-                    print(f"execution error {message}")
+                    details = _error_details(data)
+                    write("execution_error", details)
+                    print(f"execution error ({details['failure']}) {details['message']}")
+                    outcome["status"] = "error"
+                    outcome.update(details)
                     break
                 elif kind == "execution_interrupted":
                     write("execution_interrupted", {})
                     print("execution interrupted")
+                    outcome["status"] = "interrupted"
                     break
+        finally:
+            self.unsubscribe(prompt_id)
+            if sampler is not None:
+                sampler.cancel()
+            if profile is not None:
+                profile.finish()
+        return outcome
+    async def peek_history(self, prompt_id: str) -> Dict[str, Any] | None:
+        resp = await self._request("GET", f"/history/{prompt_id}")
+        data = resp.json()
+        return data.get(prompt_id)
     async def get_history(self, prompt_id: str) -> Dict[str, Any]:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(f"{self.http_url}/history/{prompt_id}")
-            data = resp.json()
-            return data[prompt_id]
+        resp = await self._request("GET", f"/history/{prompt_id}")
+        data = resp.json()
+        return data[prompt_id]
+class Worker:
+    def __init__(self, name: str, url: str, capacity: int) -> None:
+        self.name = name
+        self.url = url
+        self.capacity = max(1, capacity)
+        self.client = ComfyUIClient(url)
+        self.healthy = False
+        self.inflight = 0
+        self.queue_depth = 0
+    def load(self) -> float:
+        return max(self.queue_depth, self.inflight) / self.capacity
+class WorkerPool:
+    def __init__(self, servers: Sequence[Dict[str, Any]] | None = None, depth: int | None = None) -> None:
+        entries = list(servers if servers is not None else load_servers()) or [{"url": "127.0.0.1:8188"}]
+        self.workers: list[Worker] = []
+        for idx, entry in enumerate(entries):
+            capacity = depth or int(entry.get("max_inflight", PIPELINE_DEPTH))
+            self.workers.append(Worker(entry.get("name") or f"server{idx}", entry["url"], capacity))
+        self._changed: asyncio.Condition | None = None
+        self._monitor: asyncio.Task[None] | None = None
+    async def __aenter__(self) -> "WorkerPool":
+        self._changed = asyncio.Condition()
+        await self.refresh()
+        self._monitor = asyncio.create_task(self._watch())
+        return self
+    async def __aexit__(self, *exc_info: Any) -> None:
+        monitor = self._monitor
+        self._monitor = None
+        if monitor is not None:
+            monitor.cancel()
+            await asyncio.gather(monitor, return_exceptions=True)
+        await asyncio.gather(*(worker.client.close() for worker in self.workers))
+    async def _probe(self, worker: Worker) -> None:
+        was_healthy = worker.healthy
+        try:
+            await worker.client._request("GET", "/system_stats")
+            state = await worker.client.queue_state()
+        except httpx.HTTPError as exc:
+            worker.healthy = False
+            if was_healthy:
+                _write_log({"event": "server_down", "server": worker.name, "url": worker.url, "message": str(exc)})
+            return
+        worker.healthy = True
+        worker.queue_depth = len(state["running"]) + len(state["pending"])
+        if not was_healthy:
+            _write_log({"event": "server_up", "server": worker.name, "url": worker.url, "queue_depth": worker.queue_depth})
+    async def refresh(self) -> None:
+        await asyncio.gather(*(self._probe(worker) for worker in self.workers))
+        await self._notify()
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(HEALTH_INTERVAL_SECONDS)
+            await self.refresh()
+    async def _notify(self) -> None:
+        if self._changed is None:
+            return
+        async with self._changed:
+            self._changed.notify_all()
+    def _pick(self, exclude: set[str], prefer: Sequence[str] = ()) -> Worker | None:
+        candidates = [
+            worker
+            for worker in self.workers
+            if worker.healthy and worker.inflight < worker.capacity and worker.name not in exclude
+        ]
+        if not candidates:
+            return None
+        preferred = [worker for worker in candidates if worker.url in prefer]
+        return min(preferred or candidates, key=Worker.load)
+    async def acquire(self, exclude: set[str] | None = None, prefer: Sequence[str] = ()) -> Worker:
+        skipped = set(exclude or ())
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        loop = asyncio.get_running_loop()
+        deadline: float | None = None
+        async with self._changed:
+            while True:
+                worker = self._pick(skipped, prefer) or self._pick(set(), prefer)
+                if worker is not None:
+                    worker.inflight += 1
+                    worker.queue_depth += 1
+                    return worker
+                if any(worker.healthy for worker in self.workers):
+                    deadline = None
+                    await self._changed.wait()
+                    continue
+                if deadline is None:
+                    print("waiting for a healthy ComfyUI server")
+                    deadline = loop.time() + ACQUIRE_TIMEOUT_SECONDS
+                if ACQUIRE_TIMEOUT_SECONDS <= 0:
+                    await self._changed.wait()
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise ConnectionError(f"no healthy ComfyUI server within {ACQUIRE_TIMEOUT_SECONDS:.0f}s")
+                try:
+                    await asyncio.wait_for(self._changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+    async def release(self, worker: Worker) -> None:
+        worker.inflight = max(0, worker.inflight - 1)
+        worker.queue_depth = max(0, worker.queue_depth - 1)
+        await self._notify()
+    async def mark_down(self, worker: Worker, reason: str) -> None:
+        if worker.healthy:
+            _write_log({"event": "server_down", "server": worker.name, "url": worker.url, "message": reason})
+        worker.healthy = False
+        await self._notify()
 def build_wan_workflow(prompt: str, **kwargs: Any) -> tuple[Dict[str, Any], Dict[str, Any]]:
     explicit_quantization = "quantization" in kwargs and kwargs.get("quantization") is not None
     preset_name = kwargs.get("preset")
-    if preset_name:
-        presets = load_presets()
-        preset = presets.get(preset_name, {})
-        defaults = load_defaults()
-        merged = dict(defaults)
+    preset = load_presets().get(preset_name, {}) if preset_name else {}
+    profile_name = kwargs.get("vram_profile") or preset.get("vram_profile")
+    profile = load_vram_profiles().get(profile_name, {}) if profile_name else {}
+    if preset_name or profile:
+        merged = dict(load_defaults()) if preset_name else {}
+        merged.update(profile)
         merged.update(preset)
         merged.update(kwargs)
         kwargs = merged
@@ -352,6 +904,9 @@ def build_wan_workflow(prompt: str, **kwargs: Any) -> tuple[Dict[str, Any], Dict
     if not explicit_quantization or quantization is None:
         quantization = _resolve_quantization(model_name)
     vae_name = kwargs.get("vae_name", "Wan2_1_VAE_bf16.safetensors")
+    tiling = tiling_policy(width, height, frames, kwargs.get("vae_tiling", "auto"))
+    tiling.update((key, kwargs[key]) for key in TILE_KEYS if key in kwargs)
+    blocks_to_swap = int(kwargs.get("blocks_to_swap", 0) or 0)
     filename_prefix = kwargs.get("filename_prefix", "wan_output")
     negative_prompt = kwargs.get("negative_prompt", "")
     schedulers = kwargs.get("schedulers", {})
@@ -376,6 +931,9 @@ def build_wan_workflow(prompt: str, **kwargs: Any) -> tuple[Dict[str, Any], Dict
         "model_name": model_name,
         "quantization": quantization,
         "vae_name": vae_name,
+        "vram_profile": profile_name,
+        "blocks_to_swap": blocks_to_swap,
+        **tiling,
         "filename_prefix": filename_prefix,
         "negative_prompt": negative_prompt,
         "stage_one_scheduler": stage_one_scheduler,
@@ -423,6 +981,17 @@ def build_wan_workflow(prompt: str, **kwargs: Any) -> tuple[Dict[str, Any], Dict
             },
         },
     }
+    if blocks_to_swap:
+        workflow["9"] = {
+            "class_type": "WanVideoBlockSwap",
+            "inputs": {
+                "blocks_to_swap": blocks_to_swap,
+                "offload_img_emb": False,
+                "offload_txt_emb": False,
+                "use_non_blocking": True,
+            },
+        }
+        workflow["2"]["inputs"]["block_swap_args"] = ["9", 0]
     if dual_stage_enabled:
         workflow["5"] = {
             "class_type": "WanVideoSampler",
@@ -483,11 +1052,11 @@ def build_wan_workflow(prompt: str, **kwargs: Any) -> tuple[Dict[str, Any], Dict
         "inputs": {
             "samples": sampler_output,
             "vae": ["3", 0],
-            "enable_vae_tiling": False,
-            "tile_x": 272,
-            "tile_y": 272,
-            "tile_stride_x": 144,
-            "tile_stride_y": 128,
+            "enable_vae_tiling": tiling["vae_tiling"],
+            "tile_x": tiling["tile_x"],
+            "tile_y": tiling["tile_y"],
+            "tile_stride_x": tiling["tile_stride_x"],
+            "tile_stride_y": tiling["tile_stride_y"],
         },
     }
     workflow[combine_key] = {
@@ -503,216 +1072,531 @@ def build_wan_workflow(prompt: str, **kwargs: Any) -> tuple[Dict[str, Any], Dict
         },
     }
     return workflow, parameters
-async def generate_video(prompt: str, mode: str = "wan", **kwargs: Any) -> Dict[str, Any]:
-    client = ComfyUIClient()
+class Job:
+    def __init__(self, prompt: str, mode: str, options: Dict[str, Any], use_schedule: bool | None) -> None:
+        self.mode = mode
+        enqueue = options.pop("enqueue", None)
+        use_cache = options.pop("use_cache", None)
+        self.priority = int(options.pop("priority", 0) or 0)
+        self.deadline = _parse_deadline(options.pop("deadline", None))
+        self.options = options
+        self.preset = options.get("preset")
+        self.parameters_snapshot = dict(options)
+        self.used_prompt = prompt
+        self.enriched_prompt = prompt
+        self.workflow: Dict[str, Any] = {}
+        self.workflow_parameters: Dict[str, Any] = {}
+        self.build_args: Dict[str, Any] = {}
+        self.rejected = ""
+        self.recovery: list[Dict[str, Any]] = []
+        self.ladder_position = 0
+        self.digest = ""
+        self.job_id = ""
+        self.words = 0
+        self.schedule_active = SCHEDULING_ENABLED if use_schedule is None else bool(use_schedule)
+        self.schedule_mode = "window" if self.schedule_active else "immediate"
+        self.enqueue = SCHEDULER_DAEMON if enqueue is None else bool(enqueue)
+        self.use_cache = CACHE_ENABLED if use_cache is None else bool(use_cache)
+        self.cache_key = ""
+        self.embed_key = ""
+        self.embeds_known = False
+        self.position = 0
+        self.tracking_session: Any = None
+        self.window_start: datetime | None = None
+        self.submitted_at: datetime | None = None
+        self.prompt_id = ""
+        self.server = ""
+        self.outcome: Dict[str, Any] = {}
+        self.history: Dict[str, Any] = {}
+        self.profile: JobProfile | None = None
+    def context(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "preset": self.preset,
+            "prompt_digest": self.digest,
+            "schedule_mode": self.schedule_mode,
+        }
+    def schedule_payload(self, event: str) -> Dict[str, Any]:
+        window_start = self.window_start or _current_time()
+        return {
+            "event": event,
+            "mode": self.mode,
+            "preset": self.preset,
+            "prompt_digest": self.digest,
+            "job_id": self.job_id,
+            "window_start_local": window_start.isoformat(timespec="seconds"),
+            "window_start_utc": _utc_stamp(window_start),
+            "words": self.words,
+            "schedule_mode": self.schedule_mode,
+        }
+async def _prepare_job(prompt: str, mode: str, **kwargs: Any) -> Job:
     options = dict(kwargs)
     use_schedule_flag = options.pop("use_schedule", None)
-    preset = options.get("preset")
-    parameters_snapshot = dict(options)
-    used_prompt = prompt
-    workflow: Dict[str, Any]
-    workflow_parameters: Dict[str, Any]
-    enriched_prompt = used_prompt
+    job = Job(prompt, mode, options, use_schedule_flag)
+    build_args: Dict[str, Any] | None = None
     if mode == "wan":
-        enriched_prompt = enrich_prompt(used_prompt)
-        workflow, workflow_parameters = build_wan_workflow(enriched_prompt, **options)
+        job.enriched_prompt = enrich_prompt(prompt)
+        build_args = dict(options)
     else:
-        template = WAN_TEMPLATES.get(mode)
+        template = load_templates().get(mode)
         if template:
             data = template.copy()
             data.update(options)
             template_prompt = data.pop("prompt", "")
-            used_prompt = prompt or template_prompt
-            enriched_prompt = enrich_prompt(used_prompt)
-            workflow, workflow_parameters = build_wan_workflow(enriched_prompt, **data)
-        else:
-            workflow = {}
-            workflow_parameters = {}
-    digest = _prompt_digest(used_prompt)
-    words = len(used_prompt.split())
-    schedule_active = SCHEDULING_ENABLED if use_schedule_flag is None else bool(use_schedule_flag)
-    schedule_mode = "window" if schedule_active else "immediate"
-    tracking_parameters = dict(workflow_parameters)
-    for key, value in parameters_snapshot.items():
+            job.used_prompt = prompt or template_prompt
+            job.enriched_prompt = enrich_prompt(job.used_prompt)
+            build_args = data
+    job.digest = _prompt_digest(job.used_prompt)
+    job.job_id = _job_id(mode, job.used_prompt, job.parameters_snapshot)
+    job.words = len(job.used_prompt.split())
+    if build_args is not None:
+        job.build_args = build_args
+        job.workflow, job.workflow_parameters = build_wan_workflow(job.enriched_prompt, **build_args)
+        _preflight_job(job)
+    if job.workflow:
+        job.cache_key = workflow_key(job.workflow)
+        job.embed_key = text_embed_key(job.workflow)
+    return job
+def _preflight_job(job: Job) -> None:
+    try:
+        changes, estimate = preflight(job.workflow_parameters)
+    except VRAMBudgetError as exc:
+        job.rejected = str(exc)
+        changes, estimate = {}, estimate_vram(job.workflow_parameters)
+    if changes:
+        job.build_args.update(changes)
+        job.workflow, job.workflow_parameters = build_wan_workflow(job.enriched_prompt, **job.build_args)
+    if not changes and not job.rejected:
+        return
+    _write_log(
+        {
+            "event": "vram_preflight",
+            "mode": job.mode,
+            "preset": job.preset,
+            "prompt_digest": job.digest,
+            "budget_gb": BUDGET_GB,
+            "estimate": estimate,
+            "adjustments": changes,
+            "rejected": job.rejected or None,
+        }
+    )
+    if job.rejected:
+        print(f"Rejected {job.digest}: {job.rejected}")
+    else:
+        print(f"Adjusted {job.digest} to fit {BUDGET_GB:.0f} GiB VRAM: {changes}")
+async def _cached_result(job: Job) -> Dict[str, Any] | None:
+    if not job.use_cache or not job.cache_key:
+        return None
+    entry = await asyncio.to_thread(RESULT_CACHE.lookup, job.cache_key)
+    if entry is None:
+        return None
+    paths = list(entry["files"])
+    _write_log(
+        {
+            "event": "cache_hit",
+            "mode": job.mode,
+            "preset": job.preset,
+            "prompt_digest": job.digest,
+            "cache_key": job.cache_key,
+            "output_paths": paths,
+            "schedule_mode": job.schedule_mode,
+        }
+    )
+    _write_schedule_log(job.schedule_payload("cache_hit"))
+    print(f"Reusing cached result {job.cache_key[:16]} ({len(paths)} output(s))")
+    return entry["history"]
+async def _open_session(job: Job) -> None:
+    tracking_parameters = dict(job.workflow_parameters)
+    for key, value in job.parameters_snapshot.items():
         tracking_parameters.setdefault(key, value)
-    tracking_session = create_session(
-        mode=mode,
-        preset=preset,
-        digest=digest,
-        prompt=used_prompt,
-        enriched_prompt=enriched_prompt,
+    job.tracking_session = await asyncio.to_thread(
+        create_session,
+        mode=job.mode,
+        preset=job.preset,
+        digest=job.digest,
+        prompt=job.used_prompt,
+        enriched_prompt=job.enriched_prompt,
         parameters=tracking_parameters,
-        workflow=workflow,
-        schedule_mode=schedule_mode,
+        workflow=job.workflow,
+        schedule_mode=job.schedule_mode,
     )
-    if schedule_active:
-        window_start = await _align_to_window(
-            mode,
-            preset,
-            digest,
-            words,
-            used_prompt,
-            schedule_mode,
-            parameters_snapshot,
+def _enqueue_job(job: Job) -> None:
+    job.window_start = _next_window_start(_current_time())
+    payload = job.schedule_payload("scheduled")
+    payload["prompt"] = job.used_prompt
+    payload["parameters"] = job.parameters_snapshot
+    payload["priority"] = job.priority
+    payload["deadline_utc"] = job.deadline
+    payload["workload"] = workload(job.workflow_parameters)
+    _write_schedule_log(payload)
+    print(f"Queued {job.digest} for the window at {payload['window_start_local']} (priority {job.priority})")
+async def _schedule_job(job: Job) -> bool:
+    if job.schedule_active and job.enqueue:
+        _enqueue_job(job)
+        return False
+    if job.schedule_active:
+        job.window_start = await _align_to_window(
+            job.mode,
+            job.preset,
+            job.digest,
+            job.job_id,
+            job.words,
+            job.used_prompt,
+            job.schedule_mode,
+            job.parameters_snapshot,
         )
     else:
-        window_start = _current_time()
-        _write_schedule_log(
-            {
-                "event": "schedule_immediate",
-                "mode": mode,
-                "preset": preset,
-                "prompt_digest": digest,
-                "window_start_local": window_start.isoformat(timespec="seconds"),
-                "window_start_utc": _utc_stamp(window_start),
-                "words": words,
-                "schedule_mode": schedule_mode,
-                "prompt": used_prompt,
-                "parameters": parameters_snapshot,
-            }
-        )
-    tracking_session.log_window(window_start)
-    start_time = datetime.utcnow()
-    tracking_session.set_start(start_time)
-    _write_schedule_log(
+        job.window_start = _current_time()
+        payload = job.schedule_payload("schedule_immediate")
+        payload["prompt"] = job.used_prompt
+        payload["parameters"] = job.parameters_snapshot
+        _write_schedule_log(payload)
+    await _open_session(job)
+    job.tracking_session.log_window(job.window_start)
+    return True
+async def _submit_job(client: ComfyUIClient, job: Job) -> None:
+    job.submitted_at = datetime.utcnow()
+    _write_log(
         {
-            "event": "execution_started",
-            "mode": mode,
-            "preset": preset,
-            "prompt_digest": digest,
-            "window_start_local": window_start.isoformat(timespec="seconds"),
-            "window_start_utc": _utc_stamp(window_start),
-            "words": words,
-            "schedule_mode": schedule_mode,
+            "event": "queue_start",
+            "mode": job.mode,
+            "preset": job.preset,
+            "prompt_digest": job.digest,
+            "words": job.words,
+            "schedule_mode": job.schedule_mode,
         }
     )
+    job.prompt_id = uuid.uuid4().hex
+    job.prompt_id = await client.queue_prompt(job.workflow, job.prompt_id)
+    job.server = client.server_url
+    payload = job.schedule_payload("execution_started")
+    payload["prompt_id"] = job.prompt_id
+    payload["server"] = client.server_url
+    _write_schedule_log(payload)
+    if TEXT_EMBEDS_ENABLED and job.embed_key:
+        job.embeds_known = client.server_url in await asyncio.to_thread(TEXT_EMBEDS.servers, job.embed_key)
+    job.tracking_session.log_queue(job.prompt_id)
     _write_log(
         {
-            "event": "queue_start",
-            "mode": mode,
-            "preset": preset,
-            "prompt_digest": digest,
-            "words": words,
-            "schedule_mode": schedule_mode,
+            "event": "queued",
+            "mode": job.mode,
+            "preset": job.preset,
+            "prompt_id": job.prompt_id,
+            "prompt_digest": job.digest,
+            "schedule_mode": job.schedule_mode,
+            "server": client.server_url,
+            "model_name": job.workflow_parameters.get("model_name"),
+            "nodes": {key: node.get("class_type") for key, node in job.workflow.items()},
         }
     )
-    prompt_id = await client.queue_prompt(workflow)
-    tracking_session.log_queue(prompt_id)
+async def _await_job(client: ComfyUIClient, job: Job) -> None:
+    job.profile = JobProfile(job.workflow) if PROFILE_ENABLED else None
+    job.outcome = await client.wait_for_completion(job.prompt_id, job.context(), profile=job.profile)
+    job.history = await client.peek_history(job.prompt_id) or {}
+async def _recover_job(job: Job) -> bool:
+    if job.outcome.get("failure") != "oom" or not job.build_args or len(job.recovery) >= RECOVERY_ATTEMPTS:
+        return False
+    current = {**job.workflow_parameters, "preset": job.build_args.get("preset")}
+    before = estimate_vram(job.workflow_parameters)
+    while job.ladder_position < len(RECOVERY_LADDER):
+        rung = RECOVERY_LADDER[job.ladder_position]
+        job.ladder_position += 1
+        step = degrade(rung, current)
+        if not step:
+            continue
+        build_args = {**job.build_args, **step}
+        workflow, parameters = build_wan_workflow(job.enriched_prompt, **build_args)
+        after = estimate_vram(parameters)
+        if any(after[phase] < before[phase] for phase in ("text_encoder_gb", "sampling_gb", "decode_gb")):
+            break
+    else:
+        return False
+    try:
+        await asyncio.to_thread(resolve_models, [parameters])
+    except (OSError, httpx.HTTPError) as exc:
+        print(f"Cannot retry {job.digest} with {rung}: {exc}")
+        return await _recover_job(job)
+    job.build_args = build_args
+    job.workflow, job.workflow_parameters = workflow, parameters
+    job.cache_key = workflow_key(workflow)
+    job.embed_key = text_embed_key(workflow)
+    job.recovery.append({"rung": rung, "adjustments": step})
     _write_log(
         {
-            "event": "queued",
-            "mode": mode,
-            "preset": preset,
-            "prompt_id": prompt_id,
-            "prompt_digest": digest,
-            "schedule_mode": schedule_mode,
+            "event": "oom_retry",
+            "mode": job.mode,
+            "preset": job.preset,
+            "prompt_id": job.prompt_id,
+            "prompt_digest": job.digest,
+            "attempt": len(job.recovery),
+            "rung": rung,
+            "adjustments": step,
+            "message": job.outcome.get("message", ""),
         }
     )
-    wait_context = {
-        "mode": mode,
-        "preset": preset,
-        "prompt_digest": digest,
-        "schedule_mode": schedule_mode,
+    print(f"Out of memory on {job.digest}; retrying with {rung}: {step}")
+    return True
+async def _abandon(worker: Worker, job: Job) -> None:
+    if not job.prompt_id:
+        return
+    try:
+        await worker.client.cancel(job.prompt_id)
+    except (httpx.HTTPError, ConnectionError):
+        return
+    _write_log({"event": "prompt_cancelled", "prompt_id": job.prompt_id, "prompt_digest": job.digest, "server": worker.name})
+async def _dispatch_job(pool: WorkerPool, job: Job, worker: Worker) -> Worker:
+    tried: set[str] = set()
+    attempts = 0
+    while True:
+        try:
+            await _submit_job(worker.client, job)
+            return worker
+        except httpx.HTTPStatusError as exc:
+            if exc.response.status_code >= 500:
+                failure: Exception = exc
+            else:
+                await pool.release(worker)
+                raise PromptRejectedError(worker.name, exc.response.status_code, _response_body(exc.response)) from exc
+        except (httpx.HTTPError, ConnectionError) as exc:
+            failure = exc
+        await _abandon(worker, job)
+        attempts += 1
+        tried.add(worker.name)
+        await pool.mark_down(worker, str(failure))
+        await pool.release(worker)
+        if attempts > FAILOVER_ATTEMPTS:
+            raise failure
+        _write_log({"event": "failover", "prompt_digest": job.digest, "server": worker.name, "stage": "submit"})
+        worker = await pool.acquire(tried)
+async def _complete_job(pool: WorkerPool, job: Job, worker: Worker) -> Dict[str, Any]:
+    tried: set[str] = set()
+    attempts = 0
+    held: Worker | None = worker
+    try:
+        while True:
+            try:
+                await _await_job(worker.client, job)
+            except (httpx.HTTPError, ConnectionError) as exc:
+                job.outcome = {"status": "lost", "started_at": None, "message": str(exc)}
+            if job.outcome.get("status") == "error" and await _recover_job(job):
+                held = None
+                worker = held = await _dispatch_job(pool, job, worker)
+                continue
+            if job.outcome.get("status") != "lost" or attempts >= FAILOVER_ATTEMPTS:
+                break
+            attempts += 1
+            tried.add(worker.name)
+            held = None
+            await _abandon(worker, job)
+            await pool.mark_down(worker, job.outcome.get("message", "prompt lost"))
+            await pool.release(worker)
+            _write_log({"event": "failover", "prompt_digest": job.digest, "server": worker.name, "stage": "execution"})
+            worker = held = await _dispatch_job(pool, job, await pool.acquire(tried))
+        return await _finish_job(job)
+    finally:
+        if held is not None:
+            await pool.release(held)
+async def _run_job(pool: WorkerPool, job: Job, worker: Worker) -> Dict[str, Any]:
+    try:
+        return await _complete_job(pool, job, worker)
+    except Exception as exc:
+        return await _fail_job(job, "execution", exc)
+async def _fail_job(job: Job, stage: str, exc: Exception) -> Dict[str, Any]:
+    message = str(exc) or type(exc).__name__
+    job.outcome = {
+        "status": "failed",
+        "started_at": None,
+        "failure": "invalid_prompt" if isinstance(exc, PromptRejectedError) else stage,
+        "exception_type": type(exc).__name__,
+        "message": message,
     }
-    await client.wait_for_completion(prompt_id, wait_context)
-    history = await client.get_history(prompt_id)
+    job.history = {"error": {"stage": stage, "type": type(exc).__name__, "message": message}}
+    if isinstance(exc, PromptRejectedError):
+        job.history["error"]["response"] = exc.body
+    print(f"Job {job.digest} failed during {stage}: {message}")
+    return await _finish_job(job)
+async def _finish_job(job: Job) -> Dict[str, Any]:
+    history = job.history
     end_time = datetime.utcnow()
+    start_time = job.outcome.get("started_at") or job.submitted_at or end_time
     elapsed = (end_time - start_time).total_seconds()
     outputs = history.get("outputs") if isinstance(history, dict) else None
     nodes = list(outputs) if isinstance(outputs, dict) else []
     paths = _collect_output_paths(history) if isinstance(history, dict) else []
     history_payload = history if isinstance(history, dict) else {}
-    tracking_session.log_completion(
-        elapsed,
-        end_time,
-        nodes,
-        paths,
-        history_payload,
-    )
+    status = job.outcome.get("status", "completed")
+    encoder = text_encoder_node(job.workflow)
+    text_embeds = None
+    if encoder is not None:
+        if encoder in job.outcome.get("cached_nodes", ()):
+            text_embeds = "cached"
+        else:
+            text_embeds = "disk" if job.embeds_known else "encoded"
+    rungs = [step["rung"] for step in job.recovery]
+    adjustments: Dict[str, Any] = {}
+    for step in job.recovery:
+        adjustments.update(step["adjustments"])
+    session = job.tracking_session
+    session.set_start(start_time)
+    await asyncio.to_thread(session.log_outcome, status, job.outcome.get("failure"), rungs, adjustments)
+    if job.profile is not None and job.profile.spans:
+        summary = job.profile.summary()
+        trace = job.profile.trace(job.server or "comfyui")
+        trace_path = await asyncio.to_thread(write_trace, trace, f"{job.digest}-{job.prompt_id}")
+        await asyncio.to_thread(session.log_profile, summary, job.profile.series(), trace)
+        _write_log(
+            {
+                "event": "job_profile",
+                "mode": job.mode,
+                "preset": job.preset,
+                "prompt_id": job.prompt_id,
+                "prompt_digest": job.digest,
+                "node_seconds": {node: round(seconds, 3) for node, seconds in job.profile.node_seconds().items()},
+                "trace_path": str(trace_path),
+                **summary,
+            }
+        )
+    await asyncio.to_thread(session.log_completion, elapsed, end_time, nodes, paths, history_payload)
+    if job.use_cache and job.cache_key and paths and status == "completed":
+        await asyncio.to_thread(RESULT_CACHE.store, job.cache_key, history_payload, paths)
+    if TEXT_EMBEDS_ENABLED and job.embed_key and job.server and status == "completed":
+        await asyncio.to_thread(TEXT_EMBEDS.record, job.embed_key, job.server)
     _write_log(
         {
             "event": "completed",
-            "mode": mode,
-            "preset": preset,
-            "prompt_id": prompt_id,
-            "prompt_digest": digest,
+            "mode": job.mode,
+            "preset": job.preset,
+            "prompt_id": job.prompt_id,
+            "prompt_digest": job.digest,
             "elapsed_seconds": round(elapsed, 2),
             "output_nodes": nodes,
             "output_paths": paths,
-            "schedule_mode": schedule_mode,
-        }
-    )
-    _write_schedule_log(
-        {
-            "event": "execution_completed",
-            "mode": mode,
-            "preset": preset,
-            "prompt_digest": digest,
-            "elapsed_seconds": round(elapsed, 2),
-            "window_start_local": window_start.isoformat(timespec="seconds"),
-            "window_start_utc": _utc_stamp(window_start),
-            "words": words,
-            "schedule_mode": schedule_mode,
+            "schedule_mode": job.schedule_mode,
+            "status": status,
+            "failure": job.outcome.get("failure"),
+            "exception_type": job.outcome.get("exception_type"),
+            "message": job.outcome.get("message") or None,
+            "recovery": rungs,
+            "text_embeds": text_embeds,
+            "embed_key": job.embed_key[:16] or None,
         }
     )
+    if rungs and status == "completed":
+        _write_log(
+            {
+                "event": "oom_recovered",
+                "mode": job.mode,
+                "preset": job.preset,
+                "prompt_digest": job.digest,
+                "rung": rungs[-1],
+                "rungs": rungs,
+                "adjustments": adjustments,
+            }
+        )
+        print(f"Recovered {job.digest} from out of memory via {', '.join(rungs)}")
+    payload = job.schedule_payload("execution_completed" if status == "completed" else "execution_failed")
+    payload["elapsed_seconds"] = round(elapsed, 2)
+    if status != "completed":
+        payload["failure"] = job.outcome.get("failure")
+    _write_schedule_log(payload)
     return history
-async def generate_templates(names: list[str] | None = None) -> list[Dict[str, Any]]:
-    selection = list(WAN_TEMPLATES) if names is None else [name for name in names if name in WAN_TEMPLATES]
-    results: list[Dict[str, Any]] = []
-    for name in selection:
-        results.append(await generate_video("", name))
-    return results
-async def batch_generate(prompts: list[str], mode: str = "wan", **kwargs: Any) -> list[Dict[str, Any]]:
-    results: list[Dict[str, Any]] = []
-    for prompt in prompts:
-        results.append(await generate_video(prompt, mode, **kwargs))
-    return results
-def pending_scheduled_jobs() -> list[Dict[str, Any]]:
-    if not SCHEDULE_LOG_FILE.exists():
-        return []
-    lines = SCHEDULE_LOG_FILE.read_text(encoding="utf-8").splitlines()
-    entries: list[Dict[str, Any]] = []
-    for line in lines:
-        if line:
-            entries.append(json.loads(line))
-    pending_map: dict[str, Dict[str, Any]] = {}
-    order: list[str] = []
-    for entry in entries:
-        digest = entry.get("prompt_digest")
-        if not digest:
-            continue
-        event = entry.get("event")
-        if event in {"execution_started", "execution_completed"}:
-            if digest in pending_map:
-                del pending_map[digest]
-            if digest in order:
-                order.remove(digest)
-            continue
-        if event == "schedule_immediate":
-            if digest in pending_map:
-                del pending_map[digest]
-            if digest in order:
-                order.remove(digest)
-            continue
-        if event in {"scheduled", "awaiting_window", "window_open", "window_active"}:
-            pending_map[digest] = entry
-            if digest not in order:
-                order.append(digest)
-    pending: list[Dict[str, Any]] = []
-    for digest in order:
-        entry = pending_map.get(digest)
-        if entry:
-            pending.append(entry)
-    return sorted(pending, key=lambda item: item.get("window_start_utc", item.get("timestamp", "")))
-async def run_scheduled_jobs(entries: list[Dict[str, Any]]) -> list[Dict[str, Any]]:
-    results: list[Dict[str, Any]] = []
-    for entry in entries:
-        parameters = dict(entry.get("parameters", {}))
-        preset = entry.get("preset")
-        if preset and "preset" not in parameters:
-            parameters["preset"] = preset
-        parameters["use_schedule"] = False
-        mode = entry.get("mode", "wan")
-        prompt = entry.get("prompt", "")
-        results.append(await generate_video(prompt, mode, **parameters))
-    return results
+async def generate_video(prompt: str, mode: str = "wan", **kwargs: Any) -> Dict[str, Any]:
+    results = await run_pipeline([(prompt, mode, kwargs)])
+    return results[0]
+async def _prepared_jobs(requests: Iterable[tuple[str, str, Dict[str, Any]]]) -> AsyncIterator[Job]:
+    if not isinstance(requests, Sequence):
+        for position, (prompt, mode, options) in enumerate(requests):
+            job = await _prepare_job(prompt, mode, **options)
+            job.position = position
+            yield job
+        return
+    jobs = [await _prepare_job(prompt, mode, **options) for prompt, mode, options in requests]
+    first: Dict[tuple[int, str], int] = {}
+    order: Dict[int, int] = {}
+    segment = 0
+    for position, job in enumerate(jobs):
+        job.position = position
+        if position and (job.priority, job.deadline) != (jobs[position - 1].priority, jobs[position - 1].deadline):
+            segment += 1
+        order[position] = first.setdefault((segment, job.embed_key or f"#{position}"), position)
+    if TEXT_EMBEDS_ENABLED:
+        jobs.sort(key=lambda job: order[job.position])
+    def prefetch() -> None:
+        runnable = [
+            job.workflow_parameters
+            for job in jobs
+            if not job.rejected
+            and not (job.schedule_active and job.enqueue)
+            and not (job.use_cache and job.cache_key and RESULT_CACHE.has(job.cache_key))
+        ]
+        resolve_models(runnable)
+    try:
+        await asyncio.to_thread(prefetch)
+    except Exception as exc:
+        print(f"Model prefetch failed, resolving per job: {exc}")
+    for job in jobs:
+        yield job
+async def run_pipeline(
+    requests: Iterable[tuple[str, str, Dict[str, Any]]],
+    depth: int | None = None,
+    servers: Sequence[Dict[str, Any]] | None = None,
+) -> list[Dict[str, Any]]:
+    refresh_settings()
+    slots: Dict[int, asyncio.Task[Dict[str, Any]] | Dict[str, Any]] = {}
+    async with WorkerPool(servers, depth) as pool, serve_metrics(pool):
+        async for job in _prepared_jobs(requests):
+            if job.rejected:
+                _write_schedule_log(job.schedule_payload("rejected"))
+                slots[job.position] = {}
+                continue
+            cached = await _cached_result(job)
+            if cached is not None:
+                slots[job.position] = cached
+                continue
+            if not await _schedule_job(job):
+                slots[job.position] = {}
+                continue
+            prefer = await asyncio.to_thread(TEXT_EMBEDS.servers, job.embed_key) if TEXT_EMBEDS_ENABLED and job.embed_key else []
+            try:
+                await asyncio.to_thread(resolve_models, [job.workflow_parameters])
+                worker = await _dispatch_job(pool, job, await pool.acquire(prefer=prefer))
+            except Exception as exc:
+                slots[job.position] = await _fail_job(job, "submit", exc)
+                continue
+            slots[job.position] = asyncio.create_task(_run_job(pool, job, worker))
+        tasks = {position: slot for position, slot in slots.items() if isinstance(slot, asyncio.Task)}
+        finished = await asyncio.gather(*tasks.values(), return_exceptions=True)
+        for position, result in zip(tasks, finished):
+            if not isinstance(result, dict):
+                result = {"error": {"stage": "execution", "type": type(result).__name__, "message": str(result)}}
+            slots[position] = result
+    await asyncio.to_thread(flush_tracking)
+    await asyncio.to_thread(flush_logs)
+    return [slot for _, slot in sorted(slots.items())]
+async def generate_templates(
+    names: list[str] | None = None,
+    depth: int | None = None,
+    use_cache: bool | None = None,
+) -> list[Dict[str, Any]]:
+    templates = load_templates()
+    selection = list(templates) if names is None else [name for name in names if name in templates]
+    options = {} if use_cache is None else {"use_cache": use_cache}
+    return await run_pipeline([("", name, dict(options)) for name in selection], depth)
+async def batch_generate(
+    prompts: list[str],
+    mode: str = "wan",
+    depth: int | None = None,
+    **kwargs: Any,
+) -> list[Dict[str, Any]]:
+    return await run_pipeline([(prompt, mode, dict(kwargs)) for prompt in prompts], depth)
+def scheduled_request(entry: Dict[str, Any]) -> tuple[str, str, Dict[str, Any]]:
+    parameters = dict(entry.get("parameters", {}))
+    preset = entry.get("preset")
+    if preset and "preset" not in parameters:
+        parameters["preset"] = preset
+    parameters["use_schedule"] = False
+    return entry.get("prompt", ""), entry.get("mode", "wan"), parameters
+def pending_scheduled_jobs(preset: str | None = None) -> list[Dict[str, Any]]:
+    return pending_jobs(preset)
+async def run_scheduled_jobs(entries: list[Dict[str, Any]], depth: int | None = None) -> list[Dict[str, Any]]:
+    return await run_pipeline([scheduled_request(entry) for entry in entries], depth)
@@ -0,0 +1,98 @@
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Sequence, Tuple
+from .workflows import load_scheduling
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_JOB_SECONDS: float
+CACHE_FILE: Path
+REFIT_SECONDS: float
+SAMPLE_LIMIT: int
+MIN_SAMPLES: int
+def refresh_settings() -> None:
+    global DEFAULT_JOB_SECONDS, CACHE_FILE, REFIT_SECONDS, SAMPLE_LIMIT, MIN_SAMPLES
+    scheduling = load_scheduling()
+    estimator = scheduling.get("estimator", {})
+    DEFAULT_JOB_SECONDS = float(scheduling.get("default_job_seconds", 900))
+    CACHE_FILE = PROJECT_ROOT / estimator.get("cache", "ComfyUI/logs/runtime_model.json")
+    REFIT_SECONDS = float(estimator.get("refit_hours", 12)) * 3600
+    SAMPLE_LIMIT = int(estimator.get("sample_limit", 500))
+    MIN_SAMPLES = int(estimator.get("min_samples", 3))
+refresh_settings()
+WORKLOAD_FIELDS = (
+    "model_name",
+    "width",
+    "height",
+    "frames",
+    "steps",
+    "dual_stage_enabled",
+    "stage_one_steps",
+    "stage_two_steps",
+    "text_encoder_name",
+    "vae_name",
+)
+def workload(parameters: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: parameters[key] for key in WORKLOAD_FIELDS if key in parameters}
+def _number(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+def work_units(values: Dict[str, Any]) -> float:
+    if str(values.get("dual_stage_enabled", False)).lower() == "true":
+        steps = _number(values.get("stage_one_steps")) + _number(values.get("stage_two_steps"))
+    else:
+        steps = _number(values.get("steps"))
+    pixels = _number(values.get("width")) * _number(values.get("height"))
+    return pixels * _number(values.get("frames")) * steps / 1e6
+def _fit_line(points: Sequence[Tuple[float, float]]) -> Dict[str, float]:
+    count = len(points)
+    mean_x = sum(x for x, _ in points) / count
+    mean_y = sum(y for _, y in points) / count
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / variance if variance else 0.0
+    intercept = mean_y - slope * mean_x
+    if slope <= 0 or intercept < 0:
+        slope = sum(x * y for x, y in points) / sum(x * x for x, _ in points)
+        intercept = 0.0
+    return {"slope": slope, "intercept": intercept, "samples": count}
+def fit(samples: Sequence[Tuple[Dict[str, Any], float]]) -> Dict[str, Any]:
+    grouped: Dict[str, list[Tuple[float, float]]] = {}
+    pooled: list[Tuple[float, float]] = []
+    for values, elapsed in samples:
+        units = work_units(values)
+        if units <= 0 or elapsed <= 0:
+            continue
+        point = (units, float(elapsed))
+        grouped.setdefault(str(values.get("model_name", "")), []).append(point)
+        pooled.append(point)
+    return {
+        "fitted_at": time.time(),
+        "models": {name: _fit_line(points) for name, points in grouped.items() if len(points) >= MIN_SAMPLES},
+        "global": _fit_line(pooled) if len(pooled) >= MIN_SAMPLES else None,
+    }
+class RuntimeModel:
+    def __init__(self, data: Dict[str, Any] | None = None) -> None:
+        self.data = data or {"fitted_at": 0.0, "models": {}, "global": None}
+    def predict(self, values: Dict[str, Any] | None) -> float:
+        units = work_units(values or {})
+        line = self.data["models"].get(str((values or {}).get("model_name", ""))) or self.data["global"]
+        if units <= 0 or not line:
+            return DEFAULT_JOB_SECONDS
+        return line["slope"] * units + line["intercept"]
+    def estimate(self, entry: Dict[str, Any]) -> float:
+        return float(entry.get("estimated_seconds") or self.predict(entry.get("workload")))
+def load_model(refresh: bool = False, cached_only: bool = False) -> RuntimeModel:
+    cached: Dict[str, Any] | None = None
+    if CACHE_FILE.exists():
+        cached = json.loads(CACHE_FILE.read_text(encoding="utf-8"))
+    if not refresh and (cached_only or (cached is not None and time.time() - cached.get("fitted_at", 0.0) < REFIT_SECONDS)):
+        return RuntimeModel(cached)
+    from .tracking import run_samples
+    samples = run_samples(SAMPLE_LIMIT)
+    if not samples:
+        return RuntimeModel(cached)
+    data = fit(samples)
+    CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    CACHE_FILE.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    return RuntimeModel(data)
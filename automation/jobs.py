@@ -0,0 +1,164 @@
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterable
+from .logs import log_sink
+from .workflows import load_scheduling
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+SCHEDULE_LOG_FILE: Path
+STORE_FILE: Path
+def refresh_settings() -> None:
+    global SCHEDULE_LOG_FILE, STORE_FILE
+    config = load_scheduling()
+    SCHEDULE_LOG_FILE = PROJECT_ROOT / config.get("metadata_log", "ComfyUI/logs/automation_schedule.jsonl")
+    STORE_FILE = PROJECT_ROOT / config.get("job_store", "ComfyUI/logs/automation_jobs.sqlite3")
+refresh_settings()
+PENDING_EVENTS = {"scheduled", "awaiting_window", "window_open", "window_active"}
+DONE_EVENTS = {"execution_started", "execution_completed", "schedule_immediate", "expired", "cache_hit", "rejected"}
+FAILED_EVENTS = {"execution_failed"}
+STATE_EVENTS = PENDING_EVENTS | DONE_EVENTS | FAILED_EVENTS
+SCHEMA_VERSION = "2"
+META_SCHEMA = "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS jobs ("
+    " job_id TEXT PRIMARY KEY,"
+    " digest TEXT NOT NULL,"
+    " status TEXT NOT NULL,"
+    " sort_key TEXT NOT NULL,"
+    " seq INTEGER NOT NULL,"
+    " preset TEXT,"
+    " entry TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, sort_key, seq)",
+)
+def job_key(entry: Dict[str, Any]) -> str:
+    return entry.get("job_id") or entry.get("prompt_digest") or ""
+class JobStore:
+    def __init__(self, path: Path | None = None, log_path: Path | None = None) -> None:
+        path = STORE_FILE if path is None else path
+        self.path = path
+        self.log_path = SCHEDULE_LOG_FILE if log_path is None else log_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(META_SCHEMA)
+        if self._meta("schema", "1") != SCHEMA_VERSION:
+            self.conn.execute("DROP TABLE IF EXISTS jobs")
+            self._set_meta("log_offset", "0")
+            self._set_meta("schema", SCHEMA_VERSION)
+        for statement in SCHEMA:
+            self.conn.execute(statement)
+    def close(self) -> None:
+        self.conn.close()
+    def _meta(self, key: str, default: str) -> str:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+    def _set_meta(self, key: str, value: str) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+    def _apply(self, entry: Dict[str, Any]) -> None:
+        key = job_key(entry)
+        if not key:
+            return
+        event = entry.get("event")
+        if event in DONE_EVENTS or event in FAILED_EVENTS:
+            status = "done" if event in DONE_EVENTS else "failed"
+            self.conn.execute("UPDATE jobs SET status = ? WHERE job_id IN (?, ?)", (status, key, entry.get("prompt_digest", "")))
+            return
+        if event not in PENDING_EVENTS:
+            return
+        row = self.conn.execute("SELECT status, seq FROM jobs WHERE job_id = ?", (key,)).fetchone()
+        if row and row[0] == "pending":
+            seq = row[1]
+        else:
+            seq = int(self._meta("seq", "0")) + 1
+            self._set_meta("seq", str(seq))
+        sort_key = entry.get("window_start_utc", entry.get("timestamp", ""))
+        self.conn.execute(
+            "INSERT OR REPLACE INTO jobs (job_id, digest, status, sort_key, seq, preset, entry) VALUES (?, ?, 'pending', ?, ?, ?, ?)",
+            (key, entry.get("prompt_digest", ""), sort_key, seq, entry.get("preset"), json.dumps(entry, ensure_ascii=False)),
+        )
+    def sync(self) -> None:
+        if not self.log_path.exists():
+            return
+        size = self.log_path.stat().st_size
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            offset = int(self._meta("log_offset", "0"))
+            if size < offset:
+                self.conn.execute("DELETE FROM jobs")
+                offset = 0
+            with self.log_path.open("rb") as handle:
+                handle.seek(offset)
+                for raw in handle:
+                    if not raw.endswith(b"\n"):
+                        break
+                    offset += len(raw)
+                    line = raw.strip()
+                    if line:
+                        self._apply(json.loads(line))
+            self._set_meta("log_offset", str(offset))
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+    def pending(self, preset: str | None = None) -> list[Dict[str, Any]]:
+        self.sync()
+        if preset:
+            rows: Iterable[tuple[str]] = self.conn.execute(
+                "SELECT entry FROM jobs WHERE status = 'pending' AND preset = ? ORDER BY sort_key, seq",
+                (preset,),
+            )
+        else:
+            rows = self.conn.execute("SELECT entry FROM jobs WHERE status = 'pending' ORDER BY sort_key, seq")
+        return [json.loads(row[0]) for row in rows]
+    def compact(self) -> int:
+        if not self.log_path.exists():
+            return 0
+        kept: Dict[str, list[tuple[int, bytes]]] = {}
+        end = 0
+        with self.log_path.open("rb") as handle:
+            for index, raw in enumerate(handle):
+                if not raw.endswith(b"\n"):
+                    break
+                end += len(raw)
+                line = raw.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                key = job_key(entry)
+                if not key:
+                    continue
+                if entry.get("event") in STATE_EVENTS:
+                    kept[key] = [(index, raw)]
+                else:
+                    kept.setdefault(key, []).append((index, raw))
+        lines = sorted(item for items in kept.values() for item in items)
+        temp = self.log_path.with_suffix(self.log_path.suffix + ".compact")
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            with log_sink(self.log_path, max_delay=0, rotate_bytes=0, rotate_daily=False).locked():
+                with temp.open("wb") as out:
+                    out.writelines(raw for _, raw in lines)
+                    with self.log_path.open("rb") as handle:
+                        handle.seek(end)
+                        out.write(handle.read())
+                temp.replace(self.log_path)
+            self.conn.execute("DELETE FROM jobs")
+            self._set_meta("log_offset", "0")
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.sync()
+        return len(lines)
+def pending_jobs(preset: str | None = None) -> list[Dict[str, Any]]:
+    store = JobStore()
+    try:
+        return store.pending(preset)
+    finally:
+        store.close()
+def compact_schedule_log() -> int:
+    store = JobStore()
+    try:
+        return store.compact()
+    finally:
+        store.close()
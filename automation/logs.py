@@ -1,17 +1,172 @@
+import atexit
+import gzip
 import json
-from datetime import datetime
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Iterator
 from . import COMFY_ROOT
+from .workflows import load_logging
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 LOG_DIRECTORY = COMFY_ROOT / "logs"
+FLUSH_LINES: int
+FLUSH_SECONDS: float
+ROTATE_BYTES: int
+ROTATE_DAILY: bool
+ROTATE_KEEP: int
+COMPRESS: bool
+PROGRESS_EVERY: int
+PROGRESS_SECONDS: float
 def _timestamp() -> str:
-    return datetime.utcnow().isoformat(timespec="seconds") + "Z"
-def append_log(path: Path, payload: Dict[str, Any]) -> None:
+    return datetime.utcnow().isoformat(timespec="milliseconds") + "Z"
+def _encode(payload: Dict[str, Any]) -> bytes:
     data = dict(payload)
     if not data.get("timestamp"):
         data["timestamp"] = _timestamp()
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("a", encoding="utf-8") as handle:
-        handle.write(json.dumps(data, ensure_ascii=False) + "\n")
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_APPEND_NEWLINE)
+        except TypeError:
+            pass
+    return (json.dumps(data, ensure_ascii=False) + "\n").encode("utf-8")
+def rotated_logs(path: Path) -> list[Path]:
+    return sorted(path.parent.glob(f"{path.stem}-*{path.suffix}*"))
+def rotate_log(path: Path, compress: bool | None = None, keep: int | None = None) -> Path | None:
+    if not path.exists() or not path.stat().st_size:
+        return None
+    compress = COMPRESS if compress is None else compress
+    keep = ROTATE_KEEP if keep is None else keep
+    target = path.with_name(f"{path.stem}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S-%f')}{path.suffix}")
+    path.replace(target)
+    if compress:
+        packed = target.with_name(target.name + ".gz")
+        with target.open("rb") as source, gzip.open(packed, "wb") as out:
+            shutil.copyfileobj(source, out)
+        target.unlink()
+        target = packed
+    if keep > 0:
+        for stale in rotated_logs(path)[:-keep]:
+            stale.unlink()
+    return target
+class BufferedLogWriter:
+    def __init__(
+        self,
+        path: Path,
+        max_lines: int | None = None,
+        max_delay: float | None = None,
+        rotate_bytes: int | None = None,
+        rotate_daily: bool | None = None,
+    ) -> None:
+        self.path = path
+        self.options = {"max_lines": max_lines, "max_delay": max_delay, "rotate_bytes": rotate_bytes, "rotate_daily": rotate_daily}
+        self.configure()
+        self._lines: list[bytes] = []
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._due = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._closed = False
+    def configure(self) -> None:
+        defaults = {"max_lines": FLUSH_LINES, "max_delay": FLUSH_SECONDS, "rotate_bytes": ROTATE_BYTES, "rotate_daily": ROTATE_DAILY}
+        for name, value in defaults.items():
+            setattr(self, name, value if self.options[name] is None else self.options[name])
+    def write(self, payload: Dict[str, Any]) -> None:
+        line = _encode(payload)
+        with self._lock:
+            self._lines.append(line)
+            full = len(self._lines) >= self.max_lines
+        if self.max_delay <= 0 or self._closed:
+            self.flush()
+        elif self._thread is None:
+            self._start()
+        elif full:
+            self._due.set()
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name=f"log-{self.path.name}", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+    def _run(self) -> None:
+        while not self._closed:
+            self._due.wait(self.max_delay)
+            self._due.clear()
+            self.flush()
+    def _rotate_if_needed(self, incoming: int) -> None:
+        if not self.path.exists():
+            return
+        stat = self.path.stat()
+        if self.rotate_bytes > 0 and stat.st_size + incoming > self.rotate_bytes:
+            rotate_log(self.path)
+        elif self.rotate_daily and date.fromtimestamp(stat.st_mtime) != date.today():
+            rotate_log(self.path)
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.with_name(self.path.name + ".lock").open("ab") as handle:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            yield
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        self.flush()
+        with self._io_lock, self._file_lock():
+            yield
+    def flush(self) -> None:
+        with self._io_lock:
+            with self._lock:
+                lines = self._lines
+                self._lines = []
+            if not lines:
+                return
+            with self._file_lock():
+                self._rotate_if_needed(sum(map(len, lines)))
+                with self.path.open("ab") as handle:
+                    handle.writelines(lines)
+    def close(self) -> None:
+        self._closed = True
+        self._due.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.flush()
+SINKS: Dict[Path, BufferedLogWriter] = {}
+SINKS_LOCK = threading.Lock()
+def log_sink(path: Path, **options: Any) -> BufferedLogWriter:
+    with SINKS_LOCK:
+        sink = SINKS.get(path)
+        if sink is None:
+            sink = SINKS[path] = BufferedLogWriter(path, **options)
+        return sink
+def append_log(path: Path, payload: Dict[str, Any]) -> None:
+    log_sink(path).write(payload)
+def flush_logs() -> None:
+    for sink in list(SINKS.values()):
+        sink.flush()
 def append_named_log(name: str, payload: Dict[str, Any]) -> None:
     append_log(LOG_DIRECTORY / name, payload)
+def refresh_settings() -> None:
+    global FLUSH_LINES, FLUSH_SECONDS, ROTATE_BYTES, ROTATE_DAILY, ROTATE_KEEP, COMPRESS, PROGRESS_EVERY, PROGRESS_SECONDS
+    config = load_logging()
+    FLUSH_LINES = int(config.get("flush_lines", 200))
+    FLUSH_SECONDS = float(config.get("flush_seconds", 1))
+    ROTATE_BYTES = int(float(config.get("rotate_mb", 64)) * (1 << 20))
+    ROTATE_DAILY = bool(config.get("rotate_daily", False))
+    ROTATE_KEEP = int(config.get("keep", 14))
+    COMPRESS = bool(config.get("compress", True))
+    PROGRESS_EVERY = int(config.get("progress_every", 10))
+    PROGRESS_SECONDS = float(config.get("progress_seconds", 5))
+    with SINKS_LOCK:
+        sinks = list(SINKS.values())
+    for sink in sinks:
+        sink.configure()
+refresh_settings()
@@ -0,0 +1,217 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict
+from .workflows import load_metrics
+ENABLED: bool
+HOST: str
+PORT: int
+LATENCY_BUCKETS: tuple[float, ...]
+def refresh_settings() -> None:
+    global ENABLED, HOST, PORT, LATENCY_BUCKETS
+    config = load_metrics()
+    ENABLED = bool(config.get("enabled", False))
+    HOST = config.get("host", "127.0.0.1")
+    PORT = int(config.get("port", 9464))
+    LATENCY_BUCKETS = tuple(float(value) for value in config.get("latency_buckets", (60, 300, 900, 1800, 3600, 7200)))
+refresh_settings()
+PREFIX = "automation_"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+TERMINAL_EVENTS = {"execution_complete", "execution_error", "execution_interrupted", "execution_timeout", "execution_lost"}
+HELP = {
+    "jobs_queued_total": ("counter", "Prompts submitted to a ComfyUI server, including retries"),
+    "jobs_finished_total": ("counter", "Jobs finished, by final status"),
+    "jobs_failed_total": ("counter", "Jobs that did not complete, by failure class"),
+    "jobs": ("gauge", "Jobs currently queued or running on a ComfyUI server"),
+    "job_duration_seconds": ("histogram", "Run time of completed jobs"),
+    "sampler_it_per_sec": ("gauge", "Most recent sampler step rate"),
+    "last_progress_timestamp_seconds": ("gauge", "Unix time of the last persisted sampler progress tick"),
+    "cache_hits_total": ("counter", "Jobs served from the result cache"),
+    "cache_hit_ratio": ("gauge", "Cache hits over cache hits plus rendered jobs"),
+    "text_embeds_total": ("counter", "Finished jobs by text embedding source (cached, disk, encoded)"),
+    "oom_retries_total": ("counter", "Out-of-memory resubmissions, by ladder rung"),
+    "oom_recovered_total": ("counter", "Jobs recovered from out of memory, by final rung"),
+    "window_utilization": ("gauge", "Share of the current window's server time reserved by dispatched jobs"),
+    "window_events_total": ("counter", "Scheduler admission decisions"),
+    "pending_jobs": ("gauge", "Jobs waiting in the job store"),
+    "server_up": ("gauge", "Whether a ComfyUI server passed its last health probe"),
+    "server_queue_depth": ("gauge", "Prompts running or pending on a ComfyUI server"),
+    "server_inflight": ("gauge", "Prompts this runner is waiting on per ComfyUI server"),
+}
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+def _series(name: str, labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return PREFIX + name
+    return PREFIX + name + "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+class MetricsCollector:
+    def __init__(self) -> None:
+        self.counters: Dict[tuple[str, tuple[tuple[str, str], ...]], float] = {}
+        self.gauges: Dict[tuple[str, tuple[tuple[str, str], ...]], float] = {}
+        self.histograms: Dict[tuple[str, tuple[tuple[str, str], ...]], list[float]] = {}
+        self.active: Dict[str, Dict[str, Any]] = {}
+        self.ticks: Dict[str, tuple[float, float]] = {}
+        self.pools: list[Any] = []
+    def inc(self, name: str, amount: float = 1.0, **labels: Any) -> None:
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        self.counters[key] = self.counters.get(key, 0.0) + amount
+    def set(self, name: str, value: float, **labels: Any) -> None:
+        self.gauges[(name, tuple(sorted((k, str(v)) for k, v in labels.items())))] = float(value)
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        data = self.histograms.get(key)
+        if data is None or len(data) != len(LATENCY_BUCKETS) + 2:
+            data = self.histograms[key] = [0.0] * (len(LATENCY_BUCKETS) + 2)
+        for idx, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                data[idx] += 1
+        data[-2] += value
+        data[-1] += 1
+    def record(self, payload: Dict[str, Any]) -> None:
+        event = payload.get("event")
+        prompt_id = payload.get("prompt_id")
+        preset = payload.get("preset") or "none"
+        if event == "queued":
+            self.inc("jobs_queued_total", preset=preset)
+            self.active[prompt_id] = {"preset": preset, "state": "queued"}
+        elif event in ("execution_start", "node_executing") and prompt_id in self.active:
+            self.active[prompt_id]["state"] = "running"
+        elif event == "node_progress" and prompt_id in self.active:
+            now = time.time()
+            value = payload.get("value")
+            self.set("last_progress_timestamp_seconds", now)
+            last = self.ticks.get(prompt_id)
+            if isinstance(value, (int, float)):
+                if last is not None and value > last[1] and now > last[0]:
+                    self.set("sampler_it_per_sec", (value - last[1]) / (now - last[0]), preset=self.active[prompt_id]["preset"])
+                self.ticks[prompt_id] = (now, value)
+        elif event in TERMINAL_EVENTS or event == "prompt_cancelled":
+            self.active.pop(prompt_id, None)
+            self.ticks.pop(prompt_id, None)
+        elif event == "completed":
+            self.active.pop(prompt_id, None)
+            self.ticks.pop(prompt_id, None)
+            status = payload.get("status") or "completed"
+            self.inc("jobs_finished_total", preset=preset, status=status)
+            if status == "completed":
+                self.observe("job_duration_seconds", float(payload.get("elapsed_seconds") or 0.0), preset=preset)
+            else:
+                self.inc("jobs_failed_total", preset=preset, failure=payload.get("failure") or status)
+            if payload.get("text_embeds"):
+                self.inc("text_embeds_total", source=payload["text_embeds"])
+        elif event == "job_profile" and payload.get("sampler_it_per_sec"):
+            self.set("sampler_it_per_sec", payload["sampler_it_per_sec"], preset=preset)
+        elif event == "cache_hit":
+            self.inc("cache_hits_total", preset=preset)
+        elif event == "oom_retry":
+            self.inc("oom_retries_total", rung=payload.get("rung"))
+        elif event == "oom_recovered":
+            self.inc("oom_recovered_total", rung=payload.get("rung"))
+        elif event in ("window_dispatch", "deferred", "expired", "model_missing"):
+            self.inc("window_events_total", decision=event)
+            if "window_utilization" in payload:
+                self.set("window_utilization", payload["window_utilization"])
+    def _snapshot(self) -> None:
+        states = {"queued": 0, "running": 0}
+        for job in self.active.values():
+            states[job["state"]] += 1
+        for state, count in states.items():
+            self.set("jobs", count, state=state)
+        hits = sum(value for (name, _), value in self.counters.items() if name == "cache_hits_total")
+        rendered = sum(
+            value for (name, labels), value in self.counters.items() if name == "jobs_finished_total" and ("status", "completed") in labels
+        )
+        if hits + rendered:
+            self.set("cache_hit_ratio", hits / (hits + rendered))
+        for pool in self.pools:
+            for worker in pool.workers:
+                self.set("server_up", 1 if worker.healthy else 0, server=worker.name)
+                self.set("server_queue_depth", worker.queue_depth, server=worker.name)
+                self.set("server_inflight", worker.inflight, server=worker.name)
+    def render(self) -> str:
+        self._snapshot()
+        lines: list[str] = []
+        for name, (kind, text) in HELP.items():
+            samples: list[str] = []
+            if kind == "histogram":
+                for (metric, labels), data in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, count in zip((*LATENCY_BUCKETS, float("inf")), (*data[:-2], data[-1])):
+                        samples.append(f"{_series(name + '_bucket', (*labels, ('le', _number(bound))))} {_number(count)}")
+                    samples.append(f"{_series(name + '_sum', labels)} {_number(data[-2])}")
+                    samples.append(f"{_series(name + '_count', labels)} {_number(data[-1])}")
+            else:
+                source = self.counters if kind == "counter" else self.gauges
+                samples.extend(
+                    f"{_series(metric, labels)} {_number(value)}"
+                    for (metric, labels), value in sorted(source.items())
+                    if metric == name
+                )
+            if samples:
+                lines.append(f"# HELP {PREFIX}{name} {text}")
+                lines.append(f"# TYPE {PREFIX}{name} {kind}")
+                lines.extend(samples)
+        return "\n".join(lines) + "\n"
+class MetricsExporter:
+    def __init__(self, collector: MetricsCollector) -> None:
+        self.collector = collector
+        self.server: asyncio.AbstractServer | None = None
+        self.users = 0
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await asyncio.wait_for(reader.readline(), timeout=5)
+            while (await asyncio.wait_for(reader.readline(), timeout=5)).strip():
+                pass
+            parts = request.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, content_type, body = "200 OK", CONTENT_TYPE, self.collector.render().encode("utf-8")
+            else:
+                status, content_type, body = "404 Not Found", "text/plain", b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1")
+                + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    async def start(self) -> None:
+        self.users += 1
+        if self.server is not None:
+            return
+        try:
+            self.server = await asyncio.start_server(self._handle, HOST, PORT)
+        except OSError as exc:
+            print(f"Metrics endpoint unavailable on {HOST}:{PORT}: {exc}")
+            return
+        print(f"Serving metrics on http://{HOST}:{PORT}/metrics")
+    async def stop(self) -> None:
+        self.users = max(0, self.users - 1)
+        if self.users or self.server is None:
+            return
+        server = self.server
+        self.server = None
+        server.close()
+        await server.wait_closed()
+METRICS = MetricsCollector()
+EXPORTER = MetricsExporter(METRICS)
+@asynccontextmanager
+async def serve_metrics(pool: Any = None) -> AsyncIterator[None]:
+    if not ENABLED:
+        yield
+        return
+    if pool is not None:
+        METRICS.pools.append(pool)
+    await EXPORTER.start()
+    try:
+        yield
+    finally:
+        if pool is not None:
+            METRICS.pools.remove(pool)
+        await EXPORTER.stop()
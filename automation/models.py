@@ -1,28 +1,311 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from pathlib import Path
-from shutil import copy
-from huggingface_hub import hf_hub_download
+from typing import Any, Callable, Dict, Iterable, Iterator, Sequence
+import httpx
 from . import COMFY_ROOT
-WAN_TEXT = ("Comfy-Org/Wan_2.2_ComfyUI_Repackaged", "split_files/text_encoders/umt5_xxl_fp8_e4m3fn_scaled.safetensors", "text_encoders")
-WAN_VAE = ("Comfy-Org/Wan_2.2_ComfyUI_Repackaged", "split_files/vae/wan_2.1_vae.safetensors", "vae")
-WAN_MODEL_Q5 = ("QuantStack/Wan2.2-Animate-14B-GGUF", "Wan2.2-Animate-14B-Q5_K_M.gguf", "diffusion_models")
+from .workflows import load_defaults, load_models, load_presets
+SOURCE: str
+LOCAL_ROOT: str
+CONCURRENCY: int
+VERIFY_HASH: bool
+HTTP_TIMEOUT_SECONDS: float
+def refresh_settings() -> None:
+    global SOURCE, LOCAL_ROOT, CONCURRENCY, VERIFY_HASH, HTTP_TIMEOUT_SECONDS
+    config = load_models()
+    SOURCE = config.get("source", "hub")
+    LOCAL_ROOT = config.get("local_root", "")
+    CONCURRENCY = int(config.get("concurrency", 3))
+    VERIFY_HASH = bool(config.get("verify_hash", True))
+    HTTP_TIMEOUT_SECONDS = float(config.get("timeout_seconds", 60))
+refresh_settings()
+CHUNK_BYTES = 8 << 20
+PROGRESS_INTERVAL_SECONDS = 0.5
+STATE_NAME = ".sync_state.json"
+DEFAULT_SYNC = (
+    "umt5-xxl-enc-bf16.safetensors",
+    "Wan2.2-Animate-14B-Q5_K_M.gguf",
+    "Wan2_1_VAE_bf16.safetensors",
+)
+FIELD_DIRECTORIES = {
+    "model_name": ("diffusion_models", "unet"),
+    "text_encoder_name": ("text_encoders",),
+    "vae_name": ("vae",),
+}
+class Asset:
+    def __init__(
+        self,
+        repo_id: str,
+        filename: str,
+        directory: str,
+        name: str | None = None,
+        sha256: str | None = None,
+        requires: Sequence[str] = (),
+    ) -> None:
+        self.repo_id = repo_id
+        self.filename = filename
+        self.directory = directory
+        self.name = name or Path(filename).name
+        self.sha256 = sha256
+        self.requires = tuple(requires)
+    def target(self, root: Path) -> Path:
+        return root / self.directory / self.name
 def model_root() -> Path:
     return COMFY_ROOT / "models"
-def download_asset(repo_id: str, filename: str, target: Path) -> None:
+def load_manifest() -> Dict[str, Asset]:
+    return {
+        name: Asset(
+            spec["repo_id"],
+            spec["filename"],
+            spec["directory"],
+            name=name,
+            sha256=spec.get("sha256"),
+            requires=spec.get("requires", ()),
+        )
+        for name, spec in (load_models().get("assets") or {}).items()
+    }
+def preset_parameters(preset: str | None = None) -> Dict[str, Any]:
+    values = dict(load_defaults())
+    if preset:
+        values.update(load_presets().get(preset, {}))
+    return values
+def required_assets(parameters: Dict[str, Any]) -> tuple[list[Asset], list[str]]:
+    catalog = load_manifest()
+    root = model_root()
+    needed: Dict[str, Asset] = {}
+    unknown: list[str] = []
+    queue: list[str] = []
+    for field, directories in FIELD_DIRECTORIES.items():
+        name = parameters.get(field)
+        if not name:
+            continue
+        if name in catalog:
+            queue.append(name)
+        elif not any((root / directory / name).exists() for directory in directories):
+            unknown.append(name)
+    while queue:
+        name = queue.pop()
+        if name not in needed:
+            needed[name] = catalog[name]
+            queue.extend(catalog[name].requires)
+    return list(needed.values()), unknown
+def missing_assets(parameter_sets: Iterable[Dict[str, Any]]) -> tuple[list[Asset], list[str]]:
+    root = model_root()
+    needed: Dict[str, Asset] = {}
+    unknown: set[str] = set()
+    for parameters in parameter_sets:
+        assets, names = required_assets(parameters)
+        needed.update((asset.name, asset) for asset in assets)
+        unknown.update(names)
+    return [asset for asset in needed.values() if not asset.target(root).exists()], sorted(unknown)
+def resolve_models(parameter_sets: Iterable[Dict[str, Any]]) -> list[Path]:
+    missing, unknown = missing_assets(parameter_sets)
+    if missing:
+        print(f"Fetching {len(missing)} missing model file(s): {', '.join(asset.name for asset in missing)}")
+        sync_assets(missing)
+    if unknown:
+        raise FileNotFoundError(f"model files not in models.assets and not on disk: {', '.join(unknown)}")
+    return [asset.target(model_root()) for asset in missing]
+class HubSource:
+    def describe(self, asset: Asset) -> tuple[int | None, str | None]:
+        from huggingface_hub import get_hf_file_metadata, hf_hub_url
+        metadata = get_hf_file_metadata(hf_hub_url(asset.repo_id, asset.filename))
+        etag = (metadata.etag or "").strip('"')
+        return metadata.size, asset.sha256 or (etag if len(etag) == 64 else None)
+    def link(self, asset: Asset, target: Path) -> bool:
+        return False
+    @contextmanager
+    def stream(self, asset: Asset, offset: int) -> Iterator[tuple[int, Iterator[bytes]]]:
+        from huggingface_hub import hf_hub_url
+        from huggingface_hub.utils import build_hf_headers
+        headers = build_hf_headers()
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+        url = hf_hub_url(asset.repo_id, asset.filename)
+        with httpx.stream("GET", url, headers=headers, follow_redirects=True, timeout=HTTP_TIMEOUT_SECONDS) as resp:
+            resp.raise_for_status()
+            start = offset if resp.status_code == 206 else 0
+            yield start, resp.iter_bytes(CHUNK_BYTES)
+class LocalSource:
+    def __init__(self, root: Path) -> None:
+        self.root = root
+    def _path(self, asset: Asset) -> Path:
+        return self.root / asset.repo_id / asset.filename
+    def describe(self, asset: Asset) -> tuple[int | None, str | None]:
+        path = self._path(asset)
+        sidecar = path.with_name(path.name + ".sha256")
+        digest = asset.sha256
+        if digest is None and sidecar.exists():
+            digest = sidecar.read_text(encoding="utf-8").split()[0]
+        return path.stat().st_size, digest
+    def link(self, asset: Asset, target: Path) -> bool:
+        try:
+            os.link(self._path(asset), target)
+        except OSError:
+            return False
+        return True
+    @contextmanager
+    def stream(self, asset: Asset, offset: int) -> Iterator[tuple[int, Iterator[bytes]]]:
+        with self._path(asset).open("rb") as handle:
+            handle.seek(offset)
+            yield offset, iter(lambda: handle.read(CHUNK_BYTES), b"")
+def create_source(kind: str | None = None) -> HubSource | LocalSource:
+    if (kind or SOURCE) == "local":
+        return LocalSource(Path(LOCAL_ROOT))
+    return HubSource()
+class Progress:
+    def __init__(self, total: int) -> None:
+        self.total = total
+        self.done = 0
+        self.started = time.monotonic()
+        self.printed = 0.0
+        self.lock = threading.Lock()
+    def add(self, count: int) -> None:
+        with self.lock:
+            self.done += count
+            now = time.monotonic()
+            if now - self.printed < PROGRESS_INTERVAL_SECONDS:
+                return
+            self.printed = now
+            self._print(now)
+    def _print(self, now: float) -> None:
+        rate = self.done / max(now - self.started, 1e-6)
+        share = f" ({self.done / self.total:.0%})" if self.total else ""
+        sys.stdout.write(f"\rmodels: {self.done / 2**30:.2f}/{self.total / 2**30:.2f} GiB{share} {rate / 2**20:.1f} MiB/s")
+        sys.stdout.flush()
+    def finish(self) -> None:
+        with self.lock:
+            self._print(time.monotonic())
+            sys.stdout.write("\n")
+class SyncState:
+    def __init__(self, root: Path) -> None:
+        self.path = root / STATE_NAME
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+    def digest(self, target: Path) -> str:
+        stat = target.stat()
+        key = str(target)
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["sha256"]
+        value = _file_digest(target)
+        self.record(target, value)
+        return value
+    def record(self, target: Path, value: str) -> None:
+        stat = target.stat()
+        with self.lock:
+            self.entries[str(target)] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": value}
+    def save(self) -> None:
+        with self.lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp = self.path.with_suffix(".tmp")
+            temp.write_text(json.dumps(self.entries, indent=2), encoding="utf-8")
+            temp.replace(self.path)
+def _file_digest(path: Path, hasher: Any = None) -> str:
+    hasher = hasher or hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(CHUNK_BYTES), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+def _is_current(target: Path, size: int | None, digest: str | None, state: SyncState) -> bool:
+    if not target.exists():
+        return False
+    if size is not None and target.stat().st_size != size:
+        return False
+    if digest and VERIFY_HASH:
+        return state.digest(target) == digest
+    return True
+def _fetch(
+    source: HubSource | LocalSource,
+    asset: Asset,
+    target: Path,
+    size: int | None,
+    digest: str | None,
+    state: SyncState,
+    progress: Callable[[int], None],
+) -> Path:
     target.parent.mkdir(parents=True, exist_ok=True)
-    path = hf_hub_download(repo_id=repo_id, filename=filename, local_dir=str(target.parent), local_dir_use_symlinks=False)
-    if Path(path) != target:
-        copy(path, target)
-def sync_wan_assets() -> None:
-    base = model_root()
-    text_path = hf_hub_download(repo_id=WAN_TEXT[0], filename=WAN_TEXT[1], local_dir_use_symlinks=False)
-    text_dest = base / WAN_TEXT[2] / "umt5_xxl_fp8_e4m3fn_scaled.safetensors"
-    text_dest.parent.mkdir(parents=True, exist_ok=True)
-    copy(text_path, text_dest)
-    model_path = hf_hub_download(repo_id=WAN_MODEL_Q5[0], filename=WAN_MODEL_Q5[1], local_dir_use_symlinks=False)
-    dest = base / WAN_MODEL_Q5[2] / WAN_MODEL_Q5[1]
-    dest.parent.mkdir(parents=True, exist_ok=True)
-    copy(model_path, dest)
-    vae_path = hf_hub_download(repo_id=WAN_VAE[0], filename=WAN_VAE[1], local_dir_use_symlinks=False)
-    vae_dest = base / WAN_VAE[2] / "wan_2.1_vae.safetensors"
-    vae_dest.parent.mkdir(parents=True, exist_ok=True)
-    copy(vae_path, vae_dest)
+    if target.exists():
+        target.unlink()
+    if source.link(asset, target):
+        if _is_current(target, size, digest, state):
+            progress(target.stat().st_size)
+            return target
+        target.unlink()
+    partial = target.with_name(target.name + ".part")
+    offset = partial.stat().st_size if partial.exists() else 0
+    if size is not None and offset > size:
+        partial.unlink()
+        offset = 0
+    hasher = hashlib.sha256()
+    if offset:
+        _file_digest(partial, hasher)
+    with source.stream(asset, offset) as (start, chunks):
+        if start != offset:
+            partial.unlink()
+            hasher = hashlib.sha256()
+        progress(start)
+        with partial.open("ab") as out:
+            for chunk in chunks:
+                out.write(chunk)
+                hasher.update(chunk)
+                progress(len(chunk))
+    received = partial.stat().st_size
+    if size is not None and received != size:
+        raise OSError(f"{asset.name}: expected {size} bytes, received {received}")
+    value = hasher.hexdigest()
+    if digest and value != digest:
+        partial.unlink()
+        raise OSError(f"{asset.name}: sha256 mismatch ({value} != {digest})")
+    partial.replace(target)
+    state.record(target, value)
+    return target
+def sync_assets(
+    assets: Sequence[Asset],
+    source: HubSource | LocalSource | None = None,
+    root: Path | None = None,
+    concurrency: int | None = None,
+) -> list[Path]:
+    source = source or create_source()
+    root = root or model_root()
+    concurrency = CONCURRENCY if concurrency is None else concurrency
+    state = SyncState(root)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            described = list(pool.map(source.describe, assets))
+            missing: list[tuple[Asset, int | None, str | None]] = []
+            for asset, (size, digest) in zip(assets, described):
+                if _is_current(asset.target(root), size, digest, state):
+                    print(f"{asset.name}: up to date")
+                else:
+                    missing.append((asset, size, digest))
+            if missing:
+                progress = Progress(sum(size or 0 for _, size, _ in missing))
+                futures = [
+                    pool.submit(_fetch, source, asset, asset.target(root), size, digest, state, progress.add)
+                    for asset, size, digest in missing
+                ]
+                wait(futures)
+                progress.finish()
+                for future in futures:
+                    future.result()
+    finally:
+        state.save()
+    return [asset.target(root) for asset in assets]
+def sync_wan_assets(presets: Sequence[str] = ()) -> list[Path]:
+    catalog = load_manifest()
+    if presets:
+        names: Dict[str, Asset] = {}
+        for preset in presets:
+            names.update((asset.name, asset) for asset in required_assets(preset_parameters(preset))[0])
+        return sync_assets(list(names.values()))
+    return sync_assets([catalog[name] for name in load_models().get("sync", DEFAULT_SYNC)])
@@ -0,0 +1,153 @@
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict
+from .workflows import load_execution
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+ENABLED: bool
+VRAM_INTERVAL_SECONDS: float
+TRACE_DIR: Path
+def refresh_settings() -> None:
+    global ENABLED, VRAM_INTERVAL_SECONDS, TRACE_DIR
+    config = load_execution().get("profile", {})
+    ENABLED = bool(config.get("enabled", True))
+    VRAM_INTERVAL_SECONDS = float(config.get("vram_interval_seconds", 2))
+    TRACE_DIR = PROJECT_ROOT / config.get("trace_dir", "ComfyUI/logs/traces")
+refresh_settings()
+PHASES = {
+    "WanVideoTextEncodeCached": "text_encode",
+    "WanVideoTextEncode": "text_encode",
+    "WanVideoModelLoader": "model_load",
+    "WanVideoVAELoader": "model_load",
+    "WanVideoBlockSwap": "model_load",
+    "WanVideoEmptyEmbeds": "embeds",
+    "WanVideoSampler": "sampler",
+    "WanVideoDecode": "decode",
+    "VHS_VideoCombine": "combine",
+}
+GIB = float(1 << 30)
+class JobProfile:
+    def __init__(self, workflow: Dict[str, Any]) -> None:
+        self.classes = {str(key): node.get("class_type", "") for key, node in workflow.items()}
+        self.started: float | None = None
+        self.finished: float | None = None
+        self.spans: list[tuple[str, float, float]] = []
+        self.cached: list[str] = []
+        self.ticks: list[tuple[float, str, float, float]] = []
+        self.vram: list[tuple[float, float, float]] = []
+        self._node: str | None = None
+        self._node_start = 0.0
+    def phase(self, node: str) -> str:
+        return PHASES.get(self.classes.get(node, ""), "other")
+    def start(self, moment: float | None = None) -> None:
+        if self.started is None:
+            self.started = moment or time.time()
+    def _close(self, moment: float) -> None:
+        if self._node is not None:
+            self.spans.append((self._node, self._node_start, moment))
+            self._node = None
+    def enter(self, node: Any, moment: float | None = None) -> None:
+        moment = moment or time.time()
+        self.start(moment)
+        self._close(moment)
+        self._node = str(node)
+        self._node_start = moment
+    def cache(self, nodes: list[Any]) -> None:
+        self.cached.extend(str(node) for node in nodes)
+    def tick(self, node: Any, value: Any, maximum: Any, moment: float | None = None) -> None:
+        if isinstance(value, (int, float)) and isinstance(maximum, (int, float)):
+            self.ticks.append((moment or time.time(), str(node), float(value), float(maximum)))
+    def sample(self, stats: Dict[str, Any]) -> None:
+        devices = stats.get("devices") or []
+        if not devices:
+            return
+        device = devices[0]
+        total = float(device.get("vram_total", 0) or 0)
+        used = total - float(device.get("vram_free", 0) or 0)
+        self.vram.append((time.time(), used / GIB, total / GIB))
+    def finish(self, moment: float | None = None) -> None:
+        moment = moment or time.time()
+        self._close(moment)
+        self.finished = moment
+    def node_seconds(self) -> Dict[str, float]:
+        result: Dict[str, float] = {}
+        for node, begin, end in self.spans:
+            result[node] = result.get(node, 0.0) + end - begin
+        return result
+    def phase_seconds(self) -> Dict[str, float]:
+        result: Dict[str, float] = {}
+        for node, seconds in self.node_seconds().items():
+            phase = self.phase(node)
+            result[phase] = result.get(phase, 0.0) + seconds
+        return result
+    def step_seconds(self) -> list[tuple[float, float]]:
+        steps: list[tuple[float, float]] = []
+        previous: Dict[str, tuple[float, float]] = {}
+        for moment, node, value, _ in self.ticks:
+            if self.phase(node) != "sampler":
+                continue
+            last = previous.get(node)
+            if last is not None and value > last[1]:
+                steps.append((moment, (moment - last[0]) / (value - last[1])))
+            previous[node] = (moment, value)
+        return steps
+    def summary(self) -> Dict[str, float]:
+        result = {f"{phase}_seconds": round(seconds, 3) for phase, seconds in self.phase_seconds().items()}
+        steps = self.step_seconds()
+        if steps:
+            result["sampler_it_per_sec"] = round(len(steps) / sum(seconds for _, seconds in steps), 3)
+        if self.vram:
+            result["peak_vram_gb"] = round(max(used for _, used, _ in self.vram), 2)
+            result["mean_vram_util"] = round(sum(used / total for _, used, total in self.vram if total) / len(self.vram), 3)
+        if self.started is not None and self.finished is not None:
+            result["profiled_seconds"] = round(self.finished - self.started, 3)
+        return result
+    def series(self) -> Dict[str, list[tuple[int, float, float]]]:
+        return {
+            "node_seconds": [(idx, end, end - begin) for idx, (_, begin, end) in enumerate(self.spans)],
+            "sampler_step_seconds": [(idx, moment, seconds) for idx, (moment, seconds) in enumerate(self.step_seconds())],
+            "vram_used_gb": [(idx, moment, used) for idx, (moment, used, _) in enumerate(self.vram)],
+        }
+    def trace(self, process: str) -> Dict[str, Any]:
+        events: list[Dict[str, Any]] = [
+            {"name": "process_name", "ph": "M", "pid": process, "tid": 0, "args": {"name": process}},
+        ]
+        for node, begin, end in self.spans:
+            events.append(
+                {
+                    "name": self.classes.get(node) or node,
+                    "cat": self.phase(node),
+                    "ph": "X",
+                    "ts": int(begin * 1e6),
+                    "dur": int((end - begin) * 1e6),
+                    "pid": process,
+                    "tid": 0,
+                    "args": {"node": node},
+                }
+            )
+        for node in self.cached:
+            events.append(
+                {
+                    "name": f"{self.classes.get(node) or node} (cached)",
+                    "cat": "cached",
+                    "ph": "i",
+                    "s": "t",
+                    "ts": int((self.started or 0.0) * 1e6),
+                    "pid": process,
+                    "tid": 0,
+                }
+            )
+        for moment, node, value, maximum in self.ticks:
+            events.append(
+                {"name": f"progress {node}", "ph": "C", "ts": int(moment * 1e6), "pid": process, "args": {"value": value, "max": maximum}}
+            )
+        for moment, used, total in self.vram:
+            events.append(
+                {"name": "vram_gb", "ph": "C", "ts": int(moment * 1e6), "pid": process, "args": {"used": round(used, 3), "total": round(total, 3)}}
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+def write_trace(trace: Dict[str, Any], name: str) -> Path:
+    TRACE_DIR.mkdir(parents=True, exist_ok=True)
+    path = TRACE_DIR / f"{name}.trace.json"
+    path.write_text(json.dumps(trace, ensure_ascii=False), encoding="utf-8")
+    return path
@@ -0,0 +1,173 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator
+import httpx
+from .estimator import RuntimeModel, load_model
+from .jobs import JobStore, job_key
+from . import metrics
+from .metrics import METRICS, serve_metrics
+from .models import required_assets, resolve_models
+from .window import _current_time, _current_window_start, _next_window_start, _utc_stamp, _window_end, _within_window
+from .workflows import ConfigError, load_scheduling, load_servers
+def _poll_seconds() -> float:
+    return float(load_scheduling().get("daemon_poll_seconds", 30))
+def _deadline(entry: Dict[str, Any]) -> datetime | None:
+    value = entry.get("deadline_utc")
+    return datetime.fromisoformat(value.replace("Z", "+00:00")) if value else None
+def order_entries(entries: list[Dict[str, Any]], model: RuntimeModel) -> list[Dict[str, Any]]:
+    def key(entry: Dict[str, Any]) -> tuple[int, float, float]:
+        deadline = _deadline(entry)
+        return (
+            -int(entry.get("priority", 0) or 0),
+            deadline.timestamp() if deadline else float("inf"),
+            -model.estimate(entry),
+        )
+    return sorted(entries, key=key)
+def _event(entry: Dict[str, Any], event: str, **extra: Any) -> Dict[str, Any]:
+    payload = {
+        "event": event,
+        "mode": entry.get("mode"),
+        "preset": entry.get("preset"),
+        "prompt_digest": entry.get("prompt_digest"),
+        "job_id": entry.get("job_id"),
+        "priority": entry.get("priority", 0),
+        "deadline_utc": entry.get("deadline_utc"),
+    }
+    payload.update(extra)
+    return payload
+class WindowPlan:
+    def __init__(self, window_start: datetime, lanes: int, model: RuntimeModel, opened: datetime | None = None) -> None:
+        self.window_start = window_start
+        self.window_end = _window_end(window_start)
+        self.model = model
+        self.opened = opened or window_start
+        self.lanes = [self.opened] * max(1, lanes)
+        self.skipped: set[str] = set()
+    def reserve(self, seconds: float, now: datetime | None = None) -> datetime:
+        lane = min(range(len(self.lanes)), key=self.lanes.__getitem__)
+        finish = max(self.lanes[lane], now or self.lanes[lane]) + timedelta(seconds=seconds)
+        if finish <= self.window_end:
+            self.lanes[lane] = finish
+        return finish
+    def utilization(self) -> float:
+        span = (self.window_end - self.opened).total_seconds() * len(self.lanes)
+        busy = sum((lane - self.opened).total_seconds() for lane in self.lanes)
+        return round(busy / span, 4) if span > 0 else 1.0
+    def admit(self, entry: Dict[str, Any]) -> bool:
+        from .core import _write_schedule_log
+        now = _current_time()
+        key = job_key(entry)
+        deadline = _deadline(entry)
+        if deadline is not None and deadline <= now:
+            _write_schedule_log(_event(entry, "expired"))
+            return False
+        unknown = required_assets(entry.get("workload") or {})[1]
+        if unknown:
+            if key not in self.skipped:
+                self.skipped.add(key)
+                _write_schedule_log(_event(entry, "model_missing", models=unknown))
+            return False
+        estimate = self.model.estimate(entry)
+        finish = self.reserve(estimate, now)
+        if finish > self.window_end:
+            if key not in self.skipped:
+                self.skipped.add(key)
+                _write_schedule_log(
+                    _event(
+                        entry,
+                        "deferred",
+                        estimated_seconds=round(estimate, 1),
+                        predicted_finish_utc=_utc_stamp(finish),
+                        window_end_utc=_utc_stamp(self.window_end),
+                    )
+                )
+            return False
+        _write_schedule_log(
+            _event(
+                entry,
+                "window_dispatch",
+                estimated_seconds=round(estimate, 1),
+                predicted_finish_utc=_utc_stamp(finish),
+                window_utilization=self.utilization(),
+            )
+        )
+        return True
+    def requests(self, entries: list[Dict[str, Any]]) -> Iterator[tuple[str, str, Dict[str, Any]]]:
+        from .core import scheduled_request
+        for entry in order_entries(entries, self.model):
+            if job_key(entry) in self.skipped:
+                continue
+            if self.admit(entry):
+                yield scheduled_request(entry)
+def forecast(
+    entries: list[Dict[str, Any]],
+    model: RuntimeModel | None = None,
+) -> list[tuple[Dict[str, Any], float, datetime | None]]:
+    model = model or load_model()
+    now = _current_time()
+    lanes = len(load_servers())
+    start = _next_window_start(now)
+    plans = [WindowPlan(start, lanes, model, max(start, now))]
+    result: list[tuple[Dict[str, Any], float, datetime | None]] = []
+    for entry in order_entries(entries, model):
+        estimate = model.estimate(entry)
+        finish: datetime | None = None
+        for plan in plans:
+            candidate = plan.reserve(estimate)
+            if candidate <= plan.window_end:
+                finish = candidate
+                break
+        else:
+            plan = WindowPlan(plans[-1].window_start + timedelta(days=1), lanes, model)
+            candidate = plan.reserve(estimate)
+            if candidate <= plan.window_end:
+                plans.append(plan)
+                finish = candidate
+        result.append((entry, estimate, finish))
+    return result
+async def run_scheduler(depth: int | None = None) -> None:
+    from .core import _write_log, refresh_settings, run_pipeline
+    store = JobStore()
+    plan: WindowPlan | None = None
+    prefetched: set[str] = set()
+    try:
+        async with serve_metrics():
+            while True:
+                try:
+                    if refresh_settings():
+                        plan = None
+                        store.close()
+                        store = JobStore()
+                except ConfigError as exc:
+                    print(f"Keeping previous configuration: {exc}")
+                    _write_log({"event": "config_rejected", "error": str(exc)})
+                now = _current_time()
+                pending = store.pending()
+                if metrics.ENABLED:
+                    METRICS.set("pending_jobs", len(pending))
+                if not _within_window(now):
+                    plan = None
+                    entries = [entry for entry in pending if job_key(entry) not in prefetched]
+                    if entries:
+                        prefetched.update(job_key(entry) for entry in entries)
+                        try:
+                            await asyncio.to_thread(resolve_models, [entry.get("workload") or {} for entry in entries])
+                        except (OSError, httpx.HTTPError) as exc:
+                            print(f"Model prefetch failed: {exc}")
+                    wait = (_next_window_start(now) - now).total_seconds()
+                    await asyncio.sleep(min(max(wait, 1.0), _poll_seconds()))
+                    continue
+                window_start = _current_window_start(now)
+                if plan is None or plan.window_start != window_start:
+                    plan = WindowPlan(window_start, len(load_servers()), load_model(), now)
+                entries = [entry for entry in pending if job_key(entry) not in plan.skipped]
+                if entries:
+                    print(f"Window open until {plan.window_end.isoformat(timespec='minutes')}: {len(entries)} pending job(s)")
+                    try:
+                        await run_pipeline(plan.requests(entries), depth)
+                        continue
+                    except (ConnectionError, httpx.HTTPError) as exc:
+                        print(f"Scheduler drain interrupted: {exc}")
+                await asyncio.sleep(_poll_seconds())
+    finally:
+        store.close()
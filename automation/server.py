@@ -0,0 +1,158 @@
+import asyncio
+import sys
+from typing import Any, Dict
+import httpx
+from . import COMFY_ROOT
+from .logs import LOG_DIRECTORY, BufferedLogWriter
+from .workflows import load_launcher, load_servers
+LAUNCHER_CONFIG = load_launcher()
+HOST = LAUNCHER_CONFIG.get("host", "127.0.0.1")
+BASE_PORT = int(LAUNCHER_CONFIG.get("base_port", 8188))
+RESTART_MIN_SECONDS = float(LAUNCHER_CONFIG.get("restart_backoff_min_seconds", 1))
+RESTART_MAX_SECONDS = float(LAUNCHER_CONFIG.get("restart_backoff_max_seconds", 60))
+STABLE_SECONDS = float(LAUNCHER_CONFIG.get("stable_seconds", 120))
+READY_TIMEOUT_SECONDS = float(LAUNCHER_CONFIG.get("ready_timeout_seconds", 600))
+READY_POLL_SECONDS = float(LAUNCHER_CONFIG.get("ready_poll_seconds", 1))
+LOG_FLUSH_LINES = int(LAUNCHER_CONFIG.get("log_flush_lines", 200))
+LOG_FLUSH_SECONDS = float(LAUNCHER_CONFIG.get("log_flush_seconds", 1))
+LOG_NAME = "start-server.jsonl"
+STREAM_LIMIT_BYTES = 1 << 20
+def instance_specs(count: int) -> list[Dict[str, Any]]:
+    servers = load_servers()
+    specs: list[Dict[str, Any]] = []
+    for idx in range(count):
+        entry = servers[idx] if idx < len(servers) else {}
+        url = entry.get("url", "")
+        port = int(url.rsplit(":", 1)[1]) if ":" in url else BASE_PORT + idx
+        specs.append(
+            {
+                "name": entry.get("name") or f"gpu{idx}",
+                "port": port,
+                "device": entry.get("device", idx if count > 1 else None),
+                "args": [str(arg) for arg in entry.get("args", [])],
+            }
+        )
+    return specs
+def _command(spec: Dict[str, Any]) -> list[str]:
+    command = [
+        "uv",
+        "run",
+        "python",
+        str(COMFY_ROOT / "main.py"),
+        "--listen",
+        HOST,
+        "--port",
+        str(spec["port"]),
+    ]
+    if spec.get("device") is not None:
+        command.extend(["--cuda-device", str(spec["device"])])
+    command.extend(spec.get("args", []))
+    return command
+class Supervisor:
+    def __init__(self, specs: list[Dict[str, Any]], restart: bool = True) -> None:
+        self.specs = specs
+        self.restart = restart
+        self.writer = BufferedLogWriter(LOG_DIRECTORY / LOG_NAME, LOG_FLUSH_LINES, LOG_FLUSH_SECONDS)
+        self.processes: Dict[str, asyncio.subprocess.Process] = {}
+        self.ready_at: Dict[str, float] = {}
+        self.prefix = len(specs) > 1
+    def _log(self, spec: Dict[str, Any], message: str, event: str = "output") -> None:
+        self.writer.write(
+            {
+                "mode": "start-server",
+                "preset": "standard",
+                "prompt_digest": "",
+                "output_nodes": [],
+                "event": event,
+                "instance": spec["name"],
+                "port": spec["port"],
+                "message": message,
+            }
+        )
+    async def _pump(self, spec: Dict[str, Any], process: asyncio.subprocess.Process) -> None:
+        stream = process.stdout
+        if stream is None:
+            return
+        while True:
+            try:
+                raw = await stream.readuntil(b"\n")
+            except asyncio.IncompleteReadError as exc:
+                raw = exc.partial
+            except asyncio.LimitOverrunError as exc:
+                raw = await stream.read(exc.consumed)
+            if not raw:
+                return
+            line = raw.decode("utf-8", errors="replace").rstrip("\n")
+            self._log(spec, line)
+            print(f"[{spec['name']}] {line}" if self.prefix else line)
+    async def _await_ready(self, spec: Dict[str, Any], process: asyncio.subprocess.Process) -> None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + READY_TIMEOUT_SECONDS
+        url = f"http://{HOST}:{spec['port']}/system_stats"
+        async with httpx.AsyncClient(timeout=READY_POLL_SECONDS * 5) as client:
+            while process.returncode is None and loop.time() < deadline:
+                try:
+                    resp = await client.get(url)
+                    if resp.status_code == 200:
+                        self.ready_at[spec["name"]] = loop.time()
+                        self._log(spec, f"ready on {HOST}:{spec['port']}", "ready")
+                        print(f"[{spec['name']}] ready on {HOST}:{spec['port']}")
+                        return
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(READY_POLL_SECONDS)
+        if process.returncode is None:
+            self._log(spec, f"not ready after {READY_TIMEOUT_SECONDS}s", "ready_timeout")
+            if self.restart:
+                print(f"[{spec['name']}] not ready after {READY_TIMEOUT_SECONDS}s, killing pid {process.pid}")
+                try:
+                    process.kill()
+                except ProcessLookupError:
+                    pass
+    async def _run_instance(self, spec: Dict[str, Any]) -> int:
+        delay = RESTART_MIN_SECONDS
+        loop = asyncio.get_running_loop()
+        while True:
+            self.ready_at.pop(spec["name"], None)
+            process = await asyncio.create_subprocess_exec(
+                *_command(spec),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                limit=STREAM_LIMIT_BYTES,
+            )
+            self.processes[spec["name"]] = process
+            self._log(spec, f"started pid {process.pid}", "started")
+            ready = asyncio.create_task(self._await_ready(spec, process))
+            await self._pump(spec, process)
+            code = await process.wait()
+            ready.cancel()
+            await asyncio.gather(ready, return_exceptions=True)
+            self._log(spec, f"exited with code {code}", "exited")
+            if not self.restart:
+                return code
+            ready_at = self.ready_at.get(spec["name"])
+            if ready_at is not None and loop.time() - ready_at >= STABLE_SECONDS:
+                delay = RESTART_MIN_SECONDS
+            self._log(spec, f"restarting in {delay:.1f}s", "restarting")
+            print(f"[{spec['name']}] exited with code {code}, restarting in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RESTART_MAX_SECONDS)
+    async def run(self) -> int:
+        try:
+            codes = await asyncio.gather(*(self._run_instance(spec) for spec in self.specs))
+            return max(codes, key=abs) if codes else 0
+        finally:
+            for process in self.processes.values():
+                if process.returncode is None:
+                    process.terminate()
+            for process in self.processes.values():
+                if process.returncode is None:
+                    await process.wait()
+            self.writer.close()
+def start_servers(count: int | None = None) -> None:
+    supervisor = Supervisor(instance_specs(count or 1), restart=count is not None)
+    try:
+        code = asyncio.run(supervisor.run())
+    except KeyboardInterrupt:
+        code = 130
+    sys.exit(code)
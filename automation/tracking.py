@@ -1,12 +1,22 @@
+import atexit
+import hashlib
 import json
+import os
+import queue
 import subprocess
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Sequence, Tuple
-from mlflow.entities import Run
-from mlflow.tracking import MlflowClient
-import torch
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Sequence, Tuple
+from .logs import append_named_log
 from .workflows import load_tracking
+if TYPE_CHECKING:
+    from mlflow.entities import Run
+    from mlflow.tracking import MlflowClient
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 CONFIG = load_tracking()
 ENABLED = bool(CONFIG.get("enabled", False))
@@ -16,7 +26,15 @@ RUN_NAME_PATTERN = CONFIG.get("run_name", "{mode}-{digest}-{stamp}")
 UI_HOST = CONFIG.get("ui_host", "127.0.0.1")
 UI_PORT = int(CONFIG.get("ui_port", 8250))
 LIST_LIMIT = int(CONFIG.get("list_limit", 20))
-CLIENT: MlflowClient | None = None
+WRITER_QUEUE_SIZE = int(CONFIG.get("writer_queue_size", 256))
+ARTIFACT_MODE = CONFIG.get("artifact_mode", "reference")
+ARTIFACT_HASH = bool(CONFIG.get("artifact_hash", True))
+ARTIFACT_COPY_CONCURRENCY = int(CONFIG.get("artifact_copy_concurrency", 2))
+HASH_CHUNK_BYTES = 8 << 20
+BATCH_PARAM_LIMIT = 100
+BATCH_TAG_LIMIT = 100
+BATCH_METRIC_LIMIT = 1000
+CLIENT: "MlflowClient | None" = None
 EXPERIMENT_ID: str | None = None
 TRACKING_URI: str | None = None
 def _utc_iso(moment: datetime) -> str:
@@ -27,10 +45,12 @@ def _tracking_path() -> Path:
     path = PROJECT_ROOT / ARTIFACT_DIR
     path.mkdir(parents=True, exist_ok=True)
     return path.resolve()
-def _client() -> Tuple[MlflowClient, str, str]:
+GPU_TAGS: Dict[str, str] | None = None
+def _client() -> Tuple["MlflowClient", str, str]:
     global CLIENT, EXPERIMENT_ID, TRACKING_URI
     if CLIENT is not None and EXPERIMENT_ID is not None and TRACKING_URI is not None:
         return CLIENT, EXPERIMENT_ID, TRACKING_URI
+    from mlflow.tracking import MlflowClient
     path = _tracking_path()
     uri = path.as_uri()
     client = MlflowClient(tracking_uri=uri)
@@ -52,6 +72,12 @@ def _stringify_params(values: Dict[str, Any]) -> Dict[str, str]:
             result[key] = str(value)
     return result
 def _gpu_tags() -> Dict[str, str]:
+    global GPU_TAGS
+    if GPU_TAGS is None:
+        GPU_TAGS = _probe_gpu()
+    return dict(GPU_TAGS)
+def _probe_gpu() -> Dict[str, str]:
+    import torch
     if not torch.cuda.is_available():
         return {
             "gpu_available": "false",
@@ -67,6 +93,109 @@ def _gpu_tags() -> Dict[str, str]:
         tags["gpu_primary_name"] = name
         tags["gpu_primary_total_vram_bytes"] = str(total)
     return tags
+class TrackingWriter:
+    def __init__(self, client: "MlflowClient", maxsize: int) -> None:
+        self.client = client
+        self.queue: queue.Queue[Callable[[], None] | None] = queue.Queue(maxsize)
+        self.thread = threading.Thread(target=self._run, name="tracking-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+    def submit(self, action: Callable[[], None]) -> None:
+        self.queue.put(action)
+    def _run(self) -> None:
+        while True:
+            action = self.queue.get()
+            try:
+                if action is None:
+                    return
+                action()
+            except Exception as exc:
+                append_named_log("tracking_errors.jsonl", {"event": "tracking_write_failed", "message": repr(exc)})
+            finally:
+                self.queue.task_done()
+    def flush(self) -> None:
+        self.queue.join()
+    def close(self) -> None:
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        _wait_copies()
+WRITER: TrackingWriter | None = None
+def _writer(client: "MlflowClient") -> TrackingWriter:
+    global WRITER
+    if WRITER is None:
+        WRITER = TrackingWriter(client, WRITER_QUEUE_SIZE)
+    return WRITER
+COPY_POOL: ThreadPoolExecutor | None = None
+COPY_FUTURES: set[Future[None]] = set()
+COPY_LOCK = threading.Lock()
+def _copy_done(future: Future[None]) -> None:
+    with COPY_LOCK:
+        COPY_FUTURES.discard(future)
+def _wait_copies() -> None:
+    with COPY_LOCK:
+        pending = list(COPY_FUTURES)
+    wait(pending)
+def _copy_artifact(client: "MlflowClient", run_id: str, source: Path) -> None:
+    global COPY_POOL
+    with COPY_LOCK:
+        if COPY_POOL is None:
+            COPY_POOL = ThreadPoolExecutor(max_workers=max(1, ARTIFACT_COPY_CONCURRENCY), thread_name_prefix="artifact-copy")
+        future = COPY_POOL.submit(client.log_artifact, run_id, str(source), "outputs")
+        COPY_FUTURES.add(future)
+    future.add_done_callback(_copy_done)
+def _file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        while True:
+            chunk = handle.read(HASH_CHUNK_BYTES)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+def _artifact_dir(client: "MlflowClient", run_id: str) -> Path | None:
+    uri = client.get_run(run_id).info.artifact_uri
+    parsed = urlparse(uri)
+    if parsed.scheme not in ("", "file"):
+        return None
+    return Path(url2pathname(parsed.path))
+def _link_artifact(client: "MlflowClient", run_id: str, source: Path) -> str:
+    root = _artifact_dir(client, run_id)
+    if root is None:
+        return "reference"
+    target = root / "outputs" / source.name
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(source, target)
+    except FileExistsError:
+        pass
+    except OSError:
+        return "reference"
+    return "hardlink"
+def _register_outputs(client: "MlflowClient", run_id: str, files: Sequence[Path]) -> None:
+    entries: List[Dict[str, Any]] = []
+    for source in files:
+        stat = source.stat()
+        entry: Dict[str, Any] = {
+            "path": str(source),
+            "size_bytes": stat.st_size,
+            "mtime": stat.st_mtime,
+        }
+        if ARTIFACT_HASH:
+            entry["sha256"] = _file_digest(source)
+        if ARTIFACT_MODE == "link":
+            entry["storage"] = _link_artifact(client, run_id, source)
+        elif ARTIFACT_MODE == "copy":
+            _copy_artifact(client, run_id, source)
+            entry["storage"] = "copy"
+        else:
+            entry["storage"] = "reference"
+        entries.append(entry)
+    client.log_dict(run_id, {"mode": ARTIFACT_MODE, "outputs": entries}, "outputs.json")
+def flush_tracking() -> None:
+    if WRITER is not None:
+        WRITER.flush()
+    _wait_copies()
 class NullSession:
     def log_window(self, window_start: datetime) -> None:
         return
@@ -74,6 +203,21 @@ class NullSession:
         return
     def log_queue(self, prompt_id: str) -> None:
         return
+    def log_outcome(
+        self,
+        status: str,
+        failure: str | None,
+        rungs: Sequence[str],
+        adjustments: Dict[str, Any],
+    ) -> None:
+        return
+    def log_profile(
+        self,
+        summary: Dict[str, float],
+        series: Dict[str, Sequence[Tuple[int, float, float]]],
+        trace: Dict[str, Any],
+    ) -> None:
+        return
     def log_completion(
         self,
         elapsed: float,
@@ -119,21 +263,78 @@ class TrackingSession:
         self.client = client
         self.run_id = run.info.run_id
         self.parameters = parameters
-        for key, value in _stringify_params(parameters).items():
-            self.client.log_param(self.run_id, key, value)
-        self.client.log_text(self.run_id, prompt, "prompt_input.txt")
-        self.client.log_text(self.run_id, enriched_prompt, "prompt_enriched.txt")
-        self.client.log_dict(self.run_id, workflow, "workflow.json")
+        self.writer = _writer(client)
+        self._params: Dict[str, str] = _stringify_params(parameters)
+        self._tags: Dict[str, str] = {}
+        self._metrics: Dict[str, float] = {}
+        self._flush()
+        self.writer.submit(lambda: client.log_text(self.run_id, prompt, "prompt_input.txt"))
+        self.writer.submit(lambda: client.log_text(self.run_id, enriched_prompt, "prompt_enriched.txt"))
+        self.writer.submit(lambda: client.log_dict(self.run_id, workflow, "workflow.json"))
         self.start_time: datetime | None = None
+    def _flush(self) -> None:
+        from mlflow.entities import Metric, Param, RunTag
+        stamp = int(time.time() * 1000)
+        params = [Param(key, value) for key, value in self._params.items()]
+        tags = [RunTag(key, value) for key, value in self._tags.items()]
+        metrics = [Metric(key, value, stamp, 0) for key, value in self._metrics.items()]
+        self._params = {}
+        self._tags = {}
+        self._metrics = {}
+        client = self.client
+        run_id = self.run_id
+        while params or tags or metrics:
+            chunk_params = params[:BATCH_PARAM_LIMIT]
+            chunk_tags = tags[:BATCH_TAG_LIMIT]
+            params = params[BATCH_PARAM_LIMIT:]
+            tags = tags[BATCH_TAG_LIMIT:]
+            chunk_metrics = metrics
+            metrics = []
+            self.writer.submit(
+                lambda p=chunk_params, t=chunk_tags, m=chunk_metrics: client.log_batch(run_id, metrics=m, params=p, tags=t)
+            )
     def log_window(self, window_start: datetime) -> None:
-        self.client.set_tag(self.run_id, "window_start_utc", _utc_iso(window_start))
-        self.client.set_tag(self.run_id, "window_start_local", _local_iso(window_start))
+        self._tags["window_start_utc"] = _utc_iso(window_start)
+        self._tags["window_start_local"] = _local_iso(window_start)
     def set_start(self, moment: datetime) -> None:
         utc_start = moment.replace(tzinfo=timezone.utc)
         self.start_time = utc_start
-        self.client.set_tag(self.run_id, "execution_start_utc", _utc_iso(utc_start))
+        self._tags["execution_start_utc"] = _utc_iso(utc_start)
     def log_queue(self, prompt_id: str) -> None:
-        self.client.set_tag(self.run_id, "prompt_id", prompt_id)
+        self._tags["prompt_id"] = prompt_id
+    def log_outcome(
+        self,
+        status: str,
+        failure: str | None,
+        rungs: Sequence[str],
+        adjustments: Dict[str, Any],
+    ) -> None:
+        self._tags["status"] = status
+        if failure:
+            self._tags["failure_class"] = failure
+        if rungs:
+            self._tags["recovery_rung"] = rungs[-1]
+            self._tags["recovery_rungs"] = ",".join(rungs)
+            self._tags["recovery_adjustments"] = json.dumps(adjustments, ensure_ascii=False)
+    def log_profile(
+        self,
+        summary: Dict[str, float],
+        series: Dict[str, Sequence[Tuple[int, float, float]]],
+        trace: Dict[str, Any],
+    ) -> None:
+        from mlflow.entities import Metric
+        self._metrics.update(summary)
+        metrics = [
+            Metric(key, float(value), int(moment * 1000), step)
+            for key, points in series.items()
+            for step, moment, value in points
+        ]
+        client = self.client
+        run_id = self.run_id
+        for start in range(0, len(metrics), BATCH_METRIC_LIMIT):
+            chunk = metrics[start : start + BATCH_METRIC_LIMIT]
+            self.writer.submit(lambda m=chunk: client.log_batch(run_id, metrics=m))
+        self.writer.submit(lambda: client.log_dict(run_id, trace, "profile_trace.json"))
     def log_completion(
         self,
         elapsed: float,
@@ -145,26 +346,28 @@ class TrackingSession:
         utc_end = end_time.replace(tzinfo=timezone.utc)
         frames_value = float(self.parameters.get("frames", 0) or 0)
         fps = frames_value / elapsed if elapsed > 0 and frames_value else 0.0
-        self.client.log_metric(self.run_id, "elapsed_seconds", elapsed)
+        self._metrics["elapsed_seconds"] = elapsed
         if fps:
-            self.client.log_metric(self.run_id, "fps", fps)
-        self.client.set_tag(self.run_id, "execution_end_utc", _utc_iso(utc_end))
+            self._metrics["fps"] = fps
+        self._tags["execution_end_utc"] = _utc_iso(utc_end)
         if self.start_time:
-            self.client.set_tag(self.run_id, "execution_start_epoch", str(int(self.start_time.timestamp())))
-        self.client.set_tag(self.run_id, "execution_end_epoch", str(int(utc_end.timestamp())))
-        self.client.set_tag(self.run_id, "output_nodes", ",".join(nodes))
-        self.client.set_tag(
-            self.run_id,
-            "output_paths",
-            json.dumps([str(path) for path in paths], ensure_ascii=False),
-        )
-        self.client.log_dict(self.run_id, history, "history.json")
+            self._tags["execution_start_epoch"] = str(int(self.start_time.timestamp()))
+        self._tags["execution_end_epoch"] = str(int(utc_end.timestamp()))
+        self._tags["output_nodes"] = ",".join(nodes)
+        self._tags["output_paths"] = json.dumps([str(path) for path in paths], ensure_ascii=False)
+        self._flush()
+        client = self.client
+        run_id = self.run_id
+        self.writer.submit(lambda: client.log_dict(run_id, history, "history.json"))
+        files: List[Path] = []
         for path in paths:
             file_path = Path(path)
             if not file_path.is_absolute():
                 file_path = PROJECT_ROOT / path
             if file_path.exists():
-                self.client.log_artifact(self.run_id, str(file_path))
+                files.append(file_path)
+        if files:
+            self.writer.submit(lambda: _register_outputs(client, run_id, files))
 def create_session(
     mode: str,
     preset: str | None,
@@ -187,7 +390,24 @@ def create_session(
         workflow=workflow,
         schedule_mode=schedule_mode,
     )
-def _format_run_line(run: Run) -> str:
+def run_samples(limit: int) -> List[Tuple[Dict[str, str], float]]:
+    if not ENABLED:
+        return []
+    client, experiment_id, _ = _client()
+    runs = client.search_runs(
+        experiment_ids=[experiment_id],
+        order_by=["attributes.start_time DESC"],
+        max_results=limit,
+    )
+    samples: List[Tuple[Dict[str, str], float]] = []
+    for run in runs:
+        if not run.data.metrics.get("elapsed_seconds") or run.data.tags.get("status", "completed") != "completed":
+            continue
+        params = dict(run.data.params)
+        params.update(_stringify_params(json.loads(run.data.tags.get("recovery_adjustments", "{}"))))
+        samples.append((params, run.data.metrics["elapsed_seconds"]))
+    return samples
+def _format_run_line(run: "Run") -> str:
     data = run.data
     start_ms = run.info.start_time or 0
     start = datetime.fromtimestamp(start_ms / 1000, timezone.utc)
@@ -196,14 +416,14 @@ def _format_run_line(run: Run) -> str:
     preset = data.tags.get("preset", "")
     prompt_digest = data.tags.get("prompt_digest", "")
     return f"{run.info.run_id} | {start.isoformat()} | {mode} | {preset} | {elapsed:.2f}s | {prompt_digest}"
-def _print_run_paths(run: Run) -> None:
+def _print_run_paths(run: "Run") -> None:
     paths = run.data.tags.get("output_paths")
     if not paths:
         return
     decoded = json.loads(paths)
     for entry in decoded:
         print(f"  artifact: {entry}")
-def _list_runs(client: MlflowClient, experiment_id: str) -> None:
+def _list_runs(client: "MlflowClient", experiment_id: str) -> None:
     runs = client.search_runs(
         experiment_ids=[experiment_id],
         order_by=["attributes.start_time DESC"],
@@ -215,7 +435,7 @@ def _list_runs(client: MlflowClient, experiment_id: str) -> None:
     for run in runs:
         print(_format_run_line(run))
         _print_run_paths(run)
-def _stats(client: MlflowClient, experiment_id: str) -> None:
+def _stats(client: "MlflowClient", experiment_id: str) -> None:
     runs = client.search_runs(
         experiment_ids=[experiment_id],
         order_by=["attributes.start_time DESC"],
@@ -238,7 +458,7 @@ def _stats(client: MlflowClient, experiment_id: str) -> None:
     for preset, values in presets.items():
         avg = sum(values) / len(values)
         print(f"{preset}: count={len(values)} avg={avg:.2f}")
-def _compare(client: MlflowClient, run_ids: Sequence[str]) -> None:
+def _compare(client: "MlflowClient", run_ids: Sequence[str]) -> None:
     if len(run_ids) < 2:
         print("Need two run ids.")
         return
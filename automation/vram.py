@@ -0,0 +1,185 @@
+import math
+import re
+from pathlib import Path
+from typing import Any, Dict
+from .models import load_manifest
+from .workflows import load_vram
+BUDGET_GB: float
+RESERVE_GB: float
+ACTION: str
+DOWNGRADES: tuple[str, ...]
+MIN_FRAMES: int
+DEFAULT_PARAMS_B: float
+TEXT_ENCODER_GB: Dict[str, float]
+VAE_WEIGHTS_GB: float
+DECODE_GB_PER_MEGAPIXEL: float
+ACTIVATION_FACTOR: float
+DECODE_HEADROOM: float
+TILE_MIN: int
+TILE_ALIGN: int
+RECOVERY_LADDER: tuple[str, ...]
+RECOVERY_ATTEMPTS: int
+OFFLOAD_BLOCKS: int
+FRAME_FACTOR: float
+FALLBACK_PRESETS: Dict[str, str]
+def refresh_settings() -> None:
+    global BUDGET_GB, RESERVE_GB, ACTION, DOWNGRADES, MIN_FRAMES, DEFAULT_PARAMS_B, TEXT_ENCODER_GB, VAE_WEIGHTS_GB
+    global DECODE_GB_PER_MEGAPIXEL, ACTIVATION_FACTOR, DECODE_HEADROOM, TILE_MIN, TILE_ALIGN, RECOVERY_LADDER
+    global RECOVERY_ATTEMPTS, OFFLOAD_BLOCKS, FRAME_FACTOR, FALLBACK_PRESETS
+    config = load_vram()
+    BUDGET_GB = float(config.get("budget_gb", 24))
+    RESERVE_GB = float(config.get("reserve_gb", 1.5))
+    ACTION = config.get("action", "downgrade")
+    DOWNGRADES = tuple(config.get("downgrades", ("vae_tiling", "fp8", "reduce_frames")))
+    MIN_FRAMES = int(config.get("min_frames", 17))
+    DEFAULT_PARAMS_B = float(config.get("default_params_b", 14))
+    TEXT_ENCODER_GB = config.get("text_encoder_gb", {"fp8": 6.7, "bf16": 11.4})
+    VAE_WEIGHTS_GB = float(config.get("vae_weights_gb", 0.5))
+    DECODE_GB_PER_MEGAPIXEL = float(config.get("decode_gb_per_megapixel", 11))
+    ACTIVATION_FACTOR = float(config.get("activation_factor", 8))
+    DECODE_HEADROOM = float(config.get("decode_headroom", 0.8))
+    TILE_MIN = int(config.get("tile_min", 128))
+    TILE_ALIGN = int(config.get("tile_align", 16))
+    recovery = config.get("recovery", {})
+    RECOVERY_LADDER = tuple(recovery.get("ladder", ("vae_tiling", "offload", "reduce_frames", "preset", "fp8")))
+    RECOVERY_ATTEMPTS = int(recovery.get("max_attempts", len(RECOVERY_LADDER)))
+    OFFLOAD_BLOCKS = int(recovery.get("offload_blocks", 20))
+    FRAME_FACTOR = float(recovery.get("frame_factor", 0.6))
+    FALLBACK_PRESETS = recovery.get("fallback_presets", {})
+refresh_settings()
+DEFAULT_TILES = {"tile_x": 272, "tile_y": 272, "tile_stride_x": 144, "tile_stride_y": 128}
+TILE_KEYS = tuple(DEFAULT_TILES)
+GGUF_BYTES_PER_PARAM = {"8": 1.07, "6": 0.83, "5": 0.71, "4": 0.6, "3": 0.49, "2": 0.38}
+HIDDEN_DIMS = ((10.0, 5120, 40), (3.0, 3072, 30), (0.0, 1536, 30))
+GIB = float(1 << 30)
+class VRAMBudgetError(RuntimeError):
+    pass
+def _params_billion(model_name: str) -> float:
+    asset = load_manifest().get(model_name)
+    for text in (Path(model_name).name, asset.repo_id if asset else ""):
+        match = re.search(r"(\d+(?:\.\d+)?)B\b", text)
+        if match:
+            return float(match.group(1))
+    return DEFAULT_PARAMS_B
+def _bytes_per_param(model_name: str, quantization: str) -> float:
+    name = Path(model_name).name.lower()
+    if name.endswith(".gguf"):
+        match = re.search(r"q(\d)", name)
+        return GGUF_BYTES_PER_PARAM.get(match.group(1), 1.0) if match else 1.0
+    if str(quantization).startswith("fp8") or "fp8" in name:
+        return 1.0
+    return 2.0
+def _frame_buffer_gb(width: int, height: int, frames: int) -> float:
+    return frames * width * height * 3 * 2 / GIB
+def _align(value: float, floor: int) -> int:
+    return max(floor, int(value) // TILE_ALIGN * TILE_ALIGN)
+def tiling_policy(
+    width: int,
+    height: int,
+    frames: int,
+    requested: Any = "auto",
+    budget_gb: float | None = None,
+) -> Dict[str, Any]:
+    if budget_gb is None:
+        budget_gb = BUDGET_GB
+    available = (budget_gb - RESERVE_GB) * DECODE_HEADROOM - VAE_WEIGHTS_GB - _frame_buffer_gb(width, height, frames)
+    full = width * height / 1e6 * DECODE_GB_PER_MEGAPIXEL
+    if requested is False or (requested in (None, "auto") and full <= available):
+        return {"vae_tiling": False, **DEFAULT_TILES}
+    area = max(available, 0.0) / DECODE_GB_PER_MEGAPIXEL * 1e6
+    tile_x = min(_align(math.sqrt(area * width / height), TILE_MIN), width)
+    tile_y = min(_align(math.sqrt(area * height / width), TILE_MIN), height)
+    return _tiles(tile_x, tile_y)
+def _tiles(tile_x: int, tile_y: int) -> Dict[str, Any]:
+    return {
+        "vae_tiling": True,
+        "tile_x": tile_x,
+        "tile_y": tile_y,
+        "tile_stride_x": _align(tile_x / 2, TILE_ALIGN),
+        "tile_stride_y": _align(tile_y / 2, TILE_ALIGN),
+    }
+def estimate_vram(parameters: Dict[str, Any]) -> Dict[str, float]:
+    model_name = str(parameters.get("model_name", ""))
+    params_b = _params_billion(model_name)
+    weights = params_b * 1e9 * _bytes_per_param(model_name, str(parameters.get("quantization", "disabled"))) / GIB
+    hidden, blocks = next((dim, count) for floor, dim, count in HIDDEN_DIMS if params_b >= floor)
+    weights *= 1 - min(int(parameters.get("blocks_to_swap", 0) or 0), blocks) / blocks
+    stride = 16 if "2.2" in str(parameters.get("vae_name", "")) else 8
+    width = int(parameters.get("width", 1280))
+    height = int(parameters.get("height", 720))
+    frames = int(parameters.get("frames", 81))
+    tokens = ((frames - 1) // 4 + 1) * -(-height // (stride * 2)) * -(-width // (stride * 2))
+    sampling = weights + tokens * hidden * 2 * ACTIVATION_FACTOR / GIB
+    if parameters.get("vae_tiling"):
+        area = min(int(parameters.get("tile_x", 272)), width) * min(int(parameters.get("tile_y", 272)), height)
+    else:
+        area = width * height
+    decode = VAE_WEIGHTS_GB + area / 1e6 * DECODE_GB_PER_MEGAPIXEL + _frame_buffer_gb(width, height, frames)
+    encoder_key = "fp8" if "fp8" in str(parameters.get("text_encoder_name", "")).lower() else "bf16"
+    text_encoder = float(TEXT_ENCODER_GB.get(encoder_key, 11.4))
+    return {
+        "text_encoder_gb": round(text_encoder, 2),
+        "sampling_gb": round(sampling, 2),
+        "decode_gb": round(decode, 2),
+        "peak_gb": round(max(text_encoder, sampling, decode) + RESERVE_GB, 2),
+    }
+def _downgrade(rung: str, current: Dict[str, Any], budget_gb: float) -> Dict[str, Any]:
+    if rung == "vae_tiling" and not current.get("vae_tiling"):
+        width = int(current.get("width", 1280))
+        height = int(current.get("height", 720))
+        return tiling_policy(width, height, int(current.get("frames", 81)), True, budget_gb)
+    if rung == "offload" and int(current.get("blocks_to_swap", 0) or 0) < OFFLOAD_BLOCKS:
+        return {"blocks_to_swap": OFFLOAD_BLOCKS}
+    if rung == "fp8":
+        model_name = str(current.get("model_name", "")).lower()
+        if not model_name.endswith(".gguf") and current.get("quantization", "disabled") == "disabled":
+            return {"quantization": "fp8_e4m3fn"}
+    if rung == "reduce_frames":
+        trial = dict(current)
+        frames = int(trial.get("frames", 81))
+        while frames - 4 >= MIN_FRAMES and estimate_vram(trial)["peak_gb"] > budget_gb:
+            frames = ((frames - 1) // 4 - 1) * 4 + 1
+            trial["frames"] = frames
+        if frames != int(current.get("frames", 81)):
+            return {"frames": frames}
+    return {}
+def preflight(parameters: Dict[str, Any], budget_gb: float | None = None) -> tuple[Dict[str, Any], Dict[str, float]]:
+    if budget_gb is None:
+        budget_gb = BUDGET_GB
+    current = dict(parameters)
+    changes: Dict[str, Any] = {}
+    estimate = estimate_vram(current)
+    progress = ACTION == "downgrade"
+    while progress and estimate["peak_gb"] > budget_gb:
+        progress = False
+        for rung in DOWNGRADES:
+            if estimate["peak_gb"] <= budget_gb:
+                break
+            step = _downgrade(rung, current, budget_gb)
+            trial = estimate_vram({**current, **step})
+            if step and trial["peak_gb"] < estimate["peak_gb"]:
+                current.update(step)
+                changes.update(step)
+                estimate = trial
+                progress = True
+    if estimate["peak_gb"] > budget_gb and ACTION != "warn":
+        raise VRAMBudgetError(f"needs ~{estimate['peak_gb']:.1f} GiB of VRAM, budget is {budget_gb:.1f} GiB")
+    return changes, estimate
+def degrade(rung: str, current: Dict[str, Any]) -> Dict[str, Any]:
+    if rung == "vae_tiling" and current.get("vae_tiling"):
+        tile_x = _align(int(current.get("tile_x", 272)) / 2, TILE_MIN)
+        tile_y = _align(int(current.get("tile_y", 272)) / 2, TILE_MIN)
+        if (tile_x, tile_y) == (current.get("tile_x"), current.get("tile_y")):
+            return {}
+        return _tiles(tile_x, tile_y)
+    if rung == "vae_tiling":
+        policy = _downgrade(rung, current, BUDGET_GB)
+        return _tiles(min(policy["tile_x"], DEFAULT_TILES["tile_x"]), min(policy["tile_y"], DEFAULT_TILES["tile_y"]))
+    if rung == "reduce_frames":
+        frames = int(current.get("frames", 81))
+        reduced = max(MIN_FRAMES, int((frames - 1) * FRAME_FACTOR) // 4 * 4 + 1)
+        return {"frames": reduced} if reduced < frames else {}
+    if rung == "preset":
+        fallback = FALLBACK_PRESETS.get(current.get("preset"))
+        return {"preset": fallback} if fallback else {}
+    return _downgrade(rung, current, BUDGET_GB)
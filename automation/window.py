@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone, time as dt_time
+from typing import Any
+from zoneinfo import ZoneInfo
+from .workflows import load_scheduling
+LOCAL_ZONE = datetime.now().astimezone().tzinfo or timezone.utc
+SCHEDULE_ZONE: Any
+WINDOW_START: dt_time
+WINDOW_END: dt_time
+SPANS_MIDNIGHT: bool
+def refresh_settings() -> None:
+    global SCHEDULE_ZONE, WINDOW_START, WINDOW_END, SPANS_MIDNIGHT
+    scheduling = load_scheduling()
+    window = scheduling.get("window", {})
+    timezone_name = scheduling.get("timezone")
+    SCHEDULE_ZONE = ZoneInfo(timezone_name) if timezone_name and timezone_name != "local" else LOCAL_ZONE
+    WINDOW_START = dt_time.fromisoformat(window.get("start_local", scheduling.get("nightly_window_start", "03:00")))
+    WINDOW_END = dt_time.fromisoformat(window.get("end_local", scheduling.get("nightly_window_end", "05:00")))
+    SPANS_MIDNIGHT = (WINDOW_END.hour * 60 + WINDOW_END.minute) <= (WINDOW_START.hour * 60 + WINDOW_START.minute)
+refresh_settings()
+def _utc_stamp(moment: datetime) -> str:
+    return moment.astimezone(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
+def _current_time() -> datetime:
+    if SCHEDULE_ZONE:
+        return datetime.now(SCHEDULE_ZONE)
+    return datetime.now().astimezone()
+def _window_anchor(moment: datetime, anchor: dt_time) -> datetime:
+    return moment.replace(hour=anchor.hour, minute=anchor.minute, second=anchor.second, microsecond=0)
+def _within_window(moment: datetime) -> bool:
+    minutes = moment.hour * 60 + moment.minute
+    start = WINDOW_START.hour * 60 + WINDOW_START.minute
+    end = WINDOW_END.hour * 60 + WINDOW_END.minute
+    if start == end:
+        return True
+    if SPANS_MIDNIGHT:
+        return minutes >= start or minutes < end
+    return start <= minutes < end
+def _current_window_start(moment: datetime) -> datetime:
+    start = _window_anchor(moment, WINDOW_START)
+    if SPANS_MIDNIGHT and moment.hour * 60 + moment.minute < WINDOW_END.hour * 60 + WINDOW_END.minute:
+        start -= timedelta(days=1)
+    if not SPANS_MIDNIGHT and moment < start:
+        start -= timedelta(days=1)
+    return start
+def _window_end(window_start: datetime) -> datetime:
+    end = _window_anchor(window_start, WINDOW_END)
+    if end <= window_start:
+        end += timedelta(days=1)
+    return end
+def _parse_deadline(value: Any) -> str | None:
+    if not value:
+        return None
+    moment = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=SCHEDULE_ZONE or LOCAL_ZONE)
+    return _utc_stamp(moment)
+def _next_window_start(moment: datetime) -> datetime:
+    if _within_window(moment):
+        return _current_window_start(moment)
+    start = _window_anchor(moment, WINDOW_START)
+    if SPANS_MIDNIGHT:
+        if moment.hour * 60 + moment.minute < WINDOW_END.hour * 60 + WINDOW_END.minute:
+            return start
+        if start <= moment:
+            return start + timedelta(days=1)
+        return start
+    if moment < start:
+        return start
+    return start + timedelta(days=1)
@@ -1,38 +1,182 @@
+import hashlib
+from datetime import time as dt_time
 from pathlib import Path
 from typing import Any
 import yaml
+CONFIG_PATH = Path(__file__).resolve().parent.parent / "config" / "workflows.yaml"
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+MAPPING_SECTIONS = (
+    "defaults",
+    "tracking",
+    "vram_profiles",
+    "presets",
+    "templates",
+    "launcher",
+    "execution",
+    "scheduling",
+    "prompts",
+    "prompt_defaults",
+    "prompt_components",
+    "benchmarks",
+    "cache",
+    "models",
+    "vram",
+    "logging",
+    "metrics",
+)
+INTEGER_FIELDS = ("steps", "high_quality_steps", "width", "height", "frames", "frame_rate", "seed", "blocks_to_swap")
+class ConfigError(ValueError):
+    pass
+class WorkflowConfig:
+    def __init__(self, data: dict[str, Any], stamp: tuple[int, int], digest: str) -> None:
+        self.data = data
+        self.stamp = stamp
+        self.digest = digest
+        self._templates: dict[str, dict[str, Any]] | None = None
+    def section(self, name: str) -> dict[str, Any]:
+        return self.data.get(name) or {}
+    @property
+    def defaults(self) -> dict[str, Any]:
+        return self.section("defaults")
+    @property
+    def presets(self) -> dict[str, dict[str, Any]]:
+        return self.section("presets")
+    @property
+    def servers(self) -> list[dict[str, Any]]:
+        return self.data.get("servers") or []
+    @property
+    def templates(self) -> dict[str, dict[str, Any]]:
+        if self._templates is None:
+            result: dict[str, dict[str, Any]] = {}
+            for name, values in self.section("templates").items():
+                combined = dict(self.defaults)
+                combined.update(values)
+                result[name] = combined
+            self._templates = result
+        return self._templates
+def _check_mapping(value: Any, where: str) -> None:
+    if not isinstance(value, dict):
+        raise ConfigError(f"{CONFIG_PATH.name}: {where} must be a mapping")
+def _check_parameters(values: dict[str, Any], where: str) -> None:
+    for key in INTEGER_FIELDS:
+        if key in values and not isinstance(values[key], int):
+            raise ConfigError(f"{CONFIG_PATH.name}: {where}.{key} must be an integer")
+    for key in ("dual_stage", "schedulers"):
+        if key in values:
+            _check_mapping(values[key], f"{where}.{key}")
+def _validate(data: dict[str, Any]) -> None:
+    _check_mapping(data, "top level")
+    for name in MAPPING_SECTIONS:
+        if name in data and data[name] is not None:
+            _check_mapping(data[name], name)
+    _check_parameters(data.get("defaults") or {}, "defaults")
+    profiles = data.get("vram_profiles") or {}
+    for name, values in profiles.items():
+        _check_mapping(values, f"vram_profiles.{name}")
+        _check_parameters(values, f"vram_profiles.{name}")
+    for name, values in (data.get("presets") or {}).items():
+        _check_mapping(values, f"presets.{name}")
+        _check_parameters(values, f"presets.{name}")
+        profile = values.get("vram_profile")
+        if profile is not None and profile not in profiles:
+            raise ConfigError(f"{CONFIG_PATH.name}: presets.{name}.vram_profile {profile!r} is not defined")
+    fallbacks = ((data.get("vram") or {}).get("recovery") or {}).get("fallback_presets") or {}
+    _check_mapping(fallbacks, "vram.recovery.fallback_presets")
+    for name, fallback in fallbacks.items():
+        if fallback not in (data.get("presets") or {}):
+            raise ConfigError(f"{CONFIG_PATH.name}: vram.recovery.fallback_presets.{name} {fallback!r} is not defined")
+    for name, values in (data.get("templates") or {}).items():
+        _check_mapping(values, f"templates.{name}")
+        _check_parameters(values, f"templates.{name}")
+        if not isinstance(values.get("prompt", ""), str):
+            raise ConfigError(f"{CONFIG_PATH.name}: templates.{name}.prompt must be a string")
+    servers = data.get("servers") or []
+    if not isinstance(servers, list):
+        raise ConfigError(f"{CONFIG_PATH.name}: servers must be a list")
+    for idx, entry in enumerate(servers):
+        _check_mapping(entry, f"servers[{idx}]")
+        if not entry.get("url"):
+            raise ConfigError(f"{CONFIG_PATH.name}: servers[{idx}].url is required")
+    assets = (data.get("models") or {}).get("assets") or {}
+    _check_mapping(assets, "models.assets")
+    for name, spec in assets.items():
+        _check_mapping(spec, f"models.assets.{name}")
+        for key in ("repo_id", "filename", "directory"):
+            if not spec.get(key):
+                raise ConfigError(f"{CONFIG_PATH.name}: models.assets.{name}.{key} is required")
+        for required in spec.get("requires", ()):
+            if required not in assets:
+                raise ConfigError(f"{CONFIG_PATH.name}: models.assets.{name}.requires {required!r} is not defined")
+    for name in (data.get("models") or {}).get("sync", ()):
+        if name not in assets:
+            raise ConfigError(f"{CONFIG_PATH.name}: models.sync {name!r} is not defined")
+    window = (data.get("scheduling") or {}).get("window") or {}
+    for key in ("start_local", "end_local"):
+        if key in window:
+            try:
+                dt_time.fromisoformat(str(window[key]))
+            except ValueError:
+                raise ConfigError(f"{CONFIG_PATH.name}: scheduling.window.{key} must be HH:MM") from None
+CACHE: WorkflowConfig | None = None
+REJECTED: tuple[int, int] | None = None
+def current_config() -> WorkflowConfig:
+    global CACHE, REJECTED
+    stat = CONFIG_PATH.stat()
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    if CACHE is not None and stamp in (CACHE.stamp, REJECTED):
+        return CACHE
+    raw = CONFIG_PATH.read_bytes()
+    digest = hashlib.sha256(raw).hexdigest()
+    if CACHE is not None and CACHE.digest == digest:
+        CACHE.stamp = stamp
+        return CACHE
+    try:
+        data = yaml.load(raw, Loader=YAML_LOADER) or {}
+        _validate(data)
+    except yaml.YAMLError as exc:
+        REJECTED = stamp if CACHE is not None else None
+        raise ConfigError(f"{CONFIG_PATH.name}: {exc}") from exc
+    except ConfigError:
+        REJECTED = stamp if CACHE is not None else None
+        raise
+    CACHE = WorkflowConfig(data, stamp, digest)
+    return CACHE
 def load_config() -> dict[str, Any]:
-    path = Path(__file__).resolve().parent.parent / "config" / "workflows.yaml"
-    return yaml.safe_load(path.read_text(encoding="utf-8")) or {}
+    return current_config().data
 def load_presets() -> dict[str, dict[str, Any]]:
-    data = load_config()
-    return data.get("presets", {})
+    return current_config().presets
 def load_defaults() -> dict[str, Any]:
-    data = load_config()
-    return data.get("defaults", {})
+    return current_config().defaults
 def load_prompts() -> dict[str, str]:
-    data = load_config()
-    return data.get("prompts", {})
+    return current_config().section("prompts")
 def load_prompt_defaults() -> dict[str, str]:
-    data = load_config()
-    return data.get("prompt_defaults", {})
+    return current_config().section("prompt_defaults")
 def load_prompt_components() -> dict[str, Any]:
-    data = load_config()
-    return data.get("prompt_components", {})
+    return current_config().section("prompt_components")
 def load_scheduling() -> dict[str, Any]:
-    data = load_config()
-    return data.get("scheduling", {})
+    return current_config().section("scheduling")
 def load_tracking() -> dict[str, Any]:
-    data = load_config()
-    return data.get("tracking", {})
+    return current_config().section("tracking")
+def load_execution() -> dict[str, Any]:
+    return current_config().section("execution")
+def load_servers() -> list[dict[str, Any]]:
+    return current_config().servers
+def load_launcher() -> dict[str, Any]:
+    return current_config().section("launcher")
+def load_benchmarks() -> dict[str, Any]:
+    return current_config().section("benchmarks")
+def load_cache() -> dict[str, Any]:
+    return current_config().section("cache")
+def load_models() -> dict[str, Any]:
+    return current_config().section("models")
+def load_vram_profiles() -> dict[str, dict[str, Any]]:
+    return current_config().section("vram_profiles")
+def load_vram() -> dict[str, Any]:
+    return current_config().section("vram")
+def load_logging() -> dict[str, Any]:
+    return current_config().section("logging")
+def load_metrics() -> dict[str, Any]:
+    return current_config().section("metrics")
 def load_templates() -> dict[str, dict[str, Any]]:
-    data = load_config()
-    defaults = data.get("defaults", {})
-    templates = data.get("templates", {})
-    result: dict[str, dict[str, Any]] = {}
-    for name, values in templates.items():
-        combined = dict(defaults)
-        combined.update(values)
-        result[name] = combined
-    return result
+    return current_config().templates
 WAN_TEMPLATES = load_templates()
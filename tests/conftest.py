@@ -0,0 +1,102 @@
+import asyncio
+import json
+import uuid
+from typing import Any, Dict
+import pytest
+from aiohttp import web
+import automation.core as core
+from automation.cache import ResultCache, TextEmbedIndex
+from automation.logs import BufferedLogWriter
+from automation.tracking import NullSession
+class StubComfy:
+    def __init__(self) -> None:
+        self.reject: tuple[int, Dict[str, Any]] | None = None
+        self.reject_matching = ""
+        self.unavailable = False
+        self.drop_sockets = 0
+        self.connections = 0
+        self.requests = 0
+        self.posts: list[str] = []
+        self.history: Dict[str, Dict[str, Any]] = {}
+        self.sockets: Dict[str, web.WebSocketResponse] = {}
+        self.runner: web.AppRunner | None = None
+        self.url = ""
+    async def start(self) -> "StubComfy":
+        app = web.Application()
+        app.router.add_get("/ws", self._ws)
+        app.router.add_post("/prompt", self._prompt)
+        app.router.add_get("/queue", self._queue)
+        app.router.add_post("/queue", self._queue)
+        app.router.add_post("/interrupt", self._queue)
+        app.router.add_get("/history/{prompt_id}", self._history)
+        app.router.add_get("/system_stats", self._stats)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"127.0.0.1:{port}"
+        return self
+    async def stop(self) -> None:
+        for ws in list(self.sockets.values()):
+            await ws.close()
+        if self.runner is not None:
+            await self.runner.cleanup()
+    async def _ws(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections += 1
+        self.sockets[request.rel_url.query.get("clientId", "")] = ws
+        async for _ in ws:
+            pass
+        return ws
+    async def _prompt(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if self.unavailable:
+            return web.Response(status=503)
+        body = await request.json()
+        prompt_id = body.get("prompt_id") or uuid.uuid4().hex
+        self.posts.append(prompt_id)
+        if self.reject is not None and self.reject_matching in json.dumps(body["prompt"]):
+            status, payload = self.reject
+            return web.json_response(payload, status=status)
+        self.history[prompt_id] = {
+            "outputs": {"7": {"gifs": [{"filename": f"{prompt_id}.mp4", "subfolder": "", "type": "output"}]}},
+            "status": {"status_str": "success", "completed": True},
+        }
+        if self.drop_sockets:
+            self.drop_sockets -= 1
+            ws = self.sockets.get(body.get("client_id", ""))
+            if ws is not None:
+                asyncio.ensure_future(ws.close())
+        else:
+            asyncio.get_running_loop().call_later(0.05, self._finish, body.get("client_id", ""), prompt_id)
+        return web.json_response({"prompt_id": prompt_id, "number": len(self.posts)})
+    def _finish(self, client_id: str, prompt_id: str) -> None:
+        ws = self.sockets.get(client_id)
+        if ws is not None and not ws.closed:
+            message = json.dumps({"type": "executing", "data": {"node": None, "prompt_id": prompt_id}})
+            asyncio.ensure_future(ws.send_str(message))
+    async def _queue(self, request: web.Request) -> web.Response:
+        return web.json_response({"queue_running": [], "queue_pending": []})
+    async def _history(self, request: web.Request) -> web.Response:
+        prompt_id = request.match_info["prompt_id"]
+        return web.json_response({prompt_id: self.history[prompt_id]} if prompt_id in self.history else {})
+    async def _stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"system": {}, "devices": []})
+@pytest.fixture
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, "LOG_FILE", tmp_path / "events.jsonl")
+    monkeypatch.setattr(core, "SCHEDULE_SINK", BufferedLogWriter(tmp_path / "schedule.jsonl", max_delay=0, rotate_bytes=0))
+    monkeypatch.setattr(core, "RESULT_CACHE", ResultCache(tmp_path / "result_cache"))
+    monkeypatch.setattr(core, "TEXT_EMBEDS", TextEmbedIndex(tmp_path / "text_embeds.json"))
+    monkeypatch.setattr(core, "PROFILE_ENABLED", False)
+    monkeypatch.setattr(core, "HTTP_BACKOFF_SECONDS", 0.01)
+    monkeypatch.setattr(core, "HEALTH_INTERVAL_SECONDS", 0.05)
+    monkeypatch.setattr(core, "create_session", lambda *args, **kwargs: NullSession())
+    monkeypatch.setattr(core, "resolve_models", lambda parameter_sets: [])
+    return tmp_path
+def read_events(path) -> list[Dict[str, Any]]:
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
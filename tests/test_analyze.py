@@ -0,0 +1,36 @@
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
+from automation.analyze import _percentile, load_table, report
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+def _event(event, prompt_id, seconds, **extra):
+    moment = (START + timedelta(seconds=seconds)).isoformat().replace("+00:00", "Z")
+    return {"event": event, "prompt_id": prompt_id, "timestamp": moment, **extra}
+def _job(index, run_seconds, status="execution_complete"):
+    base = index * 1000
+    return [
+        _event("queued", f"p{index}", base, preset="quality", model_name="wan.gguf"),
+        _event("execution_start", f"p{index}", base + 5),
+        _event(status, f"p{index}", base + 5 + run_seconds),
+    ]
+def test_percentile_interpolates_between_ranks():
+    assert _percentile([], 50) == 0.0
+    assert _percentile([7], 99) == 7
+    assert _percentile([40, 10, 30, 20, 50], 50) == 30
+    assert _percentile([10, 20, 30, 40, 50], 90) == 46
+def test_report_percentiles_span_rotated_logs(tmp_path):
+    rotated = tmp_path / "automation_events-20260101.jsonl.gz"
+    current = tmp_path / "automation_events.jsonl"
+    with gzip.open(rotated, "wt", encoding="utf-8") as handle:
+        for event in _job(0, 10) + _job(1, 20):
+            handle.write(json.dumps(event) + "\n")
+    events = _job(2, 30) + _job(3, 40) + _job(4, 50) + _job(5, 99, "execution_error")
+    current.write_text("".join(json.dumps(event) + "\n" for event in events) + "not json\n", encoding="utf-8")
+    table = load_table([rotated, current])
+    assert len(table) == 6
+    lines = report(table, ("preset", "status"))
+    assert lines[0] == "6 execution(s); percentiles p50/p90/p99 in seconds"
+    completed = lines.index("quality | completed: 5 run(s) (completed 5)")
+    assert lines[completed + 1] == "  queue wait 5.0/5.0/5.0"
+    assert lines[completed + 2] == "  run time   30.0/46.0/49.6"
+    assert "quality | error: 1 run(s) (error 1)" in lines
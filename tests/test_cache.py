@@ -0,0 +1,70 @@
+import asyncio
+import os
+import time
+import automation.core as core
+from automation.cache import ENTRY_NAME, ResultCache
+from conftest import StubComfy, read_events
+def _output(path, size=16):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+    return str(path)
+def _age(cache, key, seconds):
+    entry_path = cache.root / key / ENTRY_NAME
+    moment = time.time() - seconds
+    os.utime(entry_path, (moment, moment))
+def test_lookup_hits_and_restores_deleted_outputs(tmp_path):
+    cache = ResultCache(tmp_path / "cache", max_bytes=0, max_age=0)
+    video = tmp_path / "output" / "clip.mp4"
+    original = _output(video)
+    history = {"outputs": {"7": {"gifs": [{"filename": "clip.mp4"}]}}}
+    cache.store("k1", history, [original, str(tmp_path / "output" / "missing.mp4")])
+    entry = cache.lookup("k1")
+    assert entry["history"] == history
+    assert list(entry["files"]) == [original]
+    video.unlink()
+    assert cache.lookup("k1") is not None
+    assert video.read_bytes() == b"x" * 16
+    assert cache.lookup("missing") is None
+def test_lookup_drops_entry_when_cached_copy_is_gone(tmp_path):
+    cache = ResultCache(tmp_path / "cache", max_bytes=0, max_age=0)
+    video = tmp_path / "output" / "clip.mp4"
+    cache.store("k1", {}, [_output(video)])
+    video.unlink()
+    for path in (cache.root / "k1").iterdir():
+        if path.name != ENTRY_NAME:
+            path.unlink()
+    assert cache.lookup("k1") is None
+    assert not (cache.root / "k1").exists()
+def test_evict_by_size_removes_least_recently_used(tmp_path):
+    cache = ResultCache(tmp_path / "cache", max_bytes=0, max_age=0)
+    for index, key in enumerate(("old", "used", "new")):
+        cache.store(key, {}, [_output(tmp_path / "output" / f"{key}.mp4", 100)])
+        _age(cache, key, 300 - index * 100)
+    cache.lookup("used")
+    total = sum(path.stat().st_size for path in cache.root.rglob("*") if path.is_file())
+    cache.max_bytes = total - 1
+    assert cache.evict() == ["old"]
+    assert sorted(path.name for path in cache.root.iterdir()) == ["new", "used"]
+def test_evict_by_age(tmp_path):
+    cache = ResultCache(tmp_path / "cache", max_bytes=0, max_age=3600)
+    cache.store("stale", {}, [_output(tmp_path / "output" / "stale.mp4")])
+    cache.store("fresh", {}, [_output(tmp_path / "output" / "fresh.mp4")])
+    _age(cache, "stale", 7200)
+    assert cache.evict() == ["stale"]
+    assert cache.lookup("stale") is None
+    assert cache.lookup("fresh") is not None
+def test_pipeline_reuses_cached_result(isolated):
+    options = {"preset": "quality", "frames": 17, "use_cache": True, "use_schedule": False}
+    async def scenario() -> tuple[list[dict], StubComfy]:
+        job = await core._prepare_job("a harbor in fog", "wan", **dict(options))
+        core.RESULT_CACHE.store(job.cache_key, {"outputs": {"7": {}}}, [_output(isolated / "output" / "fog.mp4")])
+        stub = await StubComfy().start()
+        try:
+            servers = [{"name": "stub0", "url": stub.url}]
+            return await core.run_pipeline([("a harbor in fog", "wan", dict(options))], 1, servers), stub
+        finally:
+            await stub.stop()
+    results, stub = asyncio.run(scenario())
+    assert results == [{"outputs": {"7": {}}}]
+    assert stub.posts == []
+    assert [event["event"] for event in read_events(isolated / "schedule.jsonl")] == ["cache_hit"]
@@ -0,0 +1,57 @@
+import asyncio
+import automation.core as core
+from automation.cache import TextEmbedIndex
+from automation.logs import flush_logs
+from conftest import StubComfy, read_events
+OPTIONS = {"preset": "quality", "frames": 17, "use_cache": False, "use_schedule": False}
+def _request(prompt, **extra):
+    return prompt, "wan", {**OPTIONS, **extra}
+def test_embed_grouping_keeps_priority_and_deadline_order(isolated, monkeypatch):
+    monkeypatch.setattr(core, "TEXT_EMBEDS_ENABLED", True)
+    requests = [
+        _request("a red fox", seed=1),
+        _request("a snowy owl", seed=1),
+        _request("a red fox", seed=2),
+        _request("a snowy owl", seed=3, priority=1),
+        _request("a red fox", seed=4, priority=1),
+        _request("a snowy owl", seed=5, priority=1),
+        _request("a red fox", seed=6, priority=1, deadline="2030-01-01T00:00:00"),
+    ]
+    async def scenario() -> list[int]:
+        return [job.position async for job in core._prepared_jobs(requests)]
+    assert asyncio.run(scenario()) == [0, 2, 1, 3, 5, 4, 6]
+def _run(stub: StubComfy, prompt: str) -> list[dict]:
+    servers = [{"name": "stub0", "url": stub.url}]
+    return core.run_pipeline([_request(prompt)], 1, servers)
+def test_text_embeds_recorded_only_after_completion(isolated, monkeypatch):
+    monkeypatch.setattr(core, "TEXT_EMBEDS_ENABLED", True)
+    async def scenario() -> tuple[str, list[str], list[str]]:
+        job = await core._prepare_job("a red fox", "wan", **dict(OPTIONS))
+        stub = await StubComfy().start()
+        try:
+            stub.reject = (400, {"error": "bad"})
+            await asyncio.wait_for(_run(stub, "a red fox"), 30)
+            rejected = core.TEXT_EMBEDS.servers(job.embed_key)
+            stub.reject = None
+            await asyncio.wait_for(_run(stub, "a red fox"), 30)
+            return stub.url, rejected, core.TEXT_EMBEDS.servers(job.embed_key)
+        finally:
+            await stub.stop()
+    url, rejected, completed = asyncio.run(scenario())
+    assert rejected == []
+    assert completed == [url]
+    flush_logs()
+    finished = [event for event in read_events(isolated / "events.jsonl") if event.get("event") == "completed"]
+    assert [(event["status"], event["text_embeds"]) for event in finished] == [("failed", "encoded"), ("completed", "encoded")]
+def test_text_embed_index_merges_writes_from_other_instances(tmp_path):
+    path = tmp_path / "text_embeds.json"
+    first, second = TextEmbedIndex(path, max_age=0), TextEmbedIndex(path, max_age=0)
+    assert first.servers("k") == [] and second.servers("k") == []
+    first.record("k", "a")
+    second.record("k", "b")
+    second.record("other", "c")
+    assert sorted(first.servers("k")) == ["a", "b"]
+    first.record("k", "a")
+    assert first.servers("k") == ["a", "b"]
+    assert second.servers("other") == ["c"]
+    assert TextEmbedIndex(path).servers("k") == ["a", "b"]
@@ -0,0 +1,52 @@
+import random
+import pytest
+import automation.core as core
+from automation.core import PromptEnricher
+from automation.workflows import load_prompt_components, load_prompt_defaults, load_prompts
+WORDS = ("fox", "neon", "harbor", "Ünïcode", "雨", "{prompt}", "50%", "dusk,", "", "  ", "\t", "lighthouse")
+def _baseline(base_prompt, segments, descriptors, fallback, filler, min_words, max_words):
+    text = base_prompt.strip() or fallback
+    index = sum(ord(ch) for ch in text)
+    values = {name: options[(index + offset) % len(options)] if options else "" for offset, (name, options) in enumerate(descriptors)}
+    segments = [segment.format(prompt=text, **values) for segment in segments]
+    prompt = " ".join(segments) if segments else text
+    words = prompt.split()
+    while len(words) < min_words and filler:
+        prompt = f"{prompt} {filler}"
+        words = prompt.split()
+    if len(words) > max_words:
+        prompt = " ".join(words[:max_words])
+    return prompt
+def _config():
+    prompts = load_prompts()
+    defaults = load_prompt_defaults()
+    components = load_prompt_components().get("wan", {})
+    descriptors = components.get("descriptors", {})
+    return (
+        tuple(components.get("segments", ())),
+        [(name, tuple(descriptors.get(key, ()))) for name, key in core.DESCRIPTOR_KEYS],
+        prompts.get(components.get("fallback_key") or defaults.get("wan_fallback", ""), ""),
+        prompts.get(components.get("filler_key") or defaults.get("wan_filler", ""), ""),
+        int(components.get("min_words", 80)),
+        int(components.get("max_words", 120)),
+    )
+def _prompts(count):
+    rng = random.Random(20260101)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randrange(0, 40))) for _ in range(count)]
+def test_configured_enricher_matches_baseline():
+    config = _config()
+    prompts = _prompts(2000)
+    assert [core.enrich_prompt(prompt) for prompt in prompts] == [_baseline(prompt, *config) for prompt in prompts]
+    assert core.enrich_many(prompts) == [_baseline(prompt, *config) for prompt in prompts]
+@pytest.mark.parametrize(
+    "segments, descriptors, fallback, filler, min_words, max_words",
+    [
+        ((), [], "fallback scene", "", 80, 120),
+        (("{prompt}, {light:>12}, {mood!r}",), [("light", ("soft", "hard")), ("mood", ())], "", "more detail here", 30, 45),
+        (("{prompt}", "shot on {lens}"), [("lens", ("35mm", "85mm", "macro"))], "wide", "one two three", 5, 5),
+    ],
+)
+def test_enricher_matches_baseline_for_edge_configs(segments, descriptors, fallback, filler, min_words, max_words):
+    enricher = PromptEnricher(segments, descriptors, fallback, filler, min_words, max_words)
+    for prompt in _prompts(500):
+        assert enricher.enrich(prompt) == _baseline(prompt, segments, descriptors, fallback, filler, min_words, max_words)
@@ -0,0 +1,48 @@
+import json
+import time
+import pytest
+from automation import estimator, tracking
+from automation.estimator import RuntimeModel, fit, load_model, work_units
+def _values(model, frames, steps=10, width=1000, height=1000):
+    return {"model_name": model, "width": width, "height": height, "frames": frames, "steps": steps}
+def test_fit_recovers_line_per_model():
+    samples = [(_values("a.gguf", frames), 30 + 2 * work_units(_values("a.gguf", frames))) for frames in (17, 33, 49, 81)]
+    samples += [(_values("b.gguf", frames), 5 * work_units(_values("b.gguf", frames))) for frames in (17, 33, 81)]
+    model = RuntimeModel(fit(samples))
+    assert model.data["models"]["a.gguf"]["slope"] == pytest.approx(2)
+    assert model.data["models"]["a.gguf"]["intercept"] == pytest.approx(30)
+    assert model.predict(_values("a.gguf", 65)) == pytest.approx(30 + 2 * work_units(_values("a.gguf", 65)))
+    assert model.predict(_values("b.gguf", 65)) == pytest.approx(5 * work_units(_values("b.gguf", 65)))
+def test_fit_falls_back_through_origin_on_negative_slope():
+    samples = [(_values("a.gguf", frames), elapsed) for frames, elapsed in ((17, 900), (33, 700), (49, 500))]
+    line = fit(samples)["models"]["a.gguf"]
+    assert line["intercept"] == 0
+    assert line["slope"] > 0
+def test_predict_falls_back_to_pooled_line_then_default():
+    samples = [(_values("a.gguf", 17), 100), (_values("b.gguf", 33), 200), (_values("c.gguf", 49), 300)]
+    data = fit(samples)
+    assert data["models"] == {}
+    assert data["global"] is not None
+    assert RuntimeModel(data).predict(_values("d.gguf", 17)) > 0
+    sparse = RuntimeModel(fit(samples[:2]))
+    assert sparse.predict(_values("a.gguf", 17)) == estimator.DEFAULT_JOB_SECONDS
+    assert sparse.estimate({"estimated_seconds": 42, "workload": _values("a.gguf", 17)}) == 42
+    assert RuntimeModel().predict({}) == estimator.DEFAULT_JOB_SECONDS
+def test_load_model_refits_only_when_stale_or_asked(tmp_path, monkeypatch):
+    cache = tmp_path / "runtime_model.json"
+    monkeypatch.setattr(estimator, "CACHE_FILE", cache)
+    calls: list[int] = []
+    samples = [(_values("a.gguf", frames), 10 * work_units(_values("a.gguf", frames))) for frames in (17, 33, 49)]
+    monkeypatch.setattr(tracking, "run_samples", lambda limit: calls.append(limit) or samples)
+    assert load_model(cached_only=True).data["global"] is None
+    assert calls == []
+    fitted = load_model()
+    assert calls == [estimator.SAMPLE_LIMIT]
+    assert fitted.data["models"]["a.gguf"]["slope"] == pytest.approx(10)
+    assert load_model().data == json.loads(cache.read_text(encoding="utf-8"))
+    stale = dict(fitted.data, fitted_at=time.time() - estimator.REFIT_SECONDS - 1)
+    cache.write_text(json.dumps(stale), encoding="utf-8")
+    assert load_model(cached_only=True).data == stale
+    assert len(calls) == 1
+    load_model(refresh=True, cached_only=True)
+    assert len(calls) == 2
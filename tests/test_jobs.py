@@ -0,0 +1,119 @@
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from automation.jobs import JobStore, job_key
+from automation.logs import log_sink
+from conftest import read_events
+def _write(path, *entries):
+    with path.open("a", encoding="utf-8") as handle:
+        for entry in entries:
+            handle.write(json.dumps(entry) + "\n")
+def _entry(event, digest, **extra):
+    return {"event": event, "prompt_digest": digest, "preset": "quality", "timestamp": extra.pop("timestamp", "2026-01-01T00:00:00"), **extra}
+def test_ingest_tracks_pending_and_done(tmp_path):
+    log = tmp_path / "schedule.jsonl"
+    store = JobStore(tmp_path / "jobs.sqlite3", log)
+    _write(
+        log,
+        _entry("scheduled", "b", window_start_utc="2026-01-02T00:00:00"),
+        _entry("scheduled", "a", window_start_utc="2026-01-01T00:00:00"),
+        _entry("scheduled", "c", window_start_utc="2026-01-03T00:00:00", preset="fast"),
+    )
+    assert [entry["prompt_digest"] for entry in store.pending()] == ["a", "b", "c"]
+    assert [entry["prompt_digest"] for entry in store.pending("fast")] == ["c"]
+    _write(log, _entry("execution_started", "a"), _entry("deferred", "b"))
+    with log.open("a", encoding="utf-8") as handle:
+        handle.write(json.dumps(_entry("expired", "c"))[:20])
+    assert [entry["prompt_digest"] for entry in store.pending()] == ["b", "c"]
+    with log.open("a", encoding="utf-8") as handle:
+        handle.write(json.dumps(_entry("expired", "c"))[20:] + "\n")
+    assert [entry["prompt_digest"] for entry in store.pending()] == ["b"]
+    store.close()
+def test_compact_keeps_pending_jobs_with_scheduler_events(tmp_path):
+    log = tmp_path / "schedule.jsonl"
+    store = JobStore(tmp_path / "jobs.sqlite3", log)
+    _write(
+        log,
+        _entry("scheduled", "a", window_start_utc="2026-01-01T00:00:00"),
+        _entry("awaiting_window", "a", window_start_utc="2026-01-01T00:00:00"),
+        _entry("deferred", "a"),
+        _entry("scheduled", "b", window_start_utc="2026-01-02T00:00:00"),
+        _entry("model_missing", "b", models=["x.safetensors"]),
+        _entry("window_dispatch", "a"),
+        _entry("scheduled", "c", window_start_utc="2026-01-03T00:00:00"),
+        _entry("execution_started", "c"),
+        _entry("deferred", "c"),
+    )
+    before = [entry["prompt_digest"] for entry in store.pending()]
+    kept = store.compact()
+    events = [(entry["prompt_digest"], entry["event"]) for entry in read_events(log)]
+    assert kept == len(events)
+    assert events == [
+        ("a", "awaiting_window"),
+        ("a", "deferred"),
+        ("b", "scheduled"),
+        ("b", "model_missing"),
+        ("a", "window_dispatch"),
+        ("c", "execution_started"),
+        ("c", "deferred"),
+    ]
+    assert before == ["a", "b"]
+    assert [entry["prompt_digest"] for entry in store.pending()] == before
+    store.close()
+    reopened = JobStore(tmp_path / "jobs.sqlite3", log)
+    assert [entry["prompt_digest"] for entry in reopened.pending()] == before
+    reopened.close()
+def test_jobs_are_keyed_by_job_id(tmp_path):
+    log = tmp_path / "schedule.jsonl"
+    store = JobStore(tmp_path / "jobs.sqlite3", log)
+    _write(
+        log,
+        _entry("scheduled", "a", job_id="a-fast", preset="fast"),
+        _entry("scheduled", "a", job_id="a-quality"),
+        _entry("scheduled", "b", job_id="b-quality"),
+    )
+    assert [entry["job_id"] for entry in store.pending()] == ["a-fast", "a-quality", "b-quality"]
+    _write(log, _entry("execution_started", "a", job_id="a-quality"), _entry("execution_failed", "b", job_id="b-quality"))
+    assert [entry["job_id"] for entry in store.pending()] == ["a-fast"]
+    failed = store.conn.execute("SELECT job_id FROM jobs WHERE status = 'failed'").fetchall()
+    assert failed == [("b-quality",)]
+    _write(log, _entry("scheduled", "b", job_id="b-quality"))
+    assert [entry["job_id"] for entry in store.pending()] == ["a-fast", "b-quality"]
+    store.close()
+def test_store_rebuilds_from_log_after_schema_change(tmp_path):
+    log = tmp_path / "schedule.jsonl"
+    path = tmp_path / "jobs.sqlite3"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE jobs (digest TEXT PRIMARY KEY, status TEXT NOT NULL, sort_key TEXT NOT NULL, seq INTEGER NOT NULL, preset TEXT, entry TEXT NOT NULL)")
+    conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    conn.execute("INSERT INTO meta VALUES ('log_offset', '999')")
+    conn.commit()
+    conn.close()
+    _write(log, _entry("scheduled", "legacy"), _entry("scheduled", "b", job_id="b-quality"))
+    store = JobStore(path, log)
+    assert [job_key(entry) for entry in store.pending()] == ["legacy", "b-quality"]
+    _write(log, _entry("execution_completed", "legacy", job_id="legacy-quality"))
+    assert [job_key(entry) for entry in store.pending()] == ["b-quality"]
+    store.close()
+def test_compact_keeps_lines_appended_while_it_runs(tmp_path, monkeypatch):
+    log = tmp_path / "schedule.jsonl"
+    store = JobStore(tmp_path / "jobs.sqlite3", log)
+    sink = log_sink(log, max_delay=0, rotate_bytes=0, rotate_daily=False)
+    _write(log, _entry("scheduled", "a"), _entry("deferred", "a"), _entry("scheduled", "b"))
+    writers: list[threading.Thread] = []
+    replace = Path.replace
+    def racing_replace(self, target):
+        monkeypatch.setattr(Path, "replace", replace)
+        writer = threading.Thread(target=sink.write, args=(_entry("scheduled", "c"),))
+        writer.start()
+        writer.join(0.2)
+        writers.append(writer)
+        return replace(self, target)
+    monkeypatch.setattr(Path, "replace", racing_replace)
+    store.compact()
+    [writer] = writers
+    writer.join()
+    assert [entry["prompt_digest"] for entry in read_events(log)] == ["a", "a", "b", "c"]
+    assert "c" in [entry["prompt_digest"] for entry in store.pending()]
+    store.close()
@@ -0,0 +1,33 @@
+import gzip
+import json
+from automation import logs
+from automation.logs import BufferedLogWriter, rotate_log, rotated_logs
+def _lines(path):
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as handle:
+        return [json.loads(line)["n"] for line in handle]
+def test_rotation_happens_only_past_the_size_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(logs, "COMPRESS", False)
+    path = tmp_path / "events.jsonl"
+    probe = BufferedLogWriter(tmp_path / "probe.jsonl", max_delay=0, rotate_bytes=0)
+    probe.write({"n": 0})
+    size = (tmp_path / "probe.jsonl").stat().st_size
+    writer = BufferedLogWriter(path, max_delay=0, rotate_bytes=3 * size, rotate_daily=False)
+    for index in range(3):
+        writer.write({"n": index})
+    assert rotated_logs(path) == []
+    assert path.stat().st_size == 3 * size
+    writer.write({"n": 3})
+    [rotated] = rotated_logs(path)
+    assert _lines(rotated) == [0, 1, 2]
+    assert _lines(path) == [3]
+def test_rotate_log_compresses_and_keeps_newest(tmp_path, monkeypatch):
+    monkeypatch.setattr(logs, "COMPRESS", True)
+    monkeypatch.setattr(logs, "ROTATE_KEEP", 2)
+    path = tmp_path / "events.jsonl"
+    assert rotate_log(path) is None
+    for index in range(3):
+        path.write_text(json.dumps({"n": index}) + "\n", encoding="utf-8")
+        assert rotate_log(path).suffix == ".gz"
+    assert not path.exists()
+    assert [_lines(rotated) for rotated in rotated_logs(path)] == [[1], [2]]
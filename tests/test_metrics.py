@@ -0,0 +1,24 @@
+from automation.metrics import MetricsCollector
+def _gauge(collector, name, **labels):
+    return collector.gauges.get((name, tuple(sorted((key, str(value)) for key, value in labels.items()))))
+def test_finished_jobs_leave_the_active_set():
+    collector = MetricsCollector()
+    for prompt_id in ("p1", "p2", "p3"):
+        collector.record({"event": "queued", "prompt_id": prompt_id, "preset": "quality"})
+    collector.record({"event": "execution_start", "prompt_id": "p2"})
+    collector.record({"event": "node_progress", "prompt_id": "p2", "value": 3})
+    collector.record({"event": "completed", "prompt_id": "p1", "preset": "quality", "status": "lost"})
+    collector.record({"event": "completed", "prompt_id": "p2", "preset": "quality", "status": "timeout"})
+    collector._snapshot()
+    assert list(collector.active) == ["p3"]
+    assert collector.ticks == {}
+    assert _gauge(collector, "jobs", state="queued") == 1
+    assert _gauge(collector, "jobs", state="running") == 0
+def test_cache_hit_ratio_counts_only_completed_renders():
+    collector = MetricsCollector()
+    collector.record({"event": "cache_hit", "preset": "quality"})
+    collector.record({"event": "completed", "prompt_id": "p1", "preset": "quality", "status": "completed", "elapsed_seconds": 5})
+    for prompt_id in ("p2", "p3"):
+        collector.record({"event": "completed", "prompt_id": prompt_id, "preset": "quality", "status": "failed", "failure": "oom"})
+    collector._snapshot()
+    assert _gauge(collector, "cache_hit_ratio") == 0.5
@@ -0,0 +1,65 @@
+import hashlib
+from contextlib import contextmanager
+import pytest
+from automation import models
+from automation.models import Asset, LocalSource, sync_assets
+PAYLOAD = bytes(range(256)) * 64
+class StreamingSource(LocalSource):
+    def __init__(self, root, honor_range=True) -> None:
+        super().__init__(root)
+        self.honor_range = honor_range
+        self.offsets: list[int] = []
+    def link(self, asset, target) -> bool:
+        return False
+    @contextmanager
+    def stream(self, asset, offset):
+        self.offsets.append(offset)
+        with super().stream(asset, offset if self.honor_range else 0) as (start, chunks):
+            yield start, chunks
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    monkeypatch.setattr(models, "CHUNK_BYTES", 1024)
+    source = tmp_path / "source" / "org" / "repo"
+    source.mkdir(parents=True)
+    (source / "model.safetensors").write_bytes(PAYLOAD)
+    return tmp_path
+def _asset(sha256=None):
+    return Asset("org/repo", "model.safetensors", "diffusion_models", sha256=sha256)
+def test_resumes_partial_download(library):
+    digest = hashlib.sha256(PAYLOAD).hexdigest()
+    root = library / "models"
+    partial = root / "diffusion_models" / "model.safetensors.part"
+    partial.parent.mkdir(parents=True)
+    partial.write_bytes(PAYLOAD[:3000])
+    source = StreamingSource(library / "source")
+    [target] = sync_assets([_asset(digest)], source, root, concurrency=1)
+    assert source.offsets == [3000]
+    assert target.read_bytes() == PAYLOAD
+    assert not partial.exists()
+def test_restarts_when_server_ignores_range(library):
+    root = library / "models"
+    partial = root / "diffusion_models" / "model.safetensors.part"
+    partial.parent.mkdir(parents=True)
+    partial.write_bytes(PAYLOAD[:3000])
+    source = StreamingSource(library / "source", honor_range=False)
+    [target] = sync_assets([_asset(hashlib.sha256(PAYLOAD).hexdigest())], source, root, concurrency=1)
+    assert target.read_bytes() == PAYLOAD
+def test_sha256_mismatch_discards_partial(library):
+    root = library / "models"
+    partial = root / "diffusion_models" / "model.safetensors.part"
+    partial.parent.mkdir(parents=True)
+    partial.write_bytes(b"\xff" * 3000)
+    source = StreamingSource(library / "source")
+    with pytest.raises(OSError, match="sha256 mismatch"):
+        sync_assets([_asset(hashlib.sha256(PAYLOAD).hexdigest())], source, root, concurrency=1)
+    assert not partial.exists()
+    assert not (root / "diffusion_models" / "model.safetensors").exists()
+    [target] = sync_assets([_asset(hashlib.sha256(PAYLOAD).hexdigest())], source, root, concurrency=1)
+    assert source.offsets == [3000, 0]
+    assert target.read_bytes() == PAYLOAD
+def test_linked_copy_with_wrong_hash_is_downloaded(library):
+    root = library / "models"
+    source = LocalSource(library / "source")
+    with pytest.raises(OSError, match="sha256 mismatch"):
+        sync_assets([_asset("0" * 64)], source, root, concurrency=1)
+    assert not (root / "diffusion_models" / "model.safetensors").exists()
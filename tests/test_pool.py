@@ -0,0 +1,123 @@
+import asyncio
+import automation.core as core
+from automation.logs import flush_logs
+from conftest import StubComfy, read_events
+OPTIONS = {"preset": "quality", "frames": 17, "use_cache": False, "use_schedule": False}
+async def _run(stubs: list[StubComfy], prompts: list[str]) -> list[dict]:
+    servers = [{"name": f"stub{idx}", "url": stub.url} for idx, stub in enumerate(stubs)]
+    return await asyncio.wait_for(core.run_pipeline([(prompt, "wan", dict(OPTIONS)) for prompt in prompts], 1, servers), 30)
+def _events(isolated, name: str) -> list[dict]:
+    flush_logs()
+    return [event for event in read_events(isolated / "events.jsonl") if event.get("event") == name]
+def test_submit_fails_over_to_healthy_server(isolated):
+    async def scenario() -> list[dict]:
+        down, up = await StubComfy().start(), await StubComfy().start()
+        down.unavailable = True
+        try:
+            return await _run([down, up], ["a lighthouse at dusk"]) + [down.posts, up.posts]
+        finally:
+            await down.stop()
+            await up.stop()
+    result, down_posts, up_posts = asyncio.run(scenario())
+    assert "outputs" in result
+    assert down_posts == [] and len(up_posts) == 1
+    assert [event["server"] for event in _events(isolated, "failover")] == ["stub0"]
+def test_rejected_prompt_fails_only_that_job(isolated):
+    body = {"error": {"type": "prompt_outputs_failed_validation"}, "node_errors": {"2": {"errors": ["value not in list"]}}}
+    async def scenario() -> tuple[list[dict], StubComfy, StubComfy]:
+        rejecting, spare = await StubComfy().start(), await StubComfy().start()
+        rejecting.reject = (400, body)
+        try:
+            return await _run([rejecting, spare], ["a glacier calving"]), rejecting, spare
+        finally:
+            await rejecting.stop()
+            await spare.stop()
+    results, rejecting, spare = asyncio.run(scenario())
+    error = results[0]["error"]
+    assert error["type"] == "PromptRejectedError"
+    assert error["response"] == body
+    assert len(rejecting.posts) == 1 and spare.posts == []
+    assert _events(isolated, "failover") == []
+    assert _events(isolated, "server_down") == []
+    completed = _events(isolated, "completed")
+    assert [(event["status"], event["failure"]) for event in completed] == [("failed", "invalid_prompt")]
+    schedule = [event["event"] for event in read_events(isolated / "schedule.jsonl")]
+    assert schedule == ["schedule_immediate", "execution_failed"]
+def test_single_server_submit_attempts_are_bounded(isolated):
+    async def scenario() -> tuple[list[dict], int]:
+        stub = await StubComfy().start()
+        stub.unavailable = True
+        try:
+            return await _run([stub], ["a desert caravan"]), stub.requests
+        finally:
+            await stub.stop()
+    results, requests = asyncio.run(scenario())
+    assert results[0]["error"]["stage"] == "submit"
+    assert requests == (core.FAILOVER_ATTEMPTS + 1) * (core.HTTP_RETRIES + 1)
+def test_other_jobs_finish_when_one_is_rejected(isolated):
+    async def scenario() -> list[dict]:
+        stub = await StubComfy().start()
+        stub.reject = (400, {"error": "bad"})
+        stub.reject_matching = "invalid"
+        try:
+            return await _run([stub], ["a valid harbor scene", "an invalid harbor scene", "a valid mountain pass"])
+        finally:
+            await stub.stop()
+    results = asyncio.run(scenario())
+    assert ["error" in result for result in results] == [False, True, False]
+def test_model_resolution_failure_fails_only_that_job(isolated, monkeypatch):
+    batches: list[list[int]] = []
+    def resolve(parameter_sets):
+        seeds = [parameters["seed"] for parameters in parameter_sets]
+        batches.append(seeds)
+        if 2 in seeds:
+            raise FileNotFoundError("model files not in models.assets and not on disk: missing.gguf")
+        return []
+    monkeypatch.setattr(core, "resolve_models", resolve)
+    requests = [("a red fox", "wan", {**OPTIONS, "seed": seed}) for seed in (1, 2)]
+    requests.append(("a snowy owl", "wan", {**OPTIONS, "seed": 3, "use_cache": True}))
+    async def scenario() -> tuple[list[dict], list[str]]:
+        cached = await core._prepare_job(*requests[2][:2], **dict(requests[2][2]))
+        video = isolated / "output" / "owl.mp4"
+        video.parent.mkdir()
+        video.write_bytes(b"x")
+        core.RESULT_CACHE.store(cached.cache_key, {"outputs": {"9": {}}}, [str(video)])
+        stub = await StubComfy().start()
+        try:
+            servers = [{"name": "stub0", "url": stub.url}]
+            return await asyncio.wait_for(core.run_pipeline(requests, 1, servers), 30), stub.posts
+        finally:
+            await stub.stop()
+    results, posts = asyncio.run(scenario())
+    assert batches == [[1, 2], [1], [2]]
+    assert "outputs" in results[0]
+    assert results[1]["error"]["stage"] == "submit"
+    assert results[1]["error"]["type"] == "FileNotFoundError"
+    assert results[2] == {"outputs": {"9": {}}}
+    assert len(posts) == 1
+def test_acquire_gives_up_when_no_server_recovers(isolated, monkeypatch):
+    monkeypatch.setattr(core, "ACQUIRE_TIMEOUT_SECONDS", 0.2)
+    monkeypatch.setattr(core, "FAILOVER_ATTEMPTS", 5)
+    async def scenario() -> list[dict]:
+        stub = await StubComfy().start()
+        await stub.stop()
+        return await _run([stub], ["a desert caravan", "a frozen lake"])
+    results = asyncio.run(scenario())
+    assert [result["error"]["stage"] for result in results] == ["submit", "submit"]
+    assert all("no healthy ComfyUI server" in result["error"]["message"] for result in results)
+def test_completion_recovered_after_websocket_drop(isolated, monkeypatch):
+    monkeypatch.setattr(core, "WS_RECONNECT_MIN_SECONDS", 0.01)
+    monkeypatch.setattr(core, "HISTORY_POLL_MIN_SECONDS", 5)
+    async def scenario() -> tuple[list[dict], StubComfy]:
+        stub = await StubComfy().start()
+        stub.drop_sockets = 1
+        try:
+            return await _run([stub], ["a night market"]), stub
+        finally:
+            await stub.stop()
+    results, stub = asyncio.run(scenario())
+    assert "outputs" in results[0]
+    assert stub.connections >= 2
+    [complete] = _events(isolated, "execution_complete")
+    assert complete["source"] == "history"
+    assert [event["status"] for event in _events(isolated, "completed")] == ["completed"]
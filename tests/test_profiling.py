@@ -0,0 +1,43 @@
+import json
+from automation import profiling
+from automation.profiling import JobProfile, write_trace
+WORKFLOW = {"1": {"class_type": "WanVideoTextEncode"}, "2": {"class_type": "WanVideoSampler"}, "3": {"class_type": "WanVideoDecode"}, "4": {"class_type": "LoadImage"}}
+def _profile() -> JobProfile:
+    profile = JobProfile(WORKFLOW)
+    profile.enter(1, 100.0)
+    profile.cache([4])
+    profile.enter(2, 101.5)
+    for step, moment in enumerate((102.0, 102.5, 103.0, 103.5)):
+        profile.tick(2, step, 3, moment)
+    profile.enter(3, 104.0)
+    profile.sample({"devices": [{"vram_total": 24 << 30, "vram_free": 6 << 30}]})
+    profile.finish(106.0)
+    return profile
+def test_trace_is_chrome_trace_json(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "TRACE_DIR", tmp_path)
+    path = write_trace(_profile().trace("job-1"), "job-1")
+    trace = json.loads(path.read_text(encoding="utf-8"))
+    assert path.name == "job-1.trace.json"
+    assert trace["displayTimeUnit"] == "ms"
+    events = trace["traceEvents"]
+    assert events[0] == {"name": "process_name", "ph": "M", "pid": "job-1", "tid": 0, "args": {"name": "job-1"}}
+    spans = [event for event in events if event["ph"] == "X"]
+    assert [(event["name"], event["cat"], event["ts"], event["dur"]) for event in spans] == [
+        ("WanVideoTextEncode", "text_encode", 100_000_000, 1_500_000),
+        ("WanVideoSampler", "sampler", 101_500_000, 2_500_000),
+        ("WanVideoDecode", "decode", 104_000_000, 2_000_000),
+    ]
+    assert all(event["pid"] == "job-1" and event["tid"] == 0 and set(event["args"]) == {"node"} for event in spans)
+    [cached] = [event for event in events if event["ph"] == "i"]
+    assert (cached["name"], cached["cat"], cached["s"], cached["ts"]) == ("LoadImage (cached)", "cached", "t", 100_000_000)
+    counters = [event for event in events if event["ph"] == "C"]
+    assert [event["name"] for event in counters] == ["progress 2"] * 4 + ["vram_gb"]
+    assert counters[-1]["args"] == {"used": 18.0, "total": 24.0}
+def test_summary_reports_phases_and_sampler_rate():
+    summary = _profile().summary()
+    assert summary["text_encode_seconds"] == 1.5
+    assert summary["sampler_seconds"] == 2.5
+    assert summary["decode_seconds"] == 2.0
+    assert summary["sampler_it_per_sec"] == 2.0
+    assert summary["peak_vram_gb"] == 18.0
+    assert summary["profiled_seconds"] == 6.0
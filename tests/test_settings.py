@@ -0,0 +1,36 @@
+import pytest
+import yaml
+import automation.core as core
+from automation import vram, workflows
+from automation.workflows import ConfigError
+@pytest.fixture
+def config_copy(tmp_path, monkeypatch):
+    path = tmp_path / "workflows.yaml"
+    path.write_bytes(workflows.CONFIG_PATH.read_bytes())
+    monkeypatch.setattr(workflows, "CONFIG_PATH", path)
+    monkeypatch.setattr(workflows, "CACHE", None)
+    monkeypatch.setattr(workflows, "REJECTED", None)
+    yield path
+    monkeypatch.undo()
+    core.refresh_settings()
+def _write(path, **vram_settings):
+    data = yaml.safe_load(path.read_text(encoding="utf-8"))
+    data.setdefault("vram", {}).update(vram_settings)
+    path.write_text(yaml.safe_dump(data), encoding="utf-8")
+def test_refresh_reaches_module_settings(config_copy):
+    core.refresh_settings()
+    _write(config_copy, budget_gb=11, recovery={"ladder": ["offload"], "max_attempts": 1})
+    assert core.refresh_settings()
+    assert vram.BUDGET_GB == core.BUDGET_GB == 11
+    assert core.RECOVERY_LADDER == ("offload",)
+    assert core.RECOVERY_ATTEMPTS == 1
+    with pytest.raises(vram.VRAMBudgetError, match="budget is 11.0 GiB"):
+        vram.preflight({"width": 1280, "height": 720, "frames": 81})
+def test_rejected_config_keeps_previous_settings(config_copy):
+    core.refresh_settings()
+    budget = core.BUDGET_GB
+    config_copy.write_text(config_copy.read_text(encoding="utf-8") + "\nvram: [\n", encoding="utf-8")
+    with pytest.raises(ConfigError):
+        core.refresh_settings()
+    assert not core.refresh_settings()
+    assert core.BUDGET_GB == vram.BUDGET_GB == budget
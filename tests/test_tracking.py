@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+import pytest
+from automation import tracking
+pytest.importorskip("mlflow")
+class RecordingClient:
+    def __init__(self) -> None:
+        self.batches: list[tuple[int, int, int]] = []
+        self.artifacts: list[str] = []
+    def create_run(self, experiment_id, tags, run_name):
+        return SimpleNamespace(info=SimpleNamespace(run_id="run-1"))
+    def log_batch(self, run_id, metrics=(), params=(), tags=()):
+        self.batches.append((len(params), len(tags), len(metrics)))
+    def log_text(self, run_id, text, name):
+        self.artifacts.append(name)
+    def log_dict(self, run_id, data, name):
+        self.artifacts.append(name)
+@pytest.fixture
+def client(monkeypatch):
+    client = RecordingClient()
+    writer = tracking.TrackingWriter(client, 16)
+    monkeypatch.setattr(tracking, "_client", lambda: (client, "0", "file:///tmp"))
+    monkeypatch.setattr(tracking, "_gpu_tags", lambda: {})
+    monkeypatch.setattr(tracking, "WRITER", writer)
+    yield client
+    writer.close()
+def _session(parameter_count):
+    parameters = {f"p{index}": index for index in range(parameter_count)}
+    return tracking.TrackingSession("wan", "quality", "abc", "fox", "a red fox", parameters, {}, "immediate")
+def test_params_and_tags_are_sent_in_limited_batches(client):
+    session = _session(2 * tracking.BATCH_PARAM_LIMIT + 50)
+    session._tags.update({f"t{index}": "x" for index in range(tracking.BATCH_TAG_LIMIT + 1)})
+    session._metrics["elapsed_seconds"] = 1.0
+    session._flush()
+    session.writer.flush()
+    assert client.batches == [(100, 0, 0), (100, 0, 0), (50, 0, 0), (0, 100, 1), (0, 1, 0)]
+    assert client.artifacts == ["prompt_input.txt", "prompt_enriched.txt", "workflow.json"]
+def test_profile_series_is_split_by_metric_limit(client):
+    session = _session(1)
+    points = [(step, 1000.0 + step, 0.5) for step in range(2 * tracking.BATCH_METRIC_LIMIT + 500)]
+    session.log_profile({"sampler_seconds": 3.0}, {"sampler_step_seconds": points}, {"traceEvents": []})
+    session.writer.flush()
+    assert client.batches == [(1, 0, 0), (0, 0, 1000), (0, 0, 1000), (0, 0, 500)]
+    assert client.artifacts[-1] == "profile_trace.json"
+    assert session._metrics == {"sampler_seconds": 3.0}
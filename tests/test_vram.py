@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+import automation.core as core
+from automation import vram
+from automation.vram import DEFAULT_TILES, RECOVERY_LADDER, degrade, estimate_vram, tiling_policy
+PHASES = ("text_encoder_gb", "sampling_gb", "decode_gb")
+REQUESTS = [
+    ("a lighthouse at dusk", "wan", {"preset": "quality"}),
+    ("", "wan_artist_loft", {"preset": "quality"}),
+    (
+        "a lighthouse at dusk",
+        "wan",
+        {"preset": "standard", "model_name": "Wan2.2-T2V-A14B-bf16.safetensors", "quantization": "disabled", "width": 1920, "height": 1080},
+    ),
+]
+async def _ladder(prompt, mode, options):
+    job = await core._prepare_job(prompt, mode, **dict(options))
+    estimates = [estimate_vram(job.workflow_parameters)]
+    job.outcome = {"failure": "oom"}
+    while await core._recover_job(job):
+        estimates.append(estimate_vram(job.workflow_parameters))
+        job.outcome = {"failure": "oom"}
+    return [step["rung"] for step in job.recovery], estimates
+@pytest.mark.parametrize("prompt, mode, options", REQUESTS)
+def test_each_recovery_rung_lowers_estimate(isolated, prompt, mode, options):
+    rungs, estimates = asyncio.run(_ladder(prompt, mode, options))
+    assert rungs
+    assert rungs == sorted(set(rungs), key=RECOVERY_LADDER.index)
+    for before, after in zip(estimates, estimates[1:]):
+        assert any(after[phase] < before[phase] for phase in PHASES)
+def test_preset_rung_without_effect_is_skipped(isolated):
+    rungs, _ = asyncio.run(_ladder("", "wan_artist_loft", {"preset": "quality"}))
+    assert "preset" not in rungs
+def test_oom_tiling_rung_shrinks_decode_tiles():
+    current = {"width": 1280, "height": 720, "frames": 81, "vae_tiling": False}
+    assert tiling_policy(1280, 720, 81, True, 24)["tile_x"] == 1280
+    first = degrade("vae_tiling", current)
+    assert first["vae_tiling"]
+    assert first["tile_x"] * first["tile_y"] < 1280 * 720
+    assert first["tile_x"] <= DEFAULT_TILES["tile_x"] and first["tile_y"] <= DEFAULT_TILES["tile_y"]
+    second = degrade("vae_tiling", {**current, **first})
+    assert second["tile_x"] < first["tile_x"] and second["tile_y"] < first["tile_y"]
+def _parameters(model_name):
+    return {
+        "model_name": model_name,
+        "quantization": "disabled",
+        "width": 1920,
+        "height": 1080,
+        "frames": 81,
+        "vae_tiling": False,
+        "text_encoder_name": "umt5-xxl-enc-bf16.safetensors",
+        "vae_name": "Wan2_1_VAE_bf16.safetensors",
+    }
+def test_preflight_applies_first_effective_downgrade(monkeypatch):
+    monkeypatch.setattr(vram, "ACTION", "downgrade")
+    monkeypatch.setattr(vram, "DOWNGRADES", ("vae_tiling", "fp8", "reduce_frames"))
+    changes, estimate = vram.preflight(_parameters("Wan2.2-Animate-14B-Q5_K_M.gguf"), 24)
+    assert list(changes)[0] == "vae_tiling" and "frames" not in changes and "quantization" not in changes
+    assert estimate["peak_gb"] <= 24
+    changes, estimate = vram.preflight(_parameters("Wan2.2-T2V-A14B-bf16.safetensors"), 30)
+    assert changes == {"quantization": "fp8_e4m3fn"}
+    assert estimate["peak_gb"] <= 30
+def test_preflight_follows_configured_order(monkeypatch):
+    monkeypatch.setattr(vram, "ACTION", "downgrade")
+    monkeypatch.setattr(vram, "DOWNGRADES", ("reduce_frames", "fp8"))
+    changes, estimate = vram.preflight(_parameters("Wan2.2-T2V-A14B-bf16.safetensors"), 30)
+    assert list(changes) == ["frames", "quantization"]
+    assert changes["frames"] < 81
+    assert estimate["peak_gb"] <= 30
+def test_preflight_reject_and_warn_leave_parameters_alone(monkeypatch):
+    parameters = _parameters("Wan2.2-T2V-A14B-bf16.safetensors")
+    monkeypatch.setattr(vram, "ACTION", "reject")
+    with pytest.raises(vram.VRAMBudgetError):
+        vram.preflight(parameters, 30)
+    monkeypatch.setattr(vram, "ACTION", "warn")
+    changes, estimate = vram.preflight(parameters, 30)
+    assert changes == {}
+    assert estimate == estimate_vram(parameters)
+def test_vram_profile_sets_resolution_under_explicit_options():
+    _, profiled = core.build_wan_workflow("a lighthouse", vram_profile="480P")
+    assert (profiled["width"], profiled["height"]) == (854, 480)
+    _, preset = core.build_wan_workflow("a lighthouse", preset="quality", vram_profile="1200P")
+    assert (preset["width"], preset["height"]) == (1920, 1200)
+    _, explicit = core.build_wan_workflow("a lighthouse", preset="quality", vram_profile="1200P", width=1024)
+    assert (explicit["width"], explicit["height"]) == (1024, 1200)
+def test_tiles_shrink_with_budget():
+    assert not tiling_policy(1280, 720, 81, "auto", 24)["vae_tiling"]
+    sizes = []
+    for budget in (24, 20, 16):
+        tiles = tiling_policy(1920, 1200, 81, "auto", budget)
+        assert tiles["vae_tiling"]
+        assert tiles["tile_x"] % vram.TILE_ALIGN == 0 and tiles["tile_x"] >= vram.TILE_MIN
+        assert tiles["tile_stride_x"] < tiles["tile_x"] and tiles["tile_stride_y"] < tiles["tile_y"]
+        sizes.append(tiles["tile_x"] * tiles["tile_y"])
+    assert sizes == sorted(sizes, reverse=True) and sizes[0] > sizes[-1]